@@ -0,0 +1,35 @@
+"""Add profile_synced_at to orders
+
+Revision ID: 5b7e0c2d9a13
+Revises: 3f1c2a9b7d41
+Create Date: 2026-10-16 14:27:05.318842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e0c2d9a13'
+down_revision: Union[str, None] = '3f1c2a9b7d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('orders', sa.Column('profile_synced_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_orders_profile_synced_at'), 'orders', ['profile_synced_at'], unique=False)
+    # Les commandes déjà livrées ont été intégrées aux profils à la livraison
+    op.execute(
+        "UPDATE orders SET profile_synced_at = COALESCE(delivered_at, now()) "
+        "WHERE status = 'delivered'"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_orders_profile_synced_at'), table_name='orders')
+    op.drop_column('orders', 'profile_synced_at')
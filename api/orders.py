@@ -9,6 +9,7 @@ from models import (User, Order, get_db, OrderStatus, Product, Banner, OrderRati
 from schemas.orders import *
 from utils.security import get_current_user
 from config import get_error_key, BASE_URL
+from ml_engine import predictor, recommendation_cache
 from .notifications import notify_users
 
 router = APIRouter()
@@ -63,10 +64,21 @@ async def create_order(
 
         new_order.save_order(db)
 
+        # Compteur journalier du produit (produits tendance)
+        predictor.trending_counters.record_order(db, product.id, product.category_id)
+        predictor.popular_products.record_order(product)
+
         # Met à jour le stock
         if product.stock is not None:
             product.stock -= order_data.quantity
             db.commit()
+            
+            # Produit en rupture : ne plus le servir depuis le cache des recommandations
+            if product.stock <= 0:
+                recommendation_cache.invalidate_product(product.id)
+                predictor.candidate_pool.discard(product.id)
+                predictor.popular_products.discard(product.id)
+                predictor.collaborative.discard(product.id)
 
         # Calcul des variables ML
         new_order.calculate_ml_features(db)
@@ -367,7 +379,11 @@ async def update_order_status(
             )
             
         elif order.status == OrderStatus.DELIVERING.value:
-            order.mark_as_delivered(db)
+            if order.mark_as_delivered(db):
+                # Mise à jour incrémentale de l'index des achats conjoints
+                predictor.copurchase_index.record_delivery(order, db)
+                # Profil mis à jour par lot en arrière-plan (cache invalidé à l'agrégation)
+                predictor.profile_aggregator.enqueue(order.id)
             
             # Notifier le client que sa commande a été livrée
             await notify_users(
@@ -4,14 +4,15 @@ from shutil import copyfileobj, make_archive
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Form
 from fastapi.responses import FileResponse
-from sqlalchemy import func, or_, and_, desc
+from sqlalchemy import func, or_, and_
 from sqlalchemy.orm import Session
-from sqlalchemy.sql.expression import true
 
-from models import Banner, Product, User, get_db, save_to_db, delete_from_db, order_products
+from models import Banner, Product, User, get_db, save_to_db, delete_from_db
 from schemas import ProductResponse, ProductsResponse, Optional
 from utils.security import get_current_user
 from config import *
+from ml_engine import predictor, recommendation_cache
+from ml_engine.popularity import BY_DISCOUNT, BY_ORDERS, BY_RATING, NEWEST
 
 router = APIRouter()
 
@@ -206,80 +207,30 @@ async def get_fallback_recommendations(
     """
     Obtient une liste des produits les plus populaires (accessible sans authentification)
     Utilisé comme solution de repli quand les recommandations personnalisées ne sont pas disponibles
+    
+    Le classement est lu en mémoire (les plus commandés, à défaut les mieux notés, ceux
+    en promotion, puis les plus récents) et limité aux premiers produits ; seuls les
+    produits de la page sont chargés, par clé primaire.
     """
     try:
-        # Requête de base pour les produits populaires basée sur les commandes
-        # N'inclure que les produits disponibles (stock > 0 ou stock illimité)
-        stock_filter = Product.stock.is_(None) | (Product.stock > 0)
-        
-        popular_by_orders = db.query(
-            Product,
-            func.count(order_products.c.order_id).label('order_count')
-        ).join(
-            order_products, 
-            Product.id == order_products.c.product_id
-        ).filter(stock_filter).group_by(Product.id)
-        
-        # Si aucun produit n'a été commandé, utiliser les produits avec les meilleures évaluations
-        if popular_by_orders.first() is None:
-            base_query = db.query(Product).filter(
-                and_(
-                    Product.rating > 0,
-                    stock_filter
-                )
-            ).order_by(
-                desc(Product.rating),
-                desc(Product.nb_rating)
-            )
-        else:
-            # Sinon utiliser les produits les plus commandés
-            base_query = popular_by_orders.order_by(
-                desc('order_count')
-            ).with_entities(Product)
+        if not predictor.popular_products.loaded:
+            predictor.popular_products.refresh(db)
         
-        # Compter le nombre total de produits pour la pagination
-        total_items = base_query.count()
-        
-        # Gérer le cas où il n'y a aucun produit
-        if total_items == 0:
-            # Essayer d'abord les produits en promotion
-            promo_query = db.query(Product).join(
-                Banner, 
-                and_(
-                    Product.banner_id == Banner.id,
-                    Banner.discountPercent > 0,
-                    Banner.isActive == true()
-                )
-            ).filter(stock_filter).order_by(desc(Banner.discountPercent))
-            
-            if promo_query.count() > 0:
-                base_query = promo_query
-                total_items = base_query.count()
-            else:
-                # Sinon retourner tous les produits disponibles triés par date
-                base_query = db.query(Product).filter(stock_filter).order_by(desc(Product.created_at))
-                total_items = base_query.count()
-            
-            # S'il n'y a vraiment aucun produit, retourner une liste vide
-            if total_items == 0:
-                return {
-                    "products": [],
-                    "pagination": {
-                        "currentPage": page,
-                        "totalPages": 0,
-                        "totalItems": 0,
-                        "itemsPerPage": limit
-                    }
-                }
+        _, ranked_ids = predictor.popular_products.ranking(
+            (BY_ORDERS, BY_RATING, BY_DISCOUNT, NEWEST)
+        )
         
+        total_items = len(ranked_ids)
         total_pages = (total_items + limit - 1) // limit
         
         # Gérer les problèmes de pagination
         current_page = min(page, total_pages) if total_pages > 0 else 1
         
-        # Appliquer la pagination
+        # Appliquer la pagination puis charger les produits de la page, dans l'ordre du classement
         offset = (current_page - 1) * limit
-        products = base_query.offset(offset).limit(limit).all()
+        page_ids = ranked_ids[offset:offset + limit]
+        by_id = {product.id: product for product in db.query(Product).filter(Product.id.in_(page_ids))} if page_ids else {}
+        products = [by_id[product_id] for product_id in page_ids if product_id in by_id]
         
         # Ajouter l'URL de base aux images
         for product in products:
@@ -399,6 +350,12 @@ async def create_product(
     new_product.image_url = f"/{upload_dir.rstrip('/')}/{new_product.id}.{file_extension}"
     db.commit()
     db.refresh(new_product)  # Pour s'assurer que les changements sont pris en compte dans la réponse
+    
+    # Intégrer le produit aux index de recommandation
+    predictor.candidate_pool.upsert(new_product)
+    predictor.popular_products.upsert(new_product)
+    predictor.similarity_index.upsert(new_product)
+    predictor.seasonal_index.upsert(new_product)
     return new_product
 
 @router.put("/update_product/{id}", response_model=ProductResponse)
@@ -470,6 +427,14 @@ async def update_product(
     product.is_new = is_new
     db.commit()
     db.refresh(product)  # Pour s'assurer que les changements sont pris en compte dans la réponse
+    
+    # Invalider les recommandations en cache qui contiennent ce produit
+    recommendation_cache.invalidate_product(product.id)
+    predictor.candidate_pool.upsert(product)
+    predictor.popular_products.upsert(product)
+    predictor.similarity_index.upsert(product)
+    predictor.collaborative.upsert(product)
+    predictor.seasonal_index.upsert(product)
     return product
 
 @router.delete("/delete_product/{id}")
@@ -498,4 +463,10 @@ async def delete_product(
             os.remove(file_path)
 
     delete_from_db(product, db)
+    recommendation_cache.invalidate_product(id)
+    predictor.candidate_pool.discard(id)
+    predictor.popular_products.discard(id)
+    predictor.similarity_index.discard(id)
+    predictor.collaborative.discard(id)
+    predictor.seasonal_index.discard(id)
     return {"message": "Produit et medias supprimés avec succès"}
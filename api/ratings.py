@@ -7,6 +7,7 @@ from sqlalchemy import func, and_
 from models import User, Product, get_db, ProductRating, Order, OrderRating, OrderStatus
 from schemas.ratings import *
 from utils.security import get_current_user
+from ml_engine import predictor
 
 router = APIRouter()
 
@@ -75,6 +76,7 @@ async def create_product_rating(
         db.commit()
         db.refresh(existing_rating)
         db.refresh(product)
+        predictor.seasonal_index.update_rating(product.id, product.rating)
 
         return existing_rating
     
@@ -106,6 +108,7 @@ async def create_product_rating(
     db.commit()
     db.refresh(new_rating)
     db.refresh(product)
+    predictor.seasonal_index.update_rating(product.id, product.rating)
 
     return new_rating
 
@@ -291,6 +294,7 @@ async def delete_product_rating(
     product.rating = mean_rating(db, product_id)
     db.commit()
     db.refresh(product)
+    predictor.seasonal_index.update_rating(product.id, product.rating)
     
     return {"message": "Notation supprimée avec succès"}
 
@@ -7,7 +7,7 @@ from sqlalchemy.orm import Session
 from models import Product, User, get_db
 from schemas import ProductsResponse, Dict
 from utils.security import get_current_user
-from ml_engine import predictor
+from ml_engine import predictor, recommendation_cache
 from config import get_error_key, BASE_URL
 
 router = APIRouter()
@@ -30,14 +30,20 @@ async def get_my_recommendations(
                 detail=get_error_key("general", "not_found")
             )
         
-        # Récupérer les recommandations personnalisées
-        recommendation_result = predictor.predict_user_interest(user_id=user.id, db=db)
+        # Récupérer les recommandations personnalisées (épinglées en cache pour la pagination)
+        recommendation_result = recommendation_cache.get(user.id, page)
+        if recommendation_result is None:
+            recommendation_result = predictor.predict_user_interest(user_id=user.id, db=db)
+            # Seules les prédictions réussies sont mises en cache : un repli (modèle en
+            # cours de chargement, profil absent, erreur) est recalculé à la requête suivante
+            if recommendation_result.get('success'):
+                recommendation_result = recommendation_cache.set(user.id, recommendation_result)
         
-        # Extraire les produits recommandés
-        recommended_products = recommendation_result.get('recommendations', [])
+        # Extraire les IDs des produits recommandés
+        product_ids = recommendation_result.get('product_ids', [])
         
         # Gérer le cas où aucune recommandation n'est disponible
-        if not recommended_products or not recommendation_result.get('success', False):
+        if not product_ids or not recommendation_result.get('success', False):
             logging.info(f"Aucune recommandation personnalisée disponible pour l'utilisateur {user.id}. "
                         f"Raison: {recommendation_result.get('message', 'Inconnue')}")
             
@@ -49,9 +55,6 @@ async def get_my_recommendations(
             )
         else:
             # Utiliser les produits recommandés
-            # Comme recommended_products est déjà une liste d'objets Product, nous devons créer une requête qui les inclut
-            product_ids = [product.id for product in recommended_products]
-            
             # Créer une requête pour récupérer ces produits dans l'ordre spécifié
             # Nous devons faire cela pour appliquer la pagination correctement
             products_query = db.query(Product).filter(
@@ -1,9 +1,9 @@
 from datetime import datetime
-from logging import error, info
 from os import makedirs
 from os.path import basename, exists, join
 from shutil import make_archive
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 
@@ -16,6 +16,7 @@ router = APIRouter()
 
 @router.get("/models/download-trained-model")
 def download_trained_model(
+    version: Optional[str] = Query(None, description="Version du registre (version active par défaut)"),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
@@ -24,16 +25,23 @@ def download_trained_model(
     if not user or user.role.lower() != 'admin':
         raise HTTPException(status_code=403, detail=get_error_key("models", "download", "no_permission"))
     
-    # Chemin du modèle entraîné
-    model_path = "user_interest_model.joblib"
-    metadata_path = "user_interest_model_metadata.joblib"
+    # Chemin du modèle entraîné : version du registre, sinon ancien fichier unique
+    version = version or predictor.registry.current_version()
+    if version is not None:
+        if version not in predictor.registry.list_versions():
+            raise HTTPException(status_code=404, detail=get_error_key("models", "download", "model_not_found"))
+        model_path = predictor.registry.model_path(version)
+        metadata_path = predictor.registry.metadata_path(version)
+    else:
+        model_path = "user_interest_model.joblib"
+        metadata_path = "user_interest_model_metadata.joblib"
     
     # Vérifier que le modèle existe
     if not exists(model_path):
         raise HTTPException(status_code=404, detail=get_error_key("models", "download", "model_not_found"))
     
     # Créer une archive ZIP contenant le modèle et ses métadonnées
-    zip_filename = "user_interest_model_backup"
+    zip_filename = f"user_interest_model_{version}" if version else "user_interest_model_backup"
     zip_path = f"{zip_filename}.zip"
     
     # Créer un dossier temporaire pour y mettre les fichiers à compresser
@@ -55,10 +63,76 @@ def download_trained_model(
     
     return FileResponse(
         path=zip_path, 
-        filename="user_interest_model_backup.zip", 
+        filename=zip_path, 
         media_type='application/zip'
     )
 
+@router.get("/models/versions")
+async def list_model_versions(
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Liste les versions du registre de modèles avec leurs métadonnées
+    Nécessite des droits d'administrateur
+    """
+    user = db.query(User).filter(User.email == current_user['email']).first()
+    if not user or user.role != 'Admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Vous n'avez pas les droits nécessaires pour cette action"
+        )
+    
+    versions = []
+    for version in predictor.registry.list_versions():
+        metadata = predictor.registry.get_metadata(version)
+        versions.append({
+            "version": version,
+            "registered_at": metadata.get("registered_at"),
+            "training_time": metadata.get("training_time"),
+            "mode": (metadata.get("training_state") or {}).get("mode"),
+            "accuracy": (metadata.get("performance") or {}).get("accuracy"),
+            "sha256": metadata.get("sha256")
+        })
+    
+    return {
+        "current_version": predictor.registry.current_version(),
+        "served_version": predictor.model_version,
+        "versions": versions
+    }
+
+@router.post("/models/rollback")
+async def rollback_model(
+    version: Optional[str] = Query(None, description="Version à réactiver (version précédente par défaut)"),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Réactive une version précédente du modèle
+    Nécessite des droits d'administrateur
+    """
+    user = db.query(User).filter(User.email == current_user['email']).first()
+    if not user or user.role != 'Admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Vous n'avez pas les droits nécessaires pour cette action"
+        )
+    
+    if version is not None and version not in predictor.registry.list_versions():
+        raise HTTPException(status_code=404, detail=get_error_key("models", "download", "model_not_found"))
+    
+    activated = predictor.rollback_model(version)
+    if activated is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Aucune version vers laquelle revenir"
+        )
+    
+    return {
+        "message": f"Modèle revenu à la version {activated}",
+        "status": "success"
+    }
+
 @router.post("/set-training-time")
 async def set_training_time(
     training_time: str,
@@ -100,14 +174,14 @@ async def set_training_time(
 
 @router.get("/trigger-model-training")
 async def trigger_model_training(
-    background_tasks: BackgroundTasks,
+    full: bool = Query(False, alias="full"),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Déclenche manuellement l'entraînement du modèle
     Nécessite des droits d'administrateur
-    L'entraînement s'exécute en arrière-plan
+    L'entraînement s'exécute dans un processus séparé (incrémental sauf si full=true)
     """
     # Vérifier les permissions - seul l'administrateur peut déclencher l'entraînement
     user = db.query(User).filter(User.email == current_user['email']).first()
@@ -117,25 +191,18 @@ async def trigger_model_training(
             detail="Vous n'avez pas les droits nécessaires pour cette action"
         )
     
-    # Lancer l'entraînement en arrière-plan pour ne pas bloquer la réponse
-    background_tasks.add_task(train_model_background, db)
+    # Lancer l'entraînement dans un processus séparé ; le modèle servi est remplacé à la fin
+    if predictor.submit_training("full" if full else "auto") is None:
+        return {
+            "message": "Un entraînement du modèle est déjà en cours",
+            "status": "pending"
+        }
     
     return {
         "message": "Entraînement du modèle lancé en arrière-plan",
         "status": "success"
     }
 
-def train_model_background(db: Session):
-    """
-    Fonction d'arrière-plan pour l'entraînement du modèle
-    """
-    try:
-        # Ici, nous passerons la session DB au moteur de prédiction
-        predictor.train_model(db)
-        info("Entraînement du modèle terminé avec succès")
-    except Exception as e:
-        error(f"Erreur lors de l'entraînement du modèle: {str(e)}")
-
 @router.get("/model-status")
 async def get_model_status(
     current_user: dict = Depends(get_current_user),
@@ -156,4 +223,28 @@ async def get_model_status(
     # Obtenir le statut du modèle depuis le prédicteur
     status = predictor.get_model_status()
     
-    return status
\ No newline at end of file
+    return status
+
+
+@router.get("/model-metrics")
+async def get_model_metrics(
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Récupère les mesures du pipeline ML : étapes des derniers entraînements
+    (temps réel, temps CPU, pic mémoire, lignes traitées) et histogrammes de
+    latence des appels d'inférence
+    Nécessite des droits d'administrateur
+    """
+    user = db.query(User).filter(User.email == current_user['email']).first()
+    if not user or user.role != 'Admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Vous n'avez pas les droits nécessaires pour cette action"
+        )
+    
+    return {
+        "training_runs": predictor.metrics.training_history(),
+        "inference_latency": predictor.metrics.inference_summary()
+    }
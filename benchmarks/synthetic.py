@@ -0,0 +1,320 @@
+"""
+Générateur déterministe de données synthétiques pour les benchmarks du moteur de recommandation
+
+Toutes les valeurs sont tirées d'un générateur NumPy initialisé avec `seed` :
+deux exécutions avec la même taille et la même graine produisent exactement
+le même jeu de données (utilisateurs, catégories, bannières, produits,
+commandes, notations et profils de préférences).
+"""
+import datetime
+import logging
+from dataclasses import dataclass, asdict
+from itertools import islice
+from typing import Dict, Iterable, List
+
+import numpy as np
+from sqlalchemy import bindparam
+from sqlalchemy.orm import Session
+
+from models import (
+    Banner, Category, IconType, Order, Product, ProductRating, User, UserPreferenceProfile,
+    insert_devise, insert_icon_types, insert_locality
+)
+
+logger = logging.getLogger(__name__)
+
+# Vocabulaire des noms et descriptions de produits (mots-clés saisonniers inclus)
+WORDS = [
+    "chaise", "table", "lampe", "sac", "robe", "chemise", "pagne", "panier", "bol", "tasse",
+    "bois", "cuir", "coton", "métal", "rouge", "bleu", "vert", "artisanal", "moderne", "classique",
+    "plage", "piscine", "vacances", "noël", "fêtes", "hiver", "rentrée", "confort", "fleurs", "jardinage",
+]
+PURCHASE_TIMES = np.array(["Nuit", "Matin", "Après-midi", "Soir"], dtype=object)
+# Moment de la journée par heure, comme Order.calculate_ml_features
+HOUR_TO_PURCHASE_TIME = np.array([0] * 5 + [1] * 7 + [2] * 5 + [3] * 4 + [0] * 3)
+LOCALITIES = ["Ouagadougou", "Accra"]
+INSERT_BATCH_SIZE = 10000
+
+
+@dataclass
+class DatasetSpec:
+    """
+    Volumétrie d'un jeu de données synthétique, dérivée du nombre d'utilisateurs
+    """
+    users: int
+    products: int
+    categories: int
+    banners: int
+    orders: int
+    seed: int
+
+    @classmethod
+    def for_users(cls, users: int, orders_per_user: float = 2.0, seed: int = 42) -> "DatasetSpec":
+        return cls(
+            users=users,
+            products=max(500, users // 20),
+            categories=20,
+            banners=10,
+            orders=int(users * orders_per_user),
+            seed=seed
+        )
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _batches(rows: Iterable[Dict], size: int = INSERT_BATCH_SIZE) -> Iterable[List[Dict]]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _bulk_insert(db: Session, model, rows: Iterable[Dict]):
+    """
+    Insère des lignes par lots (executemany) puis valide ; `rows` peut être un générateur
+    """
+    for batch in _batches(rows):
+        db.execute(model.__table__.insert(), batch)
+    db.commit()
+
+
+def _zipf_choice(rng: np.random.Generator, n: int, size: int, exponent: float = 1.1) -> np.ndarray:
+    """
+    Tire des indices dans [0, n) avec une popularité décroissante (loi de Zipf tronquée)
+    """
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    weights /= weights.sum()
+    return rng.choice(n, size=size, p=weights)
+
+
+def generate_dataset(db: Session, spec: DatasetSpec, now: datetime.datetime = None) -> Dict[str, int]:
+    """
+    Peuple une base vide avec un jeu de données synthétique
+
+    :param db: Session de base de données SQLAlchemy (schéma déjà créé, tables vides)
+    :param spec: Volumétrie du jeu de données
+    :param now: Date de référence des horodatages (fixe par défaut pour rester déterministe)
+    :return: Nombre de lignes insérées par table
+    """
+    rng = np.random.default_rng(spec.seed)
+    now = now or datetime.datetime(2025, 6, 1, 12, 0, 0)
+
+    # Données de référence de l'application (devises, types d'icônes, localités)
+    insert_icon_types(db)
+    insert_devise(db)
+    insert_locality(db)
+    icon_type_id = db.query(IconType.id).order_by(IconType.id).first()[0]
+
+    # Utilisateurs : le premier est l'administrateur propriétaire du catalogue
+    _bulk_insert(db, User, ({
+        'id': i,
+        'username': f"bench{i}",
+        'email': f"bench{i}@example.com",
+        'phone': f"+226{i:09d}",
+        'password': "benchmark",
+        'role': 'admin' if i == 1 else 'user',
+        'is_active': True,
+        'notifications': False,
+        'can_add_category': i == 1,
+        'can_add_banner': i == 1,
+        'can_add_product': i == 1,
+        'created_at': now - datetime.timedelta(days=365),
+    } for i in range(1, spec.users + 1)))
+
+    _bulk_insert(db, Category, [{
+        'id': i,
+        'name': f"Catégorie {i}",
+        'icon': f"bench-icon-{i}",
+        'type_id': icon_type_id,
+        'owner_id': 1,
+    } for i in range(1, spec.categories + 1)])
+
+    banner_discounts = rng.integers(5, 60, spec.banners)
+    _bulk_insert(db, Banner, [{
+        'id': i,
+        'image_url': f"/bench/banners/{i}.jpg",
+        'title': f"Promo {i}",
+        'subtitle': "Offre synthétique",
+        'discountPercent': int(banner_discounts[i - 1]),
+        'is_new': False,
+        'is_active': True,
+        'until': now + datetime.timedelta(days=30),
+        'created_at': now - datetime.timedelta(days=10),
+        'owner_id': 1,
+    } for i in range(1, spec.banners + 1)])
+
+    # Produits
+    n = spec.products
+    prices = np.round(rng.lognormal(mean=3.5, sigma=1.0, size=n), 2)
+    categories = rng.integers(1, spec.categories + 1, n)
+    has_banner = rng.random(n) < 0.1
+    banners = rng.integers(1, spec.banners + 1, n)
+    stocks = rng.integers(0, 200, n)
+    tracked_stock = rng.random(n) < 0.5
+    created_days = rng.integers(0, 180, n)
+    name_words = rng.integers(0, len(WORDS), (n, 2))
+    description_words = rng.integers(0, len(WORDS), (n, 6))
+    localities = rng.integers(0, len(LOCALITIES), n)
+
+    _bulk_insert(db, Product, ({
+        'id': i + 1,
+        'name': ' '.join(WORDS[w] for w in name_words[i])[:32],
+        'price': float(prices[i]),
+        'currency': "FCFA",
+        'old_price': None,
+        'discount': None,
+        'image_url': f"/bench/products/{i + 1}.jpg",
+        'rating': 0,
+        'nb_rating': 0,
+        'nb_reviews': 0,
+        'is_new': bool(created_days[i] < 30),
+        'description': ' '.join(WORDS[w] for w in description_words[i])[:128],
+        'locality': LOCALITIES[localities[i]],
+        'stock': int(stocks[i]) if tracked_stock[i] else None,
+        'is_active': True,
+        'created_at': now - datetime.timedelta(days=int(created_days[i])),
+        'owner_id': 1,
+        'banner_id': int(banners[i]) if has_banner[i] else None,
+        'category_id': int(categories[i]),
+    } for i in range(n)))
+
+    # Commandes : clients et produits tirés selon une popularité de type Zipf
+    m = spec.orders
+    customers = rng.permutation(spec.users)[_zipf_choice(rng, spec.users, m, exponent=0.8)] + 1
+    products = rng.permutation(n)[_zipf_choice(rng, n, m)]
+    quantities = rng.integers(1, 4, m)
+    created_offsets = rng.integers(0, 90 * 24 * 3600, m)
+    status_draw = rng.random(m)
+    statuses = np.where(status_draw < 0.8, 'delivered',
+                        np.where(status_draw < 0.9, 'ready', 'cancelled'))
+
+    seconds_of_day = now.hour * 3600 + now.minute * 60 + now.second
+    hours = ((seconds_of_day - created_offsets) // 3600) % 24
+    delivered_mask = statuses == 'delivered'
+
+    def order_rows():
+        for i in range(m):
+            created = now - datetime.timedelta(seconds=int(created_offsets[i]))
+            unit_price = float(prices[products[i]])
+            subtotal = unit_price * int(quantities[i])
+            yield {
+                'id': i + 1,
+                'order_number': f"BENCH-{i + 1:09d}",
+                'customer_id': int(customers[i]),
+                'total_amount': subtotal,
+                'status': str(statuses[i]),
+                'product_id': int(products[i]) + 1,
+                'quantity': int(quantities[i]),
+                'latitude': 12.37,
+                'longitude': -1.52,
+                'accuracy': 10.0,
+                'created_at': created,
+                'updated_at': created,
+                'purchase_time': created,
+                'delivered_at': created + datetime.timedelta(days=1) if delivered_mask[i] else None,
+                # Profils calculés directement par le générateur
+                'profile_synced_at': now if delivered_mask[i] else None,
+                'payment_method': 'cash',
+                'payment_status': bool(delivered_mask[i]),
+                'subtotal': subtotal,
+                'delivery_fee': 0,
+                'tax': 0,
+                'average_item_price': unit_price,
+                'preferred_categories': int(categories[products[i]]),
+                'preferred_currencies': "FCFA",
+                'purchase_time_of_day': PURCHASE_TIMES[HOUR_TO_PURCHASE_TIME[hours[i]]],
+            }
+
+    _bulk_insert(db, Order, order_rows())
+
+    # Notations : un quart des commandes livrées, une note par couple (produit, client)
+    delivered = np.flatnonzero(delivered_mask)
+    rated = rng.choice(delivered, size=len(delivered) // 4, replace=False) if len(delivered) else delivered
+    rating_values = rng.integers(1, 6, len(rated))
+    pairs = {}
+    for i, rating in zip(rated.tolist(), rating_values.tolist()):
+        pairs.setdefault((int(products[i]) + 1, int(customers[i])), rating)
+    _bulk_insert(db, ProductRating, ({
+        'product_id': product_id,
+        'user_id': user_id,
+        'rating': rating,
+        'comment': None,
+        'created_at': now,
+        'updated_at': now,
+    } for (product_id, user_id), rating in pairs.items()))
+
+    # Note moyenne des produits notés
+    rating_sums = np.zeros(n + 1)
+    rating_counts = np.zeros(n + 1, dtype=np.int64)
+    for (product_id, _), rating in pairs.items():
+        rating_sums[product_id] += rating
+        rating_counts[product_id] += 1
+    rated_products = np.flatnonzero(rating_counts)
+    products_table = Product.__table__
+    update_ratings = products_table.update().where(
+        products_table.c.id == bindparam('b_id')
+    ).values(rating=bindparam('b_rating'), nb_rating=bindparam('b_nb_rating'))
+    for batch in _batches({
+        'b_id': int(p),
+        'b_rating': float(rating_sums[p] / rating_counts[p]),
+        'b_nb_rating': int(rating_counts[p])
+    } for p in rated_products):
+        db.execute(update_ratings, batch)
+    db.commit()
+
+    # Profils de préférences agrégés à partir des commandes livrées
+    profile_rows = _aggregate_profiles(
+        customers[delivered], products[delivered] + 1, quantities[delivered], prices[products[delivered]],
+        categories[products[delivered]], hours[delivered], now
+    )
+    _bulk_insert(db, UserPreferenceProfile, profile_rows)
+
+    counts = {
+        'users': spec.users,
+        'categories': spec.categories,
+        'banners': spec.banners,
+        'products': n,
+        'orders': m,
+        'ratings': len(pairs),
+        'profiles': len(profile_rows),
+    }
+    logger.info(f"Jeu de données synthétique généré : {counts}")
+    return counts
+
+
+def _aggregate_profiles(customers: np.ndarray, products: np.ndarray, quantities: np.ndarray,
+                        prices: np.ndarray, categories: np.ndarray, hours: np.ndarray,
+                        now: datetime.datetime) -> List[Dict]:
+    """
+    Calcule les profils (nombre de commandes, panier moyen, catégorie et moment d'achat préférés)
+    """
+    if len(customers) == 0:
+        return []
+
+    order = np.argsort(customers, kind='stable')
+    customers, products, quantities = customers[order], products[order], quantities[order]
+    amounts = prices[order] * quantities
+    categories = categories[order]
+    times = HOUR_TO_PURCHASE_TIME[hours[order]]
+
+    boundaries = np.flatnonzero(np.diff(customers)) + 1
+    starts = np.concatenate([[0], boundaries])
+    ends = np.concatenate([boundaries, [len(customers)]])
+
+    rows = []
+    for start, end in zip(starts, ends):
+        total_orders = int(end - start)
+        rows.append({
+            'user_id': int(customers[start]),
+            'most_purchased_category_id': int(np.bincount(categories[start:end]).argmax()),
+            'average_order_value': float(amounts[start:end].mean()),
+            'total_orders': total_orders,
+            'preferred_product_ids': sorted(set(products[start:end].tolist()))[:20],
+            'preferred_currencies': ["FCFA"],
+            'preferred_purchase_time': PURCHASE_TIMES[np.bincount(times[start:end]).argmax()],
+            'updated_at': now,
+        })
+    return rows
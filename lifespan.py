@@ -16,6 +16,9 @@ scheduler = BackgroundScheduler()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Chargement du modèle en arrière-plan : l'API sert des recommandations de repli en attendant
+    predictor.load_model_in_background()
+
     with get_db_context() as db:  # utilise correctement le context manager sync
         try:
             # Insertions initiales
@@ -27,6 +30,35 @@ async def lifespan(app: FastAPI):
             schedule_banner_expirations(scheduler, db)
             scheduler.start()
 
+            # Chargement de l'index des achats conjoints (table initialisée si elle est vide)
+            predictor.copurchase_index.load(db, build_if_empty=True)
+
+            # Pool de produits candidats pour compléter les recommandations
+            predictor.candidate_pool.refresh(db)
+
+            # Classements des produits populaires (recommandations de repli)
+            predictor.popular_products.refresh(db)
+
+            # Index de similarité de contenu entre produits, construit en arrière-plan
+            # (repli sur la proximité de prix en attendant)
+            predictor.build_similarity_index_in_background()
+
+            # Index inversé des mots-clés saisonniers
+            predictor.seasonal_index.build(db)
+
+            # Compteurs de commandes journaliers (produits tendance)
+            predictor.trending_counters.load(db)
+
+            # Index d'audience catégorie -> utilisateurs (ciblage des produits)
+            predictor.audience_index.build(db)
+
+            # Facteurs du filtrage collaboratif : chargés s'ils ont été exportés, sinon entraînés en arrière-plan
+            if predictor.collaborative_enabled and not predictor.collaborative.load():
+                predictor.build_collaborative_in_background()
+
+            # Agrégation en arrière-plan des commandes livrées dans les profils
+            predictor.profile_aggregator.start()
+
             # Démarrage du scheduler ML à 10h00
             predictor.start_scheduler(training_time="10:00")
 
@@ -35,4 +67,5 @@ async def lifespan(app: FastAPI):
         finally:
             # Arrêt propre des schedulers
             predictor.stop_scheduler()
+            predictor.profile_aggregator.stop()
             scheduler.shutdown()
@@ -1,3 +1,4 @@
 from .engine import UserInterestPredictor, predictor
+from .recommendation_cache import RecommendationCache, recommendation_cache
 
-__all__ = ["predictor", "UserInterestPredictor"]
\ No newline at end of file
+__all__ = ["predictor", "UserInterestPredictor", "recommendation_cache", "RecommendationCache"]
\ No newline at end of file
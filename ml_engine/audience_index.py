@@ -0,0 +1,219 @@
+import bisect
+import datetime
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import UserPreferenceProfile
+
+# Bornes des tranches de valeur moyenne de commande
+DEFAULT_AOV_BANDS = (25, 50, 100, 250, 500, 1000)
+
+# Fourchette de prix « similaire » du scoring : prix / panier moyen entre 0.8 et 1.2
+SIMILAR_PRICE_RATIO = (0.8, 1.2)
+
+# Recouvrement du rattrapage : profils validés après leur date de modification
+CATCH_UP_OVERLAP = datetime.timedelta(minutes=5)
+
+
+class AudienceIndex:
+    """
+    Index inversé catégorie -> utilisateurs, par tranche de panier moyen
+
+    Pour chaque catégorie et chaque tranche de valeur moyenne de commande, les
+    utilisateurs ayant acheté dans la catégorie sont gardés triés par affinité
+    décroissante (quantité achetée dans la catégorie). L'audience d'un produit
+    se lit alors directement : d'abord les tranches dont le panier moyen est
+    proche du prix, puis les tranches supérieures, puis les autres. Le scoring
+    exact n'est ensuite appliqué qu'à ces candidats. L'index est reconstruit
+    hors ligne et tenu à jour à chaque agrégation de profils ; les workers qui
+    n'agrègent pas le rattrapent périodiquement depuis les profils modifiés
+    (catch_up).
+    """
+
+    def __init__(self, bands: Tuple[float, ...] = DEFAULT_AOV_BANDS, chunk_size: int = 10000):
+        self.logger = logging.getLogger(__name__)
+        self.bands = tuple(bands)
+        self.chunk_size = chunk_size
+        # catégorie -> tranche -> liste triée de (-affinité, user_id)
+        self._ranked: Dict[int, Dict[int, List[Tuple[int, int]]]] = {}
+        # user_id -> (tranche, {catégorie: affinité}) indexés
+        self._entries: Dict[int, Tuple[int, Dict[int, int]]] = {}
+        # Date de modification du profil le plus récent lu en base
+        self.watermark: Optional[datetime.datetime] = None
+        self.built = False
+        self._lock = threading.Lock()
+
+    def _band(self, average_order_value: Optional[float]) -> int:
+        """
+        Tranche d'une valeur moyenne de commande (0 : inférieure à la première borne)
+        """
+        return bisect.bisect_right(self.bands, average_order_value or 0)
+
+    @staticmethod
+    def _affinities(most_purchased_category_id: Optional[int], additional_preferences: Optional[Dict]) -> Dict[int, int]:
+        """
+        Affinité par catégorie : quantités achetées, au moins 1 pour la catégorie préférée
+        """
+        counts = (additional_preferences or {}).get('category_purchase_count') or {}
+        affinities = {int(category_id): int(count) for category_id, count in counts.items() if count}
+        if most_purchased_category_id is not None:
+            affinities.setdefault(most_purchased_category_id, 1)
+        return affinities
+
+    def _remove(self, user_id: int):
+        """
+        Retire un utilisateur de toutes ses listes (verrou déjà acquis)
+        """
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+        band, affinities = entry
+        for category_id, affinity in affinities.items():
+            users = self._ranked[category_id][band]
+            i = bisect.bisect_left(users, (-affinity, user_id))
+            if i < len(users) and users[i] == (-affinity, user_id):
+                del users[i]
+
+    def _insert(self, user_id: int, band: int, affinities: Dict[int, int]):
+        """
+        Insère un utilisateur à son rang dans les listes de ses catégories (verrou déjà acquis)
+        """
+        if not affinities:
+            return
+        self._entries[user_id] = (band, affinities)
+        for category_id, affinity in affinities.items():
+            bisect.insort(self._ranked.setdefault(category_id, {}).setdefault(band, []), (-affinity, user_id))
+
+    def build(self, db: Session):
+        """
+        Reconstruit l'index depuis tous les profils (lecture en flux par lots)
+
+        :param db: Session de base de données SQLAlchemy
+        """
+        try:
+            stmt = select(
+                UserPreferenceProfile.user_id,
+                UserPreferenceProfile.average_order_value,
+                UserPreferenceProfile.most_purchased_category_id,
+                UserPreferenceProfile.additional_preferences,
+                UserPreferenceProfile.updated_at
+            ).execution_options(yield_per=self.chunk_size)
+
+            ranked: Dict[int, Dict[int, List[Tuple[int, int]]]] = {}
+            entries: Dict[int, Tuple[int, Dict[int, int]]] = {}
+            watermark = None
+            for row in db.execute(stmt):
+                if row.updated_at is not None and (watermark is None or row.updated_at > watermark):
+                    watermark = row.updated_at
+                affinities = self._affinities(row.most_purchased_category_id, row.additional_preferences)
+                if not affinities:
+                    continue
+                band = self._band(row.average_order_value)
+                entries[row.user_id] = (band, affinities)
+                for category_id, affinity in affinities.items():
+                    ranked.setdefault(category_id, {}).setdefault(band, []).append((-affinity, row.user_id))
+
+            for by_band in ranked.values():
+                for users in by_band.values():
+                    users.sort()
+
+            with self._lock:
+                self._ranked = ranked
+                self._entries = entries
+                self.watermark = watermark
+                self.built = True
+
+            self.logger.info(f"Index d'audience construit : {len(entries)} utilisateurs, {len(ranked)} catégories")
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la construction de l'index d'audience : {e}")
+
+    def update(self, profiles: Iterable[Dict]):
+        """
+        Met à jour l'index pour des profils modifiés
+
+        :param profiles: Lignes de profil (user_id, average_order_value,
+                         most_purchased_category_id, additional_preferences)
+        """
+        with self._lock:
+            if not self.built:
+                return
+            for profile in profiles:
+                self._remove(profile['user_id'])
+                self._insert(
+                    profile['user_id'],
+                    self._band(profile['average_order_value']),
+                    self._affinities(profile['most_purchased_category_id'], profile['additional_preferences'])
+                )
+
+    def catch_up(self, db: Session) -> int:
+        """
+        Intègre les profils modifiés depuis le watermark (agrégés par un autre worker)
+
+        La lecture recouvre les dernières minutes avant le watermark : une mise
+        à jour est idempotente, et un profil validé après sa date de
+        modification n'est pas manqué.
+
+        :param db: Session de base de données SQLAlchemy
+        :return: Nombre de profils relus
+        """
+        if not self.built:
+            return 0
+        try:
+            stmt = select(
+                UserPreferenceProfile.user_id,
+                UserPreferenceProfile.average_order_value,
+                UserPreferenceProfile.most_purchased_category_id,
+                UserPreferenceProfile.additional_preferences,
+                UserPreferenceProfile.updated_at
+            )
+            if self.watermark is not None:
+                stmt = stmt.where(UserPreferenceProfile.updated_at > self.watermark - CATCH_UP_OVERLAP)
+            rows = [row._asdict() for row in db.execute(stmt)]
+
+            self.update(rows)
+            latest = max((row['updated_at'] for row in rows if row['updated_at'] is not None), default=None)
+            with self._lock:
+                if latest is not None and (self.watermark is None or latest > self.watermark):
+                    self.watermark = latest
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            self.logger.error(f"Erreur lors du rattrapage de l'index d'audience : {e}")
+            return 0
+
+    def _band_order(self, price: Optional[float]) -> List[int]:
+        """
+        Ordre de lecture des tranches pour un prix : panier moyen proche, supérieur, puis inférieur
+        """
+        bands = list(range(len(self.bands) + 1))
+        if not price:
+            return bands
+        low, high = self._band(price / SIMILAR_PRICE_RATIO[1]), self._band(price / SIMILAR_PRICE_RATIO[0])
+        return list(range(low, high + 1)) + bands[high + 1:] + bands[:low][::-1]
+
+    def candidates(self, category_id: Optional[int], price: Optional[float], limit: int) -> Optional[np.ndarray]:
+        """
+        Audience candidate d'un produit
+
+        :param category_id: Catégorie du produit
+        :param price: Prix du produit
+        :param limit: Nombre maximum de candidats
+        :return: IDs des utilisateurs triés, ou None si l'index n'est pas construit
+        """
+        with self._lock:
+            if not self.built:
+                return None
+            by_band = self._ranked.get(category_id, {})
+            user_ids: List[int] = []
+            for band in self._band_order(price):
+                users = by_band.get(band)
+                if users:
+                    user_ids.extend(user_id for _, user_id in users[:limit - len(user_ids)])
+                if len(user_ids) >= limit:
+                    break
+        return np.sort(np.asarray(user_ids, dtype=np.int64))
@@ -0,0 +1,142 @@
+import logging
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from models import Product
+
+
+class CandidatePool:
+    """
+    Pools pré-mélangés des produits actifs, utilisés pour compléter les recommandations
+
+    Les IDs des produits actifs (en stock ou à stock non suivi) sont chargés et
+    mélangés en arrière-plan, globalement et par catégorie, avec leur nom et
+    leur prix. Un tirage parcourt le pool à partir d'une position aléatoire en
+    sautant les produits exclus : il coûte O(k) sans aucune requête SQL,
+    contrairement à `ORDER BY random()` qui trie toute la table.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._order: List[int] = []
+        self._by_category: Dict[int, List[int]] = {}
+        # product_id -> (nom, prix, category_id) des produits disponibles
+        self._products: Dict[int, Tuple[str, float, Optional[int]]] = {}
+        self.loaded_at: Optional[float] = None
+        self._random = random.Random()
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    @staticmethod
+    def _is_available(is_active: bool, stock: Optional[int]) -> bool:
+        return bool(is_active) and (stock is None or stock > 0)
+
+    def refresh(self, db: Session):
+        """
+        Recharge et mélange les pools depuis la table des produits
+
+        :param db: Session de base de données SQLAlchemy
+        """
+        try:
+            rows = db.query(
+                Product.id, Product.name, Product.price, Product.category_id
+            ).filter(
+                Product.is_active.is_(True),
+                or_(Product.stock.is_(None), Product.stock > 0)
+            ).all()
+
+            products = {row.id: (row.name, row.price, row.category_id) for row in rows}
+            order = list(products)
+            self._random.shuffle(order)
+
+            by_category: Dict[int, List[int]] = {}
+            for product_id in order:
+                category_id = products[product_id][2]
+                if category_id is not None:
+                    by_category.setdefault(category_id, []).append(product_id)
+
+            with self._lock:
+                self._products = products
+                self._order = order
+                self._by_category = by_category
+                self.loaded_at = time.monotonic()
+
+            self.logger.info(f"Pool de produits candidats rechargé : {len(order)} produits, {len(by_category)} catégories")
+        except Exception as e:
+            self.logger.error(f"Erreur lors du chargement du pool de produits candidats : {e}")
+
+    def upsert(self, product: Product):
+        """
+        Met à jour un produit créé ou modifié (retiré s'il n'est plus disponible)
+
+        :param product: Produit créé ou modifié
+        """
+        if not self._is_available(product.is_active, product.stock):
+            self.discard(product.id)
+            return
+
+        with self._lock:
+            if not self.loaded:
+                return
+            previous = self._products.get(product.id)
+            self._products[product.id] = (product.name, product.price, product.category_id)
+
+            if previous is None:
+                self._order.insert(self._random.randint(0, len(self._order)), product.id)
+            if product.category_id is not None and (previous is None or previous[2] != product.category_id):
+                pool = self._by_category.setdefault(product.category_id, [])
+                pool.insert(self._random.randint(0, len(pool)), product.id)
+
+    def discard(self, product_id: int):
+        """
+        Retire un produit supprimé, désactivé ou en rupture de stock
+
+        Son ID reste dans les listes jusqu'au prochain rechargement mais n'est plus tiré.
+
+        :param product_id: ID du produit
+        """
+        with self._lock:
+            self._products.pop(product_id, None)
+
+    def sample(self, k: int, exclude: Iterable[int] = (), category_id: Optional[int] = None) -> List[Tuple[int, str, float]]:
+        """
+        Tire jusqu'à k produits disponibles distincts, hors produits exclus
+
+        :param k: Nombre de produits souhaités
+        :param exclude: IDs à ignorer (déjà vus ou déjà recommandés)
+        :param category_id: Restreindre le tirage à une catégorie (optionnel)
+        :return: Liste de tuples (product_id, nom, prix)
+        """
+        if k <= 0:
+            return []
+
+        exclude = exclude if isinstance(exclude, (set, frozenset)) else set(exclude)
+        with self._lock:
+            pool = self._order if category_id is None else self._by_category.get(category_id, [])
+            n = len(pool)
+            if n == 0:
+                return []
+
+            sampled, taken = [], set()
+            start = self._random.randrange(n)
+            for step in range(n):
+                product_id = pool[(start + step) % n]
+                product = self._products.get(product_id)
+                if product is None or product_id in exclude or product_id in taken:
+                    continue
+                if category_id is not None and product[2] != category_id:
+                    continue
+                taken.add(product_id)
+                sampled.append((product_id, product[0], product[1]))
+                if len(sampled) == k:
+                    break
+
+        return sampled
@@ -0,0 +1,342 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix
+from sqlalchemy import func, select, union_all
+from sqlalchemy.orm import Session
+
+from models import Order, OrderStatus, Product, ProductRating, order_products
+
+# Verrou consultatif PostgreSQL : un seul worker entraîne et exporte les facteurs
+COLLABORATIVE_BUILD_LOCK = 7202
+
+
+class ImplicitALSRecommender:
+    """
+    Filtrage collaboratif par factorisation implicite (ALS) de la matrice utilisateur x produit
+
+    Une interaction est un achat (quantités des commandes non annulées, produit
+    principal et lignes `order_products`) ou une bonne note (au moins
+    `POSITIVE_RATING`). Suivant Hu, Koren et Volinsky, chaque cellule observée a
+    une préférence 1 et une confiance 1 + alpha * force ; les cellules non
+    observées une préférence 0 et une confiance 1. Les facteurs utilisateurs et
+    produits (float32, denses) sont obtenus par moindres carrés alternés, en
+    résolvant un système `factors` x `factors` par ligne.
+
+    Les meilleurs produits d'un utilisateur sont obtenus par un seul produit
+    matrice-vecteur (facteurs produits x facteurs de l'utilisateur) suivi
+    d'un argpartition, en excluant les produits déjà achetés ou notés et ceux
+    devenus indisponibles.
+    """
+
+    # Une note compte comme un achat de (note / 5) * RATING_WEIGHT unités
+    POSITIVE_RATING = 3
+    RATING_WEIGHT = 2.0
+
+    def __init__(self, factors: int = 32, iterations: int = 15, regularization: float = 10.0,
+                 alpha: float = 40.0, filepath: str = 'als_factors.npz', random_state: int = 42):
+        self.logger = logging.getLogger(__name__)
+        self.factors = factors
+        self.iterations = iterations
+        self.regularization = regularization
+        self.alpha = alpha
+        self.filepath = filepath
+        self.random_state = random_state
+        self.user_factors = np.empty((0, factors), dtype=np.float32)
+        self.item_factors = np.empty((0, factors), dtype=np.float32)
+        self._user_ids = np.empty(0, dtype=np.int64)
+        self._item_ids = np.empty(0, dtype=np.int64)
+        self._user_rows: Dict[int, int] = {}
+        self._item_rows: Dict[int, int] = {}
+        # Interactions d'entraînement (lignes utilisateurs, colonnes produits), exclues des recommandations
+        self._interactions = csr_matrix((0, 0), dtype=np.float32)
+        # Produits recommandables (désactivés, supprimés ou en rupture : False)
+        self._available = np.empty(0, dtype=bool)
+        self.built_at: Optional[float] = None
+        self.last_build_duration: Optional[float] = None
+        # Date de modification du fichier exporté correspondant aux facteurs servis
+        self._file_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def built(self) -> bool:
+        return self.built_at is not None
+
+    def _interaction_rows(self, db: Session) -> List[Tuple[int, int, float]]:
+        """
+        Triplets (user_id, product_id, force) des achats et des bonnes notes, pour les produits actifs
+        """
+        kept = Order.status.notin_([OrderStatus.CANCELLED.value, OrderStatus.RETURNED.value])
+        purchases = union_all(
+            db.query(
+                Order.customer_id.label('user_id'), Order.product_id.label('product_id'),
+                func.coalesce(Order.quantity, 1).label('strength')
+            ).filter(kept, Order.product_id.isnot(None)).statement,
+            db.query(
+                Order.customer_id, order_products.c.product_id, func.coalesce(order_products.c.quantity, 1)
+            ).join(order_products, order_products.c.order_id == Order.id).filter(kept).statement
+        ).subquery()
+        ratings = db.query(
+            ProductRating.user_id, ProductRating.product_id,
+            ProductRating.rating * (self.RATING_WEIGHT / 5.0)
+        ).filter(ProductRating.rating >= self.POSITIVE_RATING).statement
+
+        interactions = union_all(
+            db.query(purchases.c.user_id, purchases.c.product_id, purchases.c.strength).statement,
+            ratings
+        ).subquery()
+        return db.query(
+            interactions.c.user_id, interactions.c.product_id, func.sum(interactions.c.strength)
+        ).join(Product, Product.id == interactions.c.product_id).filter(
+            Product.is_active.is_(True), interactions.c.user_id.isnot(None)
+        ).group_by(interactions.c.user_id, interactions.c.product_id).all()
+
+    def _solve(self, fixed: np.ndarray, strengths: csr_matrix) -> np.ndarray:
+        """
+        Une demi-itération : facteurs de chaque ligne de `strengths`, ceux des colonnes étant fixés
+
+        Pour la ligne u de forces r : (YᵀY + Yᵤᵀ diag(alpha r) Yᵤ + λI) x = Yᵤᵀ (1 + alpha r),
+        où Yᵤ ne contient que les colonnes observées.
+        """
+        factors = fixed.shape[1]
+        gram = fixed.T @ fixed + self.regularization * np.eye(factors)
+        solved = np.zeros((strengths.shape[0], factors), dtype=np.float64)
+        indptr, indices, data = strengths.indptr, strengths.indices, strengths.data
+        for row in range(strengths.shape[0]):
+            start, end = indptr[row], indptr[row + 1]
+            if start == end:
+                continue
+            observed = fixed[indices[start:end]]
+            confidence = self.alpha * data[start:end]
+            A = gram + (observed.T * confidence) @ observed
+            b = observed.T @ (1.0 + confidence)
+            solved[row] = np.linalg.solve(A, b)
+        return solved
+
+    def fit(self, strengths: csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Factorise une matrice creuse de forces d'interaction (utilisateurs x produits)
+
+        :param strengths: Matrice CSR des forces (0 : pas d'interaction)
+        :return: Tuple (facteurs utilisateurs, facteurs produits) en float32
+        """
+        rng = np.random.default_rng(self.random_state)
+        n_users, n_items = strengths.shape
+        items = rng.normal(0, 0.01, size=(n_items, self.factors))
+        users = np.zeros((n_users, self.factors))
+        by_item = strengths.T.tocsr()
+        for _ in range(self.iterations):
+            users = self._solve(items, strengths)
+            items = self._solve(users, by_item)
+        return users.astype(np.float32), items.astype(np.float32)
+
+    def build(self, db: Session):
+        """
+        Réentraîne les facteurs depuis les commandes et les notes, puis les exporte
+
+        :param db: Session de base de données SQLAlchemy
+        """
+        try:
+            started = time.perf_counter()
+            rows = self._interaction_rows(db)
+            user_ids = np.unique(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+            item_ids = np.unique(np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows)))
+            strengths = coo_matrix((
+                np.fromiter((row[2] for row in rows), dtype=np.float32, count=len(rows)),
+                (np.searchsorted(user_ids, [row[0] for row in rows]),
+                 np.searchsorted(item_ids, [row[1] for row in rows]))
+            ), shape=(len(user_ids), len(item_ids))).tocsr()
+
+            user_factors, item_factors = self.fit(strengths)
+
+            with self._lock:
+                self._set_state(user_ids, item_ids, user_factors, item_factors, strengths)
+                self.last_build_duration = round(time.perf_counter() - started, 3)
+
+            self.logger.info(f"Facteurs ALS entraînés : {len(user_ids)} utilisateurs, {len(item_ids)} produits, "
+                             f"{strengths.nnz} interactions en {self.last_build_duration}s")
+            self.export()
+        except Exception as e:
+            db.rollback()
+            self.logger.error(f"Erreur lors de l'entraînement du modèle collaboratif : {e}")
+
+    def _set_state(self, user_ids: np.ndarray, item_ids: np.ndarray, user_factors: np.ndarray,
+                   item_factors: np.ndarray, interactions: csr_matrix):
+        """
+        Remplace les facteurs servis (verrou déjà acquis)
+        """
+        self.user_factors = np.ascontiguousarray(user_factors, dtype=np.float32)
+        self.item_factors = np.ascontiguousarray(item_factors, dtype=np.float32)
+        self._user_ids = user_ids
+        self._item_ids = item_ids
+        self._user_rows = {int(user_id): i for i, user_id in enumerate(user_ids)}
+        self._item_rows = {int(product_id): i for i, product_id in enumerate(item_ids)}
+        self._interactions = interactions
+        self._available = np.ones(len(item_ids), dtype=bool)
+        self.built_at = time.monotonic()
+
+    def export(self, filepath: str = None) -> bool:
+        """
+        Exporte les matrices de facteurs denses (float32) et les interactions d'entraînement
+
+        :param filepath: Chemin du fichier .npz (optionnel)
+        :return: True si l'export a réussi, False sinon
+        """
+        filepath = filepath or self.filepath
+        try:
+            with self._lock:
+                if not self.built:
+                    return False
+                arrays = {
+                    'user_ids': self._user_ids,
+                    'item_ids': self._item_ids,
+                    'user_factors': self.user_factors,
+                    'item_factors': self.item_factors,
+                    'indptr': self._interactions.indptr,
+                    'indices': self._interactions.indices,
+                    'data': self._interactions.data,
+                }
+
+            # Écriture atomique : fichier temporaire puis renommage
+            tmp_filepath = f"{filepath}.tmp.npz"
+            np.savez(tmp_filepath, **arrays)
+            os.replace(tmp_filepath, filepath)
+            if filepath == self.filepath:
+                self._file_mtime = os.path.getmtime(filepath)
+            self.logger.info(f"Facteurs ALS exportés à {filepath}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'export des facteurs ALS : {e}")
+            return False
+
+    def load(self, filepath: str = None) -> bool:
+        """
+        Charge des facteurs exportés
+
+        :param filepath: Chemin du fichier .npz (optionnel)
+        :return: True si le chargement a réussi, False sinon
+        """
+        filepath = filepath or self.filepath
+        try:
+            mtime = os.path.getmtime(filepath)
+            with np.load(filepath) as archive:
+                user_ids, item_ids = archive['user_ids'], archive['item_ids']
+                user_factors, item_factors = archive['user_factors'], archive['item_factors']
+                interactions = csr_matrix(
+                    (archive['data'], archive['indices'], archive['indptr']),
+                    shape=(len(user_ids), len(item_ids))
+                )
+
+            with self._lock:
+                self._set_state(user_ids, item_ids, user_factors, item_factors, interactions)
+                if filepath == self.filepath:
+                    self._file_mtime = mtime
+
+            self.logger.info(f"Facteurs ALS chargés depuis {filepath}")
+            return True
+        except Exception as e:
+            self.logger.warning(f"Facteurs ALS non trouvés ou erreur de chargement : {e}")
+            return False
+
+    def sync(self) -> bool:
+        """
+        Charge le fichier exporté s'il est plus récent que les facteurs servis (export d'un autre worker)
+
+        :return: True si de nouveaux facteurs ont été chargés
+        """
+        try:
+            mtime = os.path.getmtime(self.filepath)
+        except OSError:
+            return False
+        if self._file_mtime is not None and mtime <= self._file_mtime:
+            return False
+        return self.load()
+
+    def build_exclusive(self, db: Session, max_age_seconds: Optional[float] = None) -> bool:
+        """
+        Réentraîne sous verrou consultatif : un seul worker entraîne et exporte
+
+        Les autres workers récupèrent l'export par sync(). Si le fichier a été
+        exporté depuis moins de `max_age_seconds` (par un worker passé avant),
+        il est chargé au lieu d'être réentraîné.
+
+        :param db: Session de base de données SQLAlchemy
+        :param max_age_seconds: Âge maximal d'un export réutilisable (optionnel)
+        :return: True si les facteurs ont été entraînés ou chargés, False si un autre worker entraîne
+        """
+        # Verrou de session (et non de transaction) : l'entraînement ne garde pas de transaction ouverte.
+        # Il est pris et relâché sur une connexion dédiée, que la session rendrait au pool à chaque commit.
+        with db.get_bind().connect() as connection:
+            if not connection.execute(select(func.pg_try_advisory_lock(COLLABORATIVE_BUILD_LOCK))).scalar():
+                connection.rollback()
+                self.logger.info("Facteurs ALS en cours d'entraînement par un autre worker")
+                return False
+            connection.commit()
+            try:
+                if max_age_seconds is not None and os.path.exists(self.filepath) \
+                        and time.time() - os.path.getmtime(self.filepath) < max_age_seconds:
+                    return self.sync() or self.built
+                self.build(db)
+                return self.built
+            finally:
+                connection.execute(select(func.pg_advisory_unlock(COLLABORATIVE_BUILD_LOCK)))
+                connection.commit()
+
+    def upsert(self, product: Product):
+        """
+        Met à jour la disponibilité d'un produit modifié
+
+        Un produit sans facteurs (créé depuis l'entraînement) n'est recommandé
+        qu'après le prochain entraînement.
+
+        :param product: Produit créé ou modifié
+        """
+        with self._lock:
+            row = self._item_rows.get(product.id)
+            if row is not None:
+                self._available[row] = bool(product.is_active) and (product.stock is None or product.stock > 0)
+
+    def discard(self, product_id: int):
+        """
+        Exclut un produit supprimé, désactivé ou en rupture de stock des recommandations
+
+        :param product_id: ID du produit
+        """
+        with self._lock:
+            row = self._item_rows.get(product_id)
+            if row is not None:
+                self._available[row] = False
+
+    def recommend(self, user_id: int, k: int, exclude: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """
+        Meilleurs produits pour un utilisateur, hors produits déjà achetés ou notés
+
+        :param user_id: ID de l'utilisateur
+        :param k: Nombre maximum de produits
+        :param exclude: IDs de produits à exclure en plus
+        :return: Liste de tuples (product_id, score) par score décroissant (vide si l'utilisateur est inconnu)
+        """
+        with self._lock:
+            row = self._user_rows.get(user_id)
+            if row is None or k <= 0:
+                return []
+            item_factors, item_ids = self.item_factors, self._item_ids
+            user_vector = self.user_factors[row]
+            start, end = self._interactions.indptr[row], self._interactions.indptr[row + 1]
+            masked = np.concatenate([
+                self._interactions.indices[start:end],
+                np.flatnonzero(~self._available),
+                [self._item_rows[product_id] for product_id in exclude if product_id in self._item_rows]
+            ]).astype(np.intp)
+
+        scores = item_factors @ user_vector
+        scores[masked] = -np.inf
+        candidates = np.flatnonzero(np.isfinite(scores))
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        order = candidates[np.lexsort((item_ids[candidates], -scores[candidates]))]
+        return [(int(item_ids[i]), float(scores[i])) for i in order]
@@ -0,0 +1,229 @@
+import logging
+from typing import List, Optional, Sequence
+
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledForest:
+    """
+    Évaluateur NumPy d'un pipeline (ColumnTransformer + forêt aléatoire) entraîné
+
+    Le prétraitement est réduit à des constantes : moyennes et écarts types du
+    StandardScaler, et table (colonne brute, code) -> colonne one-hot. Les
+    arbres sont mis à plat dans des tableaux contigus (caractéristique, seuil,
+    enfant gauche, enfant droit, probabilités des feuilles) ; chaque feuille
+    boucle sur elle-même, si bien que tous les arbres descendent ensemble en
+    `max_depth` pas vectorisés. La prédiction d'une ligne se fait à partir
+    d'un simple tuple de caractéristiques, sans DataFrame ni validation
+    d'entrée sklearn.
+    """
+
+    def __init__(self, n_features: int, scaled_columns: np.ndarray, means: np.ndarray, scales: np.ndarray,
+                 onehot_columns: np.ndarray, onehot_values: np.ndarray, onehot_offset: int,
+                 n_transformed: int, roots: np.ndarray, feature: np.ndarray, threshold: np.ndarray,
+                 left: np.ndarray, right: np.ndarray, leaf_proba: np.ndarray, max_depth: int,
+                 classes: np.ndarray):
+        self.n_features = n_features
+        # Colonnes brutes standardisées, dans l'ordre de sortie du ColumnTransformer
+        self.scaled_columns = scaled_columns
+        self.means = means
+        self.scales = scales
+        # Colonnes brutes et valeurs des indicatrices one-hot, à partir de onehot_offset
+        self.onehot_columns = onehot_columns
+        self.onehot_values = onehot_values
+        self.onehot_offset = onehot_offset
+        self.n_transformed = n_transformed
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        # Enfants gauche et droit entrelacés (2 * nœud + aller à droite), pour la descente d'une seule ligne
+        self.children = np.column_stack([left, right]).ravel()
+        self.leaf_proba = leaf_proba
+        self.max_depth = max_depth
+        self.classes = classes
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Mémoire occupée par les tableaux de l'évaluateur
+        """
+        return sum(array.nbytes for array in (
+            self.roots, self.feature, self.threshold, self.left, self.right, self.children, self.leaf_proba
+        ))
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """
+        Applique le prétraitement replié à des vecteurs bruts (n x n_features)
+
+        Les calculs suivent ceux de sklearn (standardisation en float32) afin de
+        comparer exactement les mêmes valeurs aux seuils.
+        """
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features)
+        out = np.zeros((len(X), self.n_transformed), dtype=np.float32)
+        scaled = X[:, self.scaled_columns]
+        scaled -= self.means
+        scaled /= self.scales
+        out[:, :len(self.scaled_columns)] = scaled
+        out[:, self.onehot_offset:self.onehot_offset + len(self.onehot_values)] = (
+            X[:, self.onehot_columns] == self.onehot_values
+        )
+        return out
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Probabilités moyennes des arbres (n x classes)
+
+        :param X: Vecteurs bruts (n x n_features)
+        """
+        Xt = self.transform(X)
+        rows = np.arange(len(Xt))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(Xt), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = Xt[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.leaf_proba[nodes].sum(axis=1) / len(self.roots)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Classes prédites de vecteurs bruts (n x n_features)
+        """
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+    def predict_one(self, features: Sequence[float]):
+        """
+        Classe prédite d'une ligne donnée par un tuple de caractéristiques brutes (FEATURE_COLUMNS)
+        """
+        x = self.transform(features)[0]
+        nodes = self.roots
+        for _ in range(self.max_depth):
+            descended = self.children[2 * nodes + (x[self.feature[nodes]] > self.threshold[nodes])]
+            # Tous les arbres sont sur une feuille
+            if np.array_equal(descended, nodes):
+                break
+            nodes = descended
+        return self.classes[np.argmax(self.leaf_proba[nodes].sum(axis=0))]
+
+
+def _flatten_trees(forest: RandomForestClassifier):
+    """
+    Met bout à bout les nœuds de tous les arbres (indices d'enfants globaux, feuilles bouclant sur elles-mêmes)
+    """
+    roots, features, thresholds, lefts, rights, probas = [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        is_leaf = tree.children_left == -1
+        own = np.arange(offset, offset + n_nodes)
+
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        # Feuille : seuil +inf, les deux enfants désignent la feuille elle-même
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        lefts.append(np.where(is_leaf, own, tree.children_left + offset))
+        rights.append(np.where(is_leaf, own, tree.children_right + offset))
+
+        value = tree.value[:, 0, :forest.n_classes_].astype(np.float64)
+        normalizer = value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        probas.append(value / normalizer)
+
+        offset += n_nodes
+        max_depth = max(max_depth, tree.max_depth)
+
+    return (np.asarray(roots, dtype=np.intp), np.concatenate(features).astype(np.intp),
+            np.concatenate(thresholds), np.concatenate(lefts).astype(np.intp),
+            np.concatenate(rights).astype(np.intp), np.concatenate(probas), max_depth)
+
+
+def _probe_inputs(compiled: CompiledForest, n: int, random_state: int = 0) -> np.ndarray:
+    """
+    Vecteurs bruts de contrôle : valeurs autour des moyennes apprises, codes connus et inconnus
+    """
+    rng = np.random.default_rng(random_state)
+    X = rng.integers(-1, 5, size=(n, compiled.n_features)).astype(np.float32)
+    if len(compiled.scaled_columns):
+        X[:, compiled.scaled_columns] = rng.normal(
+            compiled.means, compiled.scales * 2, size=(n, len(compiled.scaled_columns))
+        ).clip(min=0)
+    for column in np.unique(compiled.onehot_columns):
+        values = np.append(compiled.onehot_values[compiled.onehot_columns == column], -1)
+        X[:, column] = rng.choice(values, size=n)
+    return X
+
+
+def compile_pipeline(pipeline, n_features: int, probes: int = 512) -> Optional[CompiledForest]:
+    """
+    Compile un pipeline entraîné et vérifie sa parité avec sklearn
+
+    Seuls les pipelines ColumnTransformer (StandardScaler, OneHotEncoder, colonnes
+    ignorées) suivis d'une forêt aléatoire sont compilés. L'évaluateur n'est
+    retourné que s'il prédit les mêmes classes que le pipeline sur des
+    vecteurs de contrôle.
+
+    :param pipeline: Pipeline sklearn ('preprocessor', 'classifier')
+    :param n_features: Nombre de caractéristiques brutes
+    :param probes: Nombre de vecteurs de contrôle
+    :return: Évaluateur compilé, ou None si le pipeline n'est pas pris en charge
+    """
+    try:
+        preprocessor = pipeline.named_steps['preprocessor']
+        forest = pipeline.named_steps['classifier']
+        if not isinstance(preprocessor, ColumnTransformer) or not isinstance(forest, RandomForestClassifier):
+            return None
+        if forest.n_outputs_ != 1:
+            return None
+
+        scaled_columns: List[int] = []
+        means: List[float] = []
+        scales: List[float] = []
+        onehot_columns: List[int] = []
+        onehot_values: List[float] = []
+        for _, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            # Le repli suppose la sortie standardisée avant les indicatrices one-hot
+            if isinstance(transformer, StandardScaler) and not onehot_columns:
+                scaled_columns.extend(columns)
+                means.extend(transformer.mean_ if transformer.mean_ is not None else np.zeros(len(columns)))
+                scales.extend(transformer.scale_ if transformer.scale_ is not None else np.ones(len(columns)))
+            elif isinstance(transformer, OneHotEncoder) and transformer.drop_idx_ is None:
+                for column, categories in zip(columns, transformer.categories_):
+                    onehot_columns.extend([column] * len(categories))
+                    onehot_values.extend(categories)
+            else:
+                return None
+
+        roots, feature, threshold, left, right, leaf_proba, max_depth = _flatten_trees(forest)
+        compiled = CompiledForest(
+            n_features=n_features,
+            scaled_columns=np.asarray(scaled_columns, dtype=np.intp),
+            # Constantes en float32, comme StandardScaler.transform sur des entrées float32
+            means=np.asarray(means, dtype=np.float32),
+            scales=np.asarray(scales, dtype=np.float32),
+            onehot_columns=np.asarray(onehot_columns, dtype=np.intp),
+            onehot_values=np.asarray(onehot_values, dtype=np.float32),
+            onehot_offset=len(scaled_columns),
+            n_transformed=len(scaled_columns) + len(onehot_values),
+            roots=roots, feature=feature, threshold=threshold, left=left, right=right,
+            leaf_proba=leaf_proba, max_depth=max_depth,
+            classes=forest.classes_
+        )
+
+        # Contrôle de parité avec sklearn
+        X = _probe_inputs(compiled, probes)
+        if not np.array_equal(compiled.predict(X), pipeline.predict(X)):
+            logger.warning("Modèle compilé divergent de sklearn sur les vecteurs de contrôle - non utilisé")
+            return None
+        return compiled
+
+    except Exception as e:
+        logger.warning(f"Compilation du modèle impossible : {e}")
+        return None
@@ -0,0 +1,298 @@
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix, triu
+from sqlalchemy import and_, func, or_, select, union
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models import Order, OrderStatus, ProductCopurchase, order_products
+
+# Verrou consultatif PostgreSQL de la table partagée : exclusif pour la réécrire, partagé pour l'incrémenter
+COPURCHASE_TABLE_LOCK = 7204
+
+
+class CoPurchaseIndex:
+    """
+    Matrice creuse produit x produit des achats conjoints
+
+    Le panier d'un client est l'ensemble des produits de ses commandes livrées
+    (produit de la commande et lignes de `order_products`). La cellule (p, q)
+    compte le nombre de clients ayant acheté p et q. Les lignes et colonnes
+    sont indexées directement par l'ID produit.
+
+    La table `product_copurchases` (une ligne par paire p < q) est partagée
+    par les workers : chaque livraison y incrémente ses paires, et chaque
+    worker recharge périodiquement la matrice depuis la table, ce qui lui
+    apporte les livraisons traitées par les autres. La table n'est réécrite
+    depuis les commandes qu'au démarrage si elle est vide, par un seul worker.
+    """
+
+    # Taille des lots d'insertion lors de l'initialisation de la table
+    INSERT_BATCH_SIZE = 10000
+
+    def __init__(self, compact_threshold: int = 5000):
+        self.logger = logging.getLogger(__name__)
+        self.compact_threshold = compact_threshold
+        self.matrix = csr_matrix((1, 1), dtype=np.int32)
+        # Incréments pas encore fusionnés dans la matrice CSR : {p: {q: n}}
+        self._pending: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self._pending_count = 0
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _delivered_baskets_query(db: Session):
+        """
+        Requête (customer_id, product_id, delivered_at) des produits des commandes livrées
+        """
+        direct = db.query(
+            Order.customer_id, Order.product_id, Order.delivered_at
+        ).filter(Order.status == OrderStatus.DELIVERED.value)
+        lines = db.query(
+            Order.customer_id, order_products.c.product_id, Order.delivered_at
+        ).join(
+            order_products, order_products.c.order_id == Order.id
+        ).filter(Order.status == OrderStatus.DELIVERED.value)
+
+        return union(direct, lines)
+
+    @staticmethod
+    def _order_product_ids(order: Order, db: Session) -> Set[int]:
+        """
+        Produits d'une commande : produit principal et lignes de `order_products`
+        """
+        product_ids = {order.product_id}
+        rows = db.query(order_products.c.product_id).filter(order_products.c.order_id == order.id).all()
+        product_ids.update(row.product_id for row in rows)
+        return product_ids
+
+    def build(self, db: Session):
+        """
+        Reconstruit entièrement la matrice depuis les commandes livrées et réécrit la table partagée
+
+        Le verrou exclusif, gardé jusqu'à la validation, fait attendre les livraisons
+        concurrentes : un incrément validé entre la lecture des commandes et la
+        réécriture serait effacé.
+
+        :param db: Session de base de données SQLAlchemy
+        """
+        db.execute(select(func.pg_advisory_xact_lock(COPURCHASE_TABLE_LOCK)))
+        rows = db.execute(self._delivered_baskets_query(db)).all()
+
+        customers = {}
+        customer_idx, product_idx = [], []
+        for customer_id, product_id, _ in rows:
+            customer_idx.append(customers.setdefault(customer_id, len(customers)))
+            product_idx.append(product_id)
+
+        n_products = max(product_idx) + 1 if product_idx else 1
+        baskets = csr_matrix(
+            (np.ones(len(product_idx), dtype=np.int32), (customer_idx, product_idx)),
+            shape=(max(len(customers), 1), n_products)
+        )
+        # Panier binaire : un produit compte une seule fois par client
+        baskets.data[:] = 1
+
+        matrix = (baskets.T @ baskets).tocsr()
+        matrix.setdiag(0)
+        matrix.eliminate_zeros()
+
+        # Une ligne par paire p < q
+        pairs = triu(matrix, k=1).tocoo()
+        try:
+            db.query(ProductCopurchase).delete(synchronize_session=False)
+            for start in range(0, pairs.nnz, self.INSERT_BATCH_SIZE):
+                chunk = slice(start, start + self.INSERT_BATCH_SIZE)
+                db.execute(insert(ProductCopurchase), [
+                    {'product_id': p, 'other_product_id': q, 'customer_count': n}
+                    for p, q, n in zip(pairs.row[chunk].tolist(), pairs.col[chunk].tolist(), pairs.data[chunk].tolist())
+                ])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.logger.error(f"Erreur lors de l'écriture de la table des achats conjoints : {e}")
+
+        with self._lock:
+            self.matrix = matrix.astype(np.int32)
+            self._pending.clear()
+            self._pending_count = 0
+            self.loaded = True
+
+        self.logger.info(f"Index d'achats conjoints reconstruit : {len(customers)} clients, {pairs.nnz} paires")
+
+    def load(self, db: Session, build_if_empty: bool = False):
+        """
+        Charge la matrice depuis la table partagée
+
+        :param db: Session de base de données SQLAlchemy
+        :param build_if_empty: Initialiser la table depuis les commandes si elle est vide (démarrage)
+        """
+        try:
+            # Un seul worker initialise la table ; les autres chargent ce qu'elle contient
+            # et récupèrent la table initialisée au rechargement suivant
+            if build_if_empty and db.query(ProductCopurchase.product_id).first() is None \
+                    and db.execute(select(func.pg_try_advisory_xact_lock(COPURCHASE_TABLE_LOCK))).scalar() \
+                    and db.query(ProductCopurchase.product_id).first() is None:
+                self.build(db)
+                return
+
+            rows = db.query(
+                ProductCopurchase.product_id, ProductCopurchase.other_product_id, ProductCopurchase.customer_count
+            ).all()
+            # Fin de la transaction (et du verrou éventuellement pris) : lecture seule
+            db.commit()
+            p = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            q = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+            n = np.fromiter((row[2] for row in rows), dtype=np.int32, count=len(rows))
+            size = int(max(p.max(), q.max())) + 1 if rows else 1
+            # Matrice symétrique à partir des paires p < q
+            matrix = coo_matrix(
+                (np.concatenate([n, n]), (np.concatenate([p, q]), np.concatenate([q, p]))),
+                shape=(size, size), dtype=np.int32
+            ).tocsr()
+
+            with self._lock:
+                self.matrix = matrix
+                self._pending.clear()
+                self._pending_count = 0
+                self.loaded = True
+
+            self.logger.info(f"Index d'achats conjoints chargé : {len(rows)} paires")
+        except Exception as e:
+            db.rollback()
+            self.logger.error(f"Erreur lors du chargement de l'index d'achats conjoints : {e}")
+
+    def record_delivery(self, order: Order, db: Session):
+        """
+        Intègre une commande livrée dans l'index (mise à jour incrémentale)
+
+        :param order: Commande qui vient d'être livrée
+        :param db: Session de base de données SQLAlchemy
+        """
+        try:
+            # Verrou partagé jusqu'à la validation : attend la fin d'une réécriture de la table
+            db.execute(select(func.pg_advisory_xact_lock_shared(COPURCHASE_TABLE_LOCK)))
+            new_products = self._order_product_ids(order, db)
+
+            # Produits déjà présents dans le panier du client avant cette commande
+            delivered_before = and_(
+                Order.customer_id == order.customer_id,
+                Order.status == OrderStatus.DELIVERED.value,
+                Order.id != order.id
+            )
+            if order.delivered_at is not None:
+                delivered_before = and_(delivered_before, or_(
+                    Order.delivered_at < order.delivered_at,
+                    and_(Order.delivered_at == order.delivered_at, Order.id < order.id)
+                ))
+            previous_products = {
+                row.product_id for row in db.query(Order.product_id).filter(delivered_before)
+            }
+            previous_products.update(
+                row.product_id for row in db.query(order_products.c.product_id).join(
+                    Order, order_products.c.order_id == Order.id
+                ).filter(delivered_before)
+            )
+
+            pairs = self._new_pairs(new_products - previous_products, previous_products)
+            if not pairs:
+                return
+
+            # Table partagée d'abord : les autres workers la rechargent
+            db.execute(insert(ProductCopurchase).values([
+                {'product_id': p, 'other_product_id': q, 'customer_count': 1} for p, q in pairs
+            ]).on_conflict_do_update(
+                index_elements=[ProductCopurchase.product_id, ProductCopurchase.other_product_id],
+                set_={'customer_count': ProductCopurchase.customer_count + 1}
+            ))
+            db.commit()
+
+            self._add_pairs(pairs)
+
+        except Exception as e:
+            db.rollback()
+            self.logger.error(f"Erreur lors de la mise à jour de l'index d'achats conjoints : {e}")
+
+    @staticmethod
+    def _new_pairs(added: Iterable[int], basket: Set[int]) -> List[Tuple[int, int]]:
+        """
+        Paires (p, q), p < q, formées par les produits ajoutés au panier d'un client
+        """
+        added = sorted(product_id for product_id in added if product_id is not None)
+        basket = [product_id for product_id in basket if product_id is not None]
+        pairs = []
+        for i, p in enumerate(added):
+            for q in basket + added[i + 1:]:
+                pairs.append((min(p, q), max(p, q)))
+        return pairs
+
+    def _add_pairs(self, pairs: List[Tuple[int, int]]):
+        """
+        Incrémente en mémoire les cellules (p, q) et (q, p) des paires
+        """
+        with self._lock:
+            for p, q in pairs:
+                self._pending[p][q] += 1
+                self._pending[q][p] += 1
+                self._pending_count += 2
+
+            if self._pending_count >= self.compact_threshold:
+                self._compact()
+
+    def _compact(self):
+        """
+        Fusionne les incréments en attente dans la matrice CSR (verrou déjà acquis)
+        """
+        if not self._pending:
+            return
+
+        rows, cols, data = [], [], []
+        for p, counts in self._pending.items():
+            for q, n in counts.items():
+                rows.append(p)
+                cols.append(q)
+                data.append(n)
+
+        size = max(self.matrix.shape[0], max(rows) + 1, max(cols) + 1)
+        matrix = self.matrix.copy()
+        matrix.resize((size, size))
+        delta = coo_matrix((data, (rows, cols)), shape=(size, size), dtype=np.int32).tocsr()
+        self.matrix = (matrix + delta).tocsr()
+
+        self._pending.clear()
+        self._pending_count = 0
+
+    def top_k(self, product_id: int, k: int) -> List[Tuple[int, int]]:
+        """
+        Retourne les k produits les plus souvent achetés avec un produit
+
+        :param product_id: ID du produit de référence
+        :param k: Nombre de produits à retourner
+        :return: Liste de tuples (product_id, nombre de clients communs) triée par fréquence
+        """
+        with self._lock:
+            counts = {}
+            if product_id < self.matrix.shape[0]:
+                start, end = self.matrix.indptr[product_id], self.matrix.indptr[product_id + 1]
+                counts = dict(zip(
+                    self.matrix.indices[start:end].tolist(),
+                    self.matrix.data[start:end].tolist()
+                ))
+            for q, n in self._pending.get(product_id, {}).items():
+                counts[q] = counts.get(q, 0) + n
+
+        counts.pop(product_id, None)
+        if not counts:
+            return []
+
+        ids = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        if len(ids) > k:
+            top = np.argpartition(-values, k - 1)[:k]
+            ids, values = ids[top], values[top]
+        order = np.lexsort((ids, -values))
+        return [(int(ids[i]), int(values[i])) for i in order]
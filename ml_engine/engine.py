@@ -1,24 +1,75 @@
-from pandas import DataFrame, Series
+import numpy as np
+from pandas import DataFrame, Series, Timestamp, isna
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, confusion_matrix
-import joblib
+from sklearn.base import clone
+from sklearn.metrics import classification_report, confusion_matrix, f1_score
+from sklearn.utils.class_weight import compute_class_weight
+import copy
+import json
 import logging
+import multiprocessing
 import os
+from concurrent.futures import Future, ProcessPoolExecutor
 from typing import Dict, List, Tuple, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import Select, case, func, desc, literal, or_, select, union_all
 import threading
 import time
 import datetime
 import schedule
 
-from models import UserPreferenceProfile, Order, Product, Banner, get_db
+from sqlalchemy.dialects.postgresql import insert
+
+from models import UserPreferenceProfile, UserEngagementLevel, Order, Product, Banner, get_db
+from .interest_scoring import InterestScorer
+from .copurchase import CoPurchaseIndex
+from .candidate_pool import CandidatePool
+from .similarity import ProductSimilarityIndex
+from .keyword_index import SeasonalKeywordIndex
+from .trending import TrendingCounters
+from .popularity import PopularProducts
+from .profile_aggregator import ProfileAggregator
+from .audience_index import AudienceIndex
+from .recommendation_cache import recommendation_cache
+from .collaborative import ImplicitALSRecommender
+from .metrics import PipelineMetrics, track_latency
+from .compiled_model import compile_pipeline
+from .estimators import (
+    DEFAULT_BACKEND, DEFAULT_MODEL_GRID, ESTIMATOR_BACKENDS, backend_of, build_estimator,
+    inference_latency, model_size_bytes, select_configuration
+)
+from .features import FEATURE_COLUMNS, FEATURE_VERSION, engagement_levels
+from .feature_store import FeatureStore
+from .sampling import StratifiedReservoirSampler
+from .registry import ModelRegistry
+from .training_worker import run_training_job
+
+# Verrou consultatif PostgreSQL : un seul worker lance un processus d'entraînement
+MODEL_TRAINING_LOCK = 7203
 
 class UserInterestPredictor:
+    # Caractéristiques utilisées par le modèle
+    # (entrées positionnelles du modèle : colonnes des vecteurs du magasin de caractéristiques)
+    NUMERICAL_FEATURES = ['total_orders', 'average_order_value', 'top_category']
+    CATEGORICAL_FEATURES = ['preferred_purchase_time']
+    FEATURES = list(FEATURE_COLUMNS)
+    
+    # Seuils et quotas des stratégies de generate_recommendations (réglables, voir benchmarks.replay)
+    DEFAULT_RECOMMENDATION_CONFIG = {
+        'target': 6,               # Nombre de recommandations souhaitées
+        'collaborative_count': 2,  # Produits du filtrage collaboratif (0 : stratégie désactivée)
+        'per_strategy': 2,         # Produits par stratégie
+        'discount_count': 3,       # Produits en promotion (utilisateurs peu engagés)
+        'premium_price': 100,      # Seuil "premium"
+        'affordable_price': 50,    # Seuil "abordable"
+        'highly_rated_min': 4,     # Note minimale "très bien noté"
+        'new_arrival_days': 30,    # Ancienneté maximale d'une nouveauté
+    }
+    
     def __init__(self):
         """
         Initialise le prédicteur d'intérêts utilisateur
@@ -30,23 +81,198 @@ class UserInterestPredictor:
         
         # Modèle de machine learning
         self.model = None
+        # Évaluateur NumPy compilé du modèle courant (None si non pris en charge ou désactivé)
+        self.compiled_model = None
+        self.compiled_inference = os.getenv("ML_COMPILED_INFERENCE", "1") == "1"
         self.preprocessor = None
-        self.model_filepath = 'user_interest_model.joblib'
         self.last_training_time = None
         self.model_performance = None
         
+        # Registre versionné des modèles et version actuellement servie
+        self.registry = ModelRegistry(os.getenv("ML_MODEL_REGISTRY_DIR", "model_registry"))
+        self.model_version = None
+        self._model_lock = threading.Lock()
+        self._load_thread: Optional[threading.Thread] = None
+        
+        # Configuration des stratégies de recommandation
+        self.recommendation_config = dict(self.DEFAULT_RECOMMENDATION_CONFIG)
+        
+        # Entraînement dans un processus séparé, limité en CPU
+        self.training_n_jobs = int(os.getenv("ML_TRAINING_CPUS", "1"))
+        self.training_niceness = int(os.getenv("ML_TRAINING_NICE", "10"))
+        self._training_future: Optional[Future] = None
+        self._training_lock = threading.Lock()
+        # Connexion détenant le verrou consultatif pendant l'entraînement lancé par ce worker
+        self._training_lock_connection = None
+        # Délai minimal entre deux entraînements demandés faute de modèle
+        self.training_retry_seconds = int(os.getenv("ML_TRAINING_RETRY_SECONDS", "900"))
+        self._last_training_request = None
+        
+        # Mesures par étape des entraînements et latences d'inférence
+        self.metrics = PipelineMetrics()
+        
+        # Suivi de l'entraînement incrémental
+        self.training_watermark = None  # updated_at du dernier profil intégré au modèle
+        self.last_full_training_time = None
+        self.last_training_mode = None  # 'full' ou 'incremental'
+        self.last_training_duration = None  # en secondes
+        self.full_retrain_interval_days = int(os.getenv("ML_FULL_RETRAIN_DAYS", "7"))
+        self.incremental_trees = int(os.getenv("ML_INCREMENTAL_TREES", "10"))
+        self.max_forest_size = int(os.getenv("ML_MAX_FOREST_SIZE", "300"))
+        self.drift_threshold = float(os.getenv("ML_DRIFT_THRESHOLD", "0.1"))
+        self.extract_chunk_size = int(os.getenv("ML_EXTRACT_CHUNK_SIZE", "10000"))
+        # Échantillon d'entraînement stratifié par classe (0 : tous les profils) et budget de lecture
+        self.training_sample_size = int(os.getenv("ML_TRAINING_SAMPLE_SIZE", "200000"))
+        self.training_sample_seconds = float(os.getenv("ML_TRAINING_SAMPLE_SECONDS", "300")) or None
+        self.last_training_sample = None
+        
+        # Classifieur d'engagement (voir ESTIMATOR_BACKENDS)
+        self.estimator_backend = os.getenv("ML_ESTIMATOR_BACKEND", DEFAULT_BACKEND)
+        if self.estimator_backend not in ESTIMATOR_BACKENDS:
+            self.logger.error(f"Backend de classifieur inconnu : {self.estimator_backend} - {DEFAULT_BACKEND} utilisé")
+            self.estimator_backend = DEFAULT_BACKEND
+        
+        # Sélection de modèle : configurations évaluées à chaque entraînement complet, la plus
+        # précise respectant les budgets de latence unitaire p99 et de mémoire est retenue
+        self.model_selection = os.getenv("ML_MODEL_SELECTION", "1") == "1"
+        self.model_grid = self._load_model_grid(os.getenv("ML_MODEL_GRID"))
+        self.latency_budget_ms = float(os.getenv("ML_LATENCY_BUDGET_MS", "5"))
+        self.memory_budget_bytes = int(float(os.getenv("ML_MODEL_MEMORY_BUDGET_MB", "64")) * 1024 * 1024)
+        
+        # Vecteurs de caractéristiques précalculés, partagés par l'entraînement et l'inférence
+        self.feature_store = FeatureStore(chunk_size=self.extract_chunk_size)
+        
+        # Moteur de scoring vectorisé pour find_interested_users
+        self.interest_scorer = InterestScorer()
+        
+        # Audience candidate par catégorie et tranche de panier moyen, avant le scoring exact
+        self.audience_index = AudienceIndex()
+        self.audience_max_candidates = int(os.getenv("ML_AUDIENCE_MAX_CANDIDATES", "5000"))
+        
+        # Index des achats conjoints pour get_complementary_products
+        self.copurchase_index = CoPurchaseIndex()
+        
+        # Produits actifs pré-mélangés pour compléter les recommandations
+        self.candidate_pool = CandidatePool()
+        
+        # Voisins de contenu précalculés pour get_similar_products
+        self.similarity_index = ProductSimilarityIndex()
+        self._similarity_thread: Optional[threading.Thread] = None
+        
+        # Index inversé des mots-clés saisonniers pour get_seasonal_products
+        self.seasonal_index = SeasonalKeywordIndex()
+        
+        # Compteurs de commandes journaliers pour get_trending_products
+        self.trending_counters = TrendingCounters()
+        
+        # Classements des produits populaires (recommandations de repli et /api/popular-products)
+        self.popular_products = PopularProducts(top_n=int(os.getenv("ML_POPULAR_TOP_N", "100")))
+        
+        # Filtrage collaboratif (ALS implicite sur les achats et les notes), réentraîné chaque jour
+        self.collaborative_enabled = os.getenv("ML_COLLABORATIVE", "1") == "1"
+        self.collaborative = ImplicitALSRecommender(
+            factors=int(os.getenv("ML_ALS_FACTORS", "32")),
+            iterations=int(os.getenv("ML_ALS_ITERATIONS", "15")),
+            regularization=float(os.getenv("ML_ALS_REGULARIZATION", "10")),
+            alpha=float(os.getenv("ML_ALS_ALPHA", "40")),
+            filepath=os.getenv("ML_ALS_FACTORS_PATH", "als_factors.npz")
+        )
+        self._collaborative_thread: Optional[threading.Thread] = None
+        
+        # Intégration par lots des commandes livrées aux profils de préférences
+        self.profile_aggregator = ProfileAggregator(
+            self.feature_store,
+            batch_size=int(os.getenv("ML_PROFILE_BATCH_SIZE", "500")),
+            flush_delay=float(os.getenv("ML_PROFILE_FLUSH_DELAY", "2"))
+        )
+        self.profile_aggregator.add_listener(self.audience_index.update)
+        
         # Planificateur pour l'entraînement automatique
         self.scheduler_thread = None
         self.scheduler_running = False
         
-        # Essayer de charger un modèle existant au démarrage
-        self.load_model()
+        # Le modèle n'est pas chargé ici : voir load_model_in_background()
     
-    def start_scheduler(self, training_time="02:00"):
+    def load_model_in_background(self) -> threading.Thread:
+        """
+        Charge le modèle actif dans un thread, sans bloquer le démarrage
+        
+        Tant que le chargement n'est pas terminé, les prédictions servent les
+        recommandations de repli.
+        
+        :return: Thread de chargement
+        """
+        with self._model_lock:
+            if self._load_thread is not None and self._load_thread.is_alive():
+                return self._load_thread
+            self._load_thread = threading.Thread(target=self.load_model, name="model-loader", daemon=True)
+            self._load_thread.start()
+            return self._load_thread
+    
+    def build_similarity_index_in_background(self) -> threading.Thread:
+        """
+        Construit l'index de similarité dans un thread, sans bloquer le démarrage
+        
+        Tant que l'index n'est pas construit, get_similar_products se replie sur
+        la proximité de prix.
+        
+        :return: Thread de construction
+        """
+        with self._model_lock:
+            if self._similarity_thread is not None and self._similarity_thread.is_alive():
+                return self._similarity_thread
+            self._similarity_thread = threading.Thread(
+                target=self.rebuild_similarity_index, name="similarity-builder", daemon=True
+            )
+            self._similarity_thread.start()
+            return self._similarity_thread
+    
+    def build_collaborative_in_background(self) -> threading.Thread:
+        """
+        Entraîne les facteurs du filtrage collaboratif dans un thread, sans bloquer le démarrage
+        
+        La stratégie collaborative reste inactive tant que les facteurs ne sont pas prêts.
+        
+        :return: Thread d'entraînement
+        """
+        with self._model_lock:
+            if self._collaborative_thread is not None and self._collaborative_thread.is_alive():
+                return self._collaborative_thread
+            self._collaborative_thread = threading.Thread(
+                target=self.rebuild_collaborative_model, name="collaborative-builder", daemon=True
+            )
+            self._collaborative_thread.start()
+            return self._collaborative_thread
+    
+    def is_model_loading(self) -> bool:
+        """
+        Indique si un chargement du modèle en arrière-plan est en cours
+        """
+        thread = self._load_thread
+        return thread is not None and thread.is_alive()
+    
+    def request_training(self) -> Optional[Future]:
+        """
+        Demande un entraînement lorsqu'aucun modèle n'est disponible
+        
+        Les demandes sont espacées d'au moins `training_retry_seconds`, pour ne pas
+        relancer un processus à chaque requête quand les données sont insuffisantes.
+        
+        :return: Future de l'entraînement lancé, ou None
+        """
+        now = time.monotonic()
+        if self._last_training_request is not None and now - self._last_training_request < self.training_retry_seconds:
+            return None
+        self._last_training_request = now
+        self.logger.warning("Aucun modèle n'est disponible. Entraînement mis en file d'attente")
+        return self.submit_training(trigger='missing_model')
+    
+    def start_scheduler(self, training_time="02:00", precompute_time="03:00"):
         """
         Démarre le planificateur pour entraîner le modèle à une heure précise chaque jour
         
         :param training_time: Heure d'entraînement au format "HH:MM"
+        :param precompute_time: Heure du précalcul nocturne des niveaux d'engagement au format "HH:MM"
         """
         # S'assurer que tout planificateur existant est arrêté
         self.stop_scheduler()
@@ -56,6 +282,33 @@ class UserInterestPredictor:
         # Effacer les tâches existantes et planifier l'entraînement à l'heure spécifiée
         schedule.clear()
         schedule.every().day.at(training_time).do(self.scheduled_training)
+        schedule.every().day.at(precompute_time).do(self.scheduled_precompute)
+        
+        # Resynchronisation de l'index des achats conjoints avec la table (livraisons traitées par les autres workers)
+        schedule.every(30).minutes.do(self.reload_copurchase_index)
+        
+        # Rechargement du pool de produits candidats
+        schedule.every(10).minutes.do(self.refresh_candidate_pool)
+        
+        # Resynchronisation des compteurs tendance avec la table (commandes reçues par les autres workers)
+        schedule.every(15).minutes.do(self.reload_trending_counters)
+        
+        # Rechargement des classements de popularité (commandes reçues par les autres workers)
+        schedule.every(10).minutes.do(self.refresh_popular_products)
+        
+        # Reconstruction complète de l'index de similarité (vocabulaire TF-IDF compris)
+        schedule.every().day.at(precompute_time).do(self.rebuild_similarity_index)
+        schedule.every().day.at(precompute_time).do(self.rebuild_seasonal_index)
+        schedule.every().day.at(precompute_time).do(self.rebuild_audience_index)
+        # Profils agrégés par un autre worker : l'index d'audience de ce worker les rattrape
+        schedule.every(2).minutes.do(self.catch_up_audience_index)
+        if self.collaborative_enabled:
+            schedule.every().day.at(precompute_time).do(self.rebuild_collaborative_model)
+            # Facteurs exportés par le worker qui a entraîné
+            schedule.every(5).minutes.do(self.collaborative.sync)
+        
+        # Suivre la version active du registre (activée par un autre worker ou un rollback)
+        schedule.every(5).minutes.do(self.sync_with_registry)
         
         self.logger.info(f"Entraînement planifié tous les jours à {training_time}")
         
@@ -87,21 +340,255 @@ class UserInterestPredictor:
         """
         self.logger.info("Démarrage de l'entraînement planifié")
         
-        # Obtenir une session de base de données
+        # Pas d'attente : le résultat est traité par _on_training_done, le planificateur
+        # continue d'exécuter les autres tâches pendant l'entraînement
+        self.submit_training(trigger='scheduled')
+    
+    def submit_training(self, mode: str = 'auto', trigger: str = 'manual') -> Optional[Future]:
+        """
+        Lance l'entraînement dans un processus séparé (un seul à la fois)
+        
+        Le processus enfant entraîne, enregistre la nouvelle version dans le registre
+        et précalcule les niveaux d'engagement ; à la fin, la version est chargée
+        ici et remplace atomiquement le modèle servi.
+        
+        :param mode: Mode d'entraînement ('auto', 'full' ou 'incremental')
+        :param trigger: Origine de l'entraînement ('manual' ou 'scheduled'), conservée dans les mesures
+        :return: Future du résultat, ou None si un entraînement est déjà en cours (dans ce worker ou un autre)
+        """
+        with self._training_lock:
+            if self._training_future is not None and not self._training_future.done():
+                self.logger.info("Un entraînement est déjà en cours")
+                return None
+            
+            # Les autres workers chargeront la version activée par sync_with_registry
+            connection = self._acquire_training_lock()
+            if connection is None:
+                self.logger.info("Un entraînement est déjà en cours dans un autre worker")
+                return None
+            
+            try:
+                # 'spawn' : le processus enfant ne partage ni threads ni connexions avec l'API
+                executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+                future = executor.submit(run_training_job, mode, self.training_n_jobs, self.training_niceness, trigger)
+            except Exception:
+                self._release_training_lock(connection)
+                raise
+            self._training_lock_connection = connection
+            future.add_done_callback(self._on_training_done)
+            executor.shutdown(wait=False)
+            self._training_future = future
+            return future
+    
+    def _acquire_training_lock(self):
+        """
+        Prend le verrou consultatif de l'entraînement sur une connexion dédiée
+        
+        Verrou de session, gardé jusqu'à la fin du processus d'entraînement : la
+        connexion n'est pas rendue au pool entre-temps.
+        
+        :return: Connexion détenant le verrou, ou None s'il est détenu par un autre worker
+        """
         db = next(get_db())
         try:
-            success = self.train_model(db)
-            if success:
-                self.save_model()
-                self.last_training_time = datetime.datetime.now()
-                self.logger.info("Entraînement planifié terminé avec succès")
-            else:
-                self.logger.warning("Échec de l'entraînement planifié - données insuffisantes")
+            connection = db.get_bind().connect()
+        finally:
+            db.close()
+        try:
+            if connection.execute(select(func.pg_try_advisory_lock(MODEL_TRAINING_LOCK))).scalar():
+                connection.commit()
+                return connection
+            connection.rollback()
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la prise du verrou d'entraînement : {e}")
+        connection.close()
+        return None
+    
+    def _release_training_lock(self, connection):
+        """
+        Relâche le verrou consultatif de l'entraînement et rend la connexion au pool
+        """
+        try:
+            connection.execute(select(func.pg_advisory_unlock(MODEL_TRAINING_LOCK)))
+            connection.commit()
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la libération du verrou d'entraînement : {e}")
+        finally:
+            connection.close()
+    
+    def is_training(self) -> bool:
+        """
+        Indique si un processus d'entraînement est en cours
+        """
+        future = self._training_future
+        return future is not None and not future.done()
+    
+    def _on_training_done(self, future: Future):
+        """
+        Active la version produite par le processus d'entraînement
+        """
+        connection, self._training_lock_connection = self._training_lock_connection, None
+        if connection is not None:
+            self._release_training_lock(connection)
+        
+        try:
+            result = future.result()
+        except Exception as e:
+            self.logger.error(f"Le processus d'entraînement a échoué : {e}")
+            return
+        
+        self.metrics.add_run(result.get('metrics'))
+        if result.get('success') and result.get('version'):
+            self.logger.info(f"Entraînement terminé avec succès ({result.get('mode')}) : version {result['version']}")
+            self.load_model(result['version'])
+        else:
+            self.logger.warning("Entraînement terminé sans nouvelle version de modèle")
+    
+    def sync_with_registry(self):
+        """
+        Charge la version active du registre si elle diffère de la version servie
+        """
+        try:
+            current = self.registry.current_version()
+            if current is not None and current != self.model_version:
+                self.load_model(current)
         except Exception as e:
-            self.logger.error(f"Erreur lors de l'entraînement planifié : {e}")
+            self.logger.error(f"Erreur lors de la synchronisation avec le registre : {e}")
+    
+    def rollback_model(self, version: Optional[str] = None) -> Optional[str]:
+        """
+        Réactive une version précédente du modèle
+        
+        :param version: Version à réactiver (par défaut celle précédant la version active)
+        :return: Version activée, ou None en cas d'échec
+        """
+        try:
+            version = version or self.registry.previous_version(self.model_version)
+            if version is None:
+                self.logger.warning("Aucune version précédente vers laquelle revenir")
+                return None
+            
+            if not self.load_model(version):
+                return None
+            self.registry.set_current(version)
+            self.logger.info(f"Rollback du modèle vers la version {version}")
+            return version
+        except Exception as e:
+            self.logger.error(f"Erreur lors du rollback du modèle : {e}")
+            return None
+    
+    def scheduled_precompute(self):
+        """
+        Fonction appelée par le planificateur pour précalculer les niveaux d'engagement
+        """
+        db = next(get_db())
+        try:
+            self.precompute_engagement_levels(db)
         finally:
             db.close()
     
+    def reload_copurchase_index(self):
+        """
+        Fonction appelée par le planificateur pour recharger l'index des achats conjoints
+        (livraisons traitées par les autres workers)
+        """
+        db = next(get_db())
+        try:
+            self.copurchase_index.load(db)
+        finally:
+            db.close()
+    
+    def refresh_candidate_pool(self):
+        """
+        Fonction appelée par le planificateur pour recharger le pool de produits candidats
+        """
+        db = next(get_db())
+        try:
+            self.candidate_pool.refresh(db)
+        finally:
+            db.close()
+    
+    def refresh_popular_products(self):
+        """
+        Fonction appelée par le planificateur pour recharger les classements de popularité
+        """
+        db = next(get_db())
+        try:
+            self.popular_products.refresh(db)
+        finally:
+            db.close()
+    
+    def rebuild_similarity_index(self):
+        """
+        Fonction appelée par le planificateur pour reconstruire l'index de similarité
+        """
+        db = next(get_db())
+        try:
+            self.similarity_index.build(db)
+        finally:
+            db.close()
+    
+    def rebuild_seasonal_index(self):
+        """
+        Fonction appelée par le planificateur pour reconstruire l'index saisonnier
+        """
+        db = next(get_db())
+        try:
+            self.seasonal_index.build(db)
+        finally:
+            db.close()
+    
+    def rebuild_audience_index(self):
+        """
+        Fonction appelée par le planificateur pour reconstruire l'index d'audience
+        """
+        db = next(get_db())
+        try:
+            self.audience_index.build(db)
+        finally:
+            db.close()
+    
+    def rebuild_collaborative_model(self):
+        """
+        Fonction appelée par le planificateur pour réentraîner les facteurs du filtrage collaboratif
+        
+        Un seul worker entraîne (verrou consultatif) ; un export de moins de 6 heures,
+        laissé par un worker passé avant, est chargé au lieu d'être réentraîné.
+        """
+        db = next(get_db())
+        try:
+            self.collaborative.build_exclusive(db, max_age_seconds=6 * 3600)
+        finally:
+            db.close()
+    
+    def catch_up_audience_index(self):
+        """
+        Fonction appelée par le planificateur pour intégrer à l'index d'audience les profils modifiés
+        """
+        db = next(get_db())
+        try:
+            self.audience_index.catch_up(db)
+        finally:
+            db.close()
+    
+    def reload_trending_counters(self):
+        """
+        Fonction appelée par le planificateur pour recharger les compteurs tendance
+        """
+        db = next(get_db())
+        try:
+            self.trending_counters.load(db)
+        finally:
+            db.close()
+    
+    def _sample_candidates(self, db: Session, k: int, exclude: set) -> List[Tuple[int, str, float]]:
+        """
+        Tire k produits aléatoires du pool de candidats (chargé au premier appel si nécessaire)
+        """
+        if not self.candidate_pool.loaded:
+            self.candidate_pool.refresh(db)
+        return self.candidate_pool.sample(k, exclude)
+    
     def get_model_status(self) -> Dict:
         """
         Retourne le statut actuel du modèle
@@ -110,62 +597,83 @@ class UserInterestPredictor:
         """
         return {
             "model_loaded": self.model is not None,
+            "model_loading": self.is_model_loading(),
+            "model_version": self.model_version,
+            "estimator_backend": self.estimator_backend,
+            "compiled_inference": self.compiled_model is not None,
+            "collaborative_model": {
+                "enabled": self.collaborative_enabled,
+                "built": self.collaborative.built,
+                "building": self._collaborative_thread is not None and self._collaborative_thread.is_alive(),
+                "users": len(self.collaborative.user_factors),
+                "products": len(self.collaborative.item_factors),
+                "last_build_duration": self.collaborative.last_build_duration
+            },
+            "training_in_progress": self.is_training(),
             "last_training_time": self.last_training_time.isoformat() if self.last_training_time else None,
             "model_performance": self.model_performance,
-            "scheduler_running": self.scheduler_running
+            "scheduler_running": self.scheduler_running,
+            "last_training_mode": self.last_training_mode,
+            "last_training_duration": self.last_training_duration,
+            "last_full_training_time": self.last_full_training_time.isoformat() if self.last_full_training_time else None,
+            "training_watermark": self.training_watermark.isoformat() if self.training_watermark else None,
+            "last_training_metrics": self.metrics.last_run(),
+            "inference_latency": self.metrics.inference_summary()
         }
     
-    def extract_user_features(self, db: Session) -> DataFrame:
+    def extract_user_features(self, db: Session, since: Optional[datetime.datetime] = None) -> DataFrame:
         """
         Extrait les caractéristiques des utilisateurs à partir de la base de données
         
+        Si `training_sample_size` est positif, les vecteurs sont lus en flux et
+        seul un échantillon stratifié par niveau d'engagement est conservé
+        (voir StratifiedReservoirSampler) ; son résumé est gardé dans
+        `last_training_sample` et la date de modification la plus récente vue
+        dans `df.attrs['watermark']`. Le flux est lu par date de modification :
+        si le budget de temps l'interrompt, le watermark s'arrête juste avant
+        la dernière date lue et les profils non lus sont repris au prochain
+        entraînement incrémental.
+        
         :param db: Session de base de données SQLAlchemy
+        :param since: Ne retenir que les profils modifiés après cette date (optionnel)
         :return: DataFrame avec les caractéristiques des utilisateurs
         """
         try:
-            # Récupérer tous les profils utilisateurs
-            profiles = db.query(UserPreferenceProfile).all()
+            # Encoder les profils dont le vecteur manque ou est périmé, puis lire le magasin
+            self.feature_store.sync(db)
+            self.last_training_sample = None
+            if self.training_sample_size > 0:
+                sampler = StratifiedReservoirSampler(self.training_sample_size, self.training_sample_seconds)
+                sampler.consume(self.feature_store.iter_chunks(db, since=since, by_update=True), engagement_levels)
+                user_ids, vectors, updated_at, levels = sampler.sample()
+                watermark = sampler.max_updated_at
+                if sampler.truncated and watermark is not None:
+                    # Des profils non lus peuvent partager la dernière date lue : ils seront relus
+                    watermark = watermark - np.timedelta64(1, 'us')
+            else:
+                user_ids, vectors, updated_at = self.feature_store.load_matrix(db, since=since)
+                levels = engagement_levels(vectors)
+                watermark = None
+            
+            df = DataFrame({'user_id': user_ids}, copy=False)
+            for i, column in enumerate(self.FEATURES):
+                df[column] = vectors[:, i] if len(vectors) else np.empty(0, dtype=np.float32)
+            df['engagement_level'] = levels
+            df['updated_at'] = updated_at
+            if watermark is not None:
+                df.attrs['watermark'] = Timestamp(watermark)
+            
+            if self.training_sample_size > 0:
+                self.last_training_sample = sampler.report(df['engagement_level'].value_counts().to_dict())
+                if sampler.truncated:
+                    self.logger.warning(f"Budget de lecture atteint : {sampler.rows_seen} profils lus avant échantillonnage")
             
-            if not profiles:
+            if df.empty:
                 self.logger.warning("Aucun profil utilisateur trouvé dans la base de données")
-                return DataFrame()
-            
-            # Construire le DataFrame
-            data = []
-            for profile in profiles:
-                # Vérifier les attributs obligatoires
-                if not hasattr(profile, 'total_orders') or profile.total_orders is None:
-                    continue
-                    
-                if not hasattr(profile, 'average_order_value') or profile.average_order_value is None:
-                    continue
-                
-                # Déterminer le niveau d'engagement
-                engagement_level = self._calculate_engagement_level(profile)
-                
-                # Convertir les arrays en chaînes pour le traitement
-                currencies = ','.join(profile.preferred_currencies) if profile.preferred_currencies else ''
-                
-                # Convertir la liste d'IDs produits en chaîne
-                product_ids = ','.join(map(str, profile.preferred_product_ids)) if profile.preferred_product_ids else ''
-                
-                # Temps d'achat préféré avec valeur par défaut
-                preferred_time = profile.preferred_purchase_time if profile.preferred_purchase_time else 'Unknown'
-                
-                # Ajouter les caractéristiques à la liste
-                data.append({
-                    'user_id': profile.user_id,
-                    'total_orders': profile.total_orders,
-                    'average_order_value': profile.average_order_value,
-                    'top_category': profile.most_purchased_category_id or 0,
-                    'preferred_purchase_time': preferred_time,
-                    'currencies': currencies,
-                    'product_ids': product_ids,
-                    'engagement_level': engagement_level
-                })
+                return df
             
-            df = DataFrame(data)
-            self.logger.info(f"Extraction réussie : {len(df)} profils utilisateurs")
+            self.logger.info(f"Extraction réussie : {len(df)} profils utilisateurs"
+                             + (f" (échantillon de {self.last_training_sample['rows_seen']})" if self.last_training_sample else ""))
             return df
             
         except Exception as e:
@@ -215,12 +723,7 @@ class UserInterestPredictor:
             return None, None, None, None
             
         # Sélection des caractéristiques
-        features = [
-            'total_orders', 
-            'average_order_value', 
-            'top_category', 
-            'preferred_purchase_time'
-        ]
+        features = self.FEATURES
         
         # Vérifier que toutes les colonnes existent
         for feature in features:
@@ -229,30 +732,24 @@ class UserInterestPredictor:
                 return None, None, None, None
         
         # Encodage des caractéristiques catégorielles
-        categorical_features = ['preferred_purchase_time']
-        numerical_features = ['total_orders', 'average_order_value', 'top_category']
+        categorical_features = self.CATEGORICAL_FEATURES
+        numerical_features = self.NUMERICAL_FEATURES
         
-        # Prétraitement des données avec gestion des valeurs manquantes
+        # Prétraitement des données : colonnes désignées par leur position dans le vecteur
+        # (les valeurs manquantes sont déjà encodées par le magasin de caractéristiques)
         preprocessor = ColumnTransformer(
             transformers=[
-                ('num', StandardScaler(), numerical_features),
-                ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_features)
+                ('num', StandardScaler(), [features.index(col) for col in numerical_features]),
+                ('cat', OneHotEncoder(handle_unknown='ignore'), [features.index(col) for col in categorical_features])
             ],
-            remainder='drop'  # Ignorer les autres colonnes
+            remainder='drop',  # Ignorer les autres colonnes
+            sparse_threshold=0  # Sortie dense, acceptée par tous les backends
         )
         
         # Préparation des données
-        X = df[features].copy()
+        X = df[features].to_numpy(dtype=np.float32)
         y = df['engagement_level'].copy()
         
-        # Remplacer les valeurs manquantes dans les données numériques
-        for col in numerical_features:
-            X[col] = X[col].fillna(0)
-        
-        # Remplacer les valeurs manquantes dans les données catégorielles
-        for col in categorical_features:
-            X[col] = X[col].fillna('Unknown')
-        
         # Division des données avec stratification pour conserver la distribution des classes
         try:
             X_train, X_test, y_train, y_test = train_test_split(
@@ -265,67 +762,321 @@ class UserInterestPredictor:
             self.logger.error(f"Erreur lors de la division des données: {e}")
             return None, None, None, None
     
-    def train_model(self, db: Session) -> bool:
+    def train_model(self, db: Session, mode: str = 'auto') -> bool:
         """
-        Entraîne un modèle de forêt aléatoire pour prédire l'engagement
+        Entraîne le modèle d'engagement, complètement ou de manière incrémentale
+        
+        En mode 'auto', un réentraînement complet n'a lieu que si aucun modèle n'existe
+        ou si la cadence `full_retrain_interval_days` est écoulée ; sinon seuls les
+        profils modifiés depuis le dernier entraînement sont intégrés. Une dérive
+        détectée sur ces profils bascule également vers un réentraînement complet.
+        
+        :param db: Session de base de données SQLAlchemy
+        :param mode: 'auto', 'full' ou 'incremental'
+        :return: True si l'entraînement a réussi, False sinon
+        """
+        started_at = time.perf_counter()
+        
+        if mode == 'auto':
+            mode = 'full' if self._full_retrain_due() else 'incremental'
+        
+        with self.metrics.training_run(mode) as run:
+            success = None
+            if mode == 'incremental':
+                success = self._train_incremental(db)
+                if success is None:
+                    mode = 'full'
+            
+            if mode == 'full':
+                success = self._train_full(db)
+            
+            run.mode = mode
+            run.success = bool(success)
+        
+        if success:
+            self.last_training_mode = mode
+            self.last_training_duration = round(time.perf_counter() - started_at, 3)
+            self.logger.info(f"Entraînement {mode} terminé en {self.last_training_duration}s")
+        return bool(success)
+    
+    @staticmethod
+    def _latest_update(df: DataFrame) -> Optional[datetime.datetime]:
+        """
+        Retourne la date de modification la plus récente des profils extraits
+        """
+        # Avec échantillonnage : date la plus récente parmi tous les profils lus, pas seulement l'échantillon
+        latest = df.attrs.get('watermark')
+        if latest is None:
+            latest = df['updated_at'].max() if 'updated_at' in df.columns else None
+        if latest is None or isna(latest):
+            return None
+        return latest.to_pydatetime() if hasattr(latest, 'to_pydatetime') else latest
+    
+    def _full_retrain_due(self) -> bool:
+        """
+        Indique si un réentraînement complet est nécessaire selon la cadence configurée
+        """
+        if self.model is None or self.last_full_training_time is None or self.training_watermark is None:
+            return True
+        elapsed = datetime.datetime.now() - self.last_full_training_time
+        return elapsed >= datetime.timedelta(days=self.full_retrain_interval_days)
+    
+    def _train_incremental(self, db: Session) -> Optional[bool]:
+        """
+        Met à jour le modèle avec les profils modifiés depuis le watermark (arbres ajoutés en warm start)
+        
+        :param db: Session de base de données SQLAlchemy
+        :return: True si le modèle est à jour, None si un réentraînement complet est nécessaire
+        """
+        try:
+            classifier = self.model.named_steps['classifier']
+            if not self.model_selection and backend_of(classifier) != self.estimator_backend:
+                self.logger.info(f"Backend configuré différent du modèle actuel ({self.estimator_backend}) "
+                                 f"- réentraînement complet")
+                return None
+            # Seule la forêt aléatoire accepte des arbres supplémentaires entraînés sur un nouveau lot
+            if not isinstance(classifier, RandomForestClassifier):
+                self.logger.info("Le classifieur ne supporte pas l'ajout d'arbres - réentraînement complet")
+                return None
+            
+            with self.metrics.stage('extract') as stage:
+                df = self.extract_user_features(db, since=self.training_watermark)
+                stage['rows'] = len(df)
+                stage['rows_seen'] = (self.last_training_sample or {}).get('rows_seen')
+            if df.empty:
+                self.logger.info("Aucun profil modifié depuis le dernier entraînement")
+                return True
+            
+            with self.metrics.stage('prepare') as stage:
+                X_new = df[self.FEATURES].to_numpy(dtype=np.float32)
+                y_new = df['engagement_level']
+                stage['rows'] = len(X_new)
+            
+            # Détection de dérive : précision du modèle actuel sur les nouveaux profils
+            with self.metrics.stage('evaluate') as stage:
+                batch_accuracy = float((self.model.predict(X_new) == y_new).mean())
+                stage['rows'] = len(X_new)
+            baseline_accuracy = (self.model_performance or {}).get('accuracy', 0)
+            if batch_accuracy < baseline_accuracy - self.drift_threshold:
+                self.logger.warning(f"Dérive détectée (précision {batch_accuracy:.4f} contre {baseline_accuracy:.4f}) "
+                                    f"- réentraînement complet")
+                return None
+            
+            if classifier.n_estimators + self.incremental_trees > self.max_forest_size:
+                self.logger.info("Taille maximale de la forêt atteinte - réentraînement complet")
+                return None
+            
+            # Les nouveaux arbres doivent voir toutes les classes connues, sinon on attend plus de données
+            if set(y_new.unique()) != set(classifier.classes_):
+                self.logger.info(f"Lot incrémental incomplet ({y_new.value_counts().to_dict()}) - "
+                                 f"intégration reportée")
+                return True
+            
+            # Mise à jour sur une copie puis remplacement, pour ne pas gêner les prédictions en cours
+            with self.metrics.stage('fit') as stage:
+                pipeline = copy.deepcopy(self.model)
+                classifier = pipeline.named_steps['classifier']
+                X_transformed = pipeline.named_steps['preprocessor'].transform(X_new)
+                # Poids 'balanced' explicites : le preset est déconseillé en warm start
+                class_weight = dict(zip(classifier.classes_, compute_class_weight(
+                    'balanced', classes=classifier.classes_, y=y_new
+                )))
+                classifier.set_params(
+                    warm_start=True,
+                    n_jobs=self.training_n_jobs,
+                    n_estimators=classifier.n_estimators + self.incremental_trees,
+                    class_weight=class_weight
+                )
+                classifier.fit(X_transformed, y_new)
+                stage['rows'] = len(X_new)
+            
+            self.model = pipeline
+            self.compiled_model = self._compile_model(pipeline)
+            self.training_watermark = self._latest_update(df)
+            self.last_training_time = datetime.datetime.now()
+            if self.model_performance is not None:
+                self.model_performance['incremental'] = {
+                    'profiles': len(df),
+                    'batch_accuracy_before_update': batch_accuracy,
+                    'training_sample': self.last_training_sample,
+                    'n_estimators': classifier.n_estimators,
+                    'timestamp': self.last_training_time.isoformat()
+                }
+            
+            self.logger.info(f"Mise à jour incrémentale : {len(df)} profils, {classifier.n_estimators} arbres")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'entraînement incrémental : {e}")
+            return None
+    
+    def _load_model_grid(self, raw: Optional[str]) -> List[Dict]:
+        """
+        Configurations de la sélection de modèle (JSON de ML_MODEL_GRID, sinon DEFAULT_MODEL_GRID)
+        """
+        if not raw:
+            return DEFAULT_MODEL_GRID
+        try:
+            grid = json.loads(raw)
+            for candidate in grid:
+                if candidate['backend'] not in ESTIMATOR_BACKENDS:
+                    raise ValueError(f"backend inconnu : {candidate['backend']}")
+                candidate.setdefault('name', candidate['backend'])
+                candidate.setdefault('params', {})
+            if not grid:
+                raise ValueError("grille vide")
+            return grid
+        except (ValueError, KeyError, TypeError) as e:
+            self.logger.error(f"ML_MODEL_GRID invalide ({e}) - grille par défaut utilisée")
+            return DEFAULT_MODEL_GRID
+    
+    def _model_candidates(self) -> List[Dict]:
+        """
+        Configurations à évaluer : la grille si la sélection est active, sinon le backend configuré
+        """
+        if self.model_selection:
+            return self.model_grid
+        return [{'name': self.estimator_backend, 'backend': self.estimator_backend, 'params': {}}]
+    
+    def _evaluate_candidate(self, candidate: Dict, X_train: np.ndarray, y_train: Series,
+                            X_test: np.ndarray, y_test: Series) -> Tuple[Pipeline, Optional[object], Dict]:
+        """
+        Entraîne une configuration candidate et mesure sa précision et son coût d'inférence
+        
+        La latence est mesurée sur le chemin réellement servi (évaluateur compilé s'il existe).
+        
+        :param candidate: Configuration {name, backend, params}
+        :return: Tuple (pipeline entraîné, évaluateur compilé ou None, mesures)
+        """
+        pipeline = Pipeline([
+            ('preprocessor', clone(self.preprocessor)),
+            ('classifier', build_estimator(candidate['backend'], n_jobs=self.training_n_jobs, **candidate['params']))
+        ])
+        started = time.perf_counter()
+        pipeline.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - started
+        
+        y_pred = pipeline.predict(X_test)
+        compiled = self._compile_model(pipeline)
+        size_bytes = model_size_bytes(pipeline)
+        compiled_bytes = compiled.nbytes if compiled is not None else 0
+        
+        result = {
+            'name': candidate['name'],
+            'backend': candidate['backend'],
+            'params': candidate['params'],
+            'accuracy': float(np.mean(y_pred == np.asarray(y_test))),
+            'weighted_f1': float(f1_score(y_test, y_pred, average='weighted')),
+            'fit_seconds': round(fit_seconds, 3),
+            'model_size_bytes': size_bytes,
+            'compiled_size_bytes': compiled_bytes,
+            'memory_bytes': size_bytes + compiled_bytes,
+            'inference_latency': inference_latency(pipeline, X_test, compiled=compiled)
+        }
+        self.logger.info(f"Configuration {candidate['name']} : précision {result['accuracy']:.4f}, "
+                         f"p99 {result['inference_latency'].get('single_row_p99_ms')} ms, "
+                         f"mémoire {result['memory_bytes'] / 1024:.0f} ko")
+        return pipeline, compiled, result
+    
+    def _train_full(self, db: Session) -> bool:
+        """
+        Entraîne le classifieur d'engagement à partir de tous les profils
+        
+        Chaque configuration candidate (voir _model_candidates) est entraînée puis
+        mesurée : précision, taille de l'artefact et latence d'inférence unitaire.
+        La plus précise qui respecte les budgets de latence et de mémoire est
+        mise en service ; toutes les mesures sont conservées dans les performances.
         
         :param db: Session de base de données SQLAlchemy
         :return: True si l'entraînement a réussi, False sinon
         """
         try:
             # Extraction et préparation des données
-            df = self.extract_user_features(db)
+            with self.metrics.stage('extract') as stage:
+                df = self.extract_user_features(db)
+                stage['rows'] = len(df)
+                stage['rows_seen'] = (self.last_training_sample or {}).get('rows_seen')
             if df.empty:
                 self.logger.warning("Aucune donnée extraite pour l'entraînement")
                 return False
-                
-            X_train, X_test, y_train, y_test = self.prepare_data(df)
+            
+            with self.metrics.stage('prepare') as stage:
+                X_train, X_test, y_train, y_test = self.prepare_data(df)
+                stage['rows'] = len(df)
             
             if X_train is None:
                 self.logger.warning("Préparation des données échouée")
                 return False
             
-            # Pipeline de machine learning
-            pipeline = Pipeline([
-                ('preprocessor', self.preprocessor),
-                ('classifier', RandomForestClassifier(
-                    n_estimators=100, 
-                    random_state=42, 
-                    class_weight='balanced',
-                    n_jobs=-1  # Utiliser tous les processeurs disponibles
-                ))
-            ])
+            # Évaluation des configurations candidates ; seule la meilleure est gardée en mémoire
+            candidates = self._model_candidates()
+            results = []
+            pipeline, compiled = None, None
+            with self.metrics.stage('fit') as stage:
+                for candidate in candidates:
+                    candidate_pipeline, candidate_compiled, result = self._evaluate_candidate(
+                        candidate, X_train, y_train, X_test, y_test
+                    )
+                    results.append(result)
+                    if select_configuration(results, self.latency_budget_ms, self.memory_budget_bytes) == len(results) - 1:
+                        pipeline, compiled = candidate_pipeline, candidate_compiled
+                stage['rows'] = len(X_train)
+                stage['candidates'] = len(candidates)
             
-            # Entraînement du modèle
-            pipeline.fit(X_train, y_train)
+            selected = results[select_configuration(results, self.latency_budget_ms, self.memory_budget_bytes)]
+            if not selected['within_budget']:
+                self.logger.warning(f"Aucune configuration ne respecte les budgets - {selected['name']} (la plus rapide) retenue")
             
-            # Évaluation du modèle
-            y_pred = pipeline.predict(X_test)
+            # Évaluation du modèle retenu
+            with self.metrics.stage('evaluate') as stage:
+                y_pred = pipeline.predict(X_test)
+                stage['rows'] = len(X_test)
             
             # Stocker les métriques de performance
             report = classification_report(y_test, y_pred, output_dict=True)
             self.model_performance = {
+                'backend': selected['backend'],
+                'configuration': selected['name'],
+                'params': selected['params'],
                 'accuracy': report['accuracy'],
                 'weighted_f1': report['weighted avg']['f1-score'],
+                'model_size_bytes': selected['model_size_bytes'],
+                'memory_bytes': selected['memory_bytes'],
+                'inference_latency': selected['inference_latency'],
                 'class_report': report,
                 'confusion_matrix': confusion_matrix(y_test, y_pred).tolist(),
+                # Échantillon stratifié d'entraînement (None : tous les profils)
+                'training_sample': self.last_training_sample,
+                'model_selection': {
+                    'latency_budget_ms': self.latency_budget_ms,
+                    'memory_budget_bytes': self.memory_budget_bytes,
+                    'selected': selected['name'],
+                    'within_budget': selected['within_budget'],
+                    'candidates': results
+                },
                 'timestamp': datetime.datetime.now().isoformat()
             }
             
-            self.logger.info(f"Performance du modèle: Accuracy={report['accuracy']:.4f}, F1={report['weighted avg']['f1-score']:.4f}")
+            self.logger.info(f"Performance du modèle ({selected['name']}): Accuracy={report['accuracy']:.4f}, "
+                             f"F1={report['weighted avg']['f1-score']:.4f}, taille={selected['model_size_bytes'] / 1024:.0f} ko, "
+                             f"latence unitaire p99={selected['inference_latency'].get('single_row_p99_ms')} ms")
             
             # Matrice de confusion pour le débogage
             conf_matrix = confusion_matrix(y_test, y_pred)
             self.logger.info(f"Matrice de confusion:\n{conf_matrix}")
             
             self.model = pipeline
+            self.compiled_model = compiled
             self.last_training_time = datetime.datetime.now()
+            self.last_full_training_time = self.last_training_time
+            self.training_watermark = self._latest_update(df)
             return True
             
         except Exception as e:
             self.logger.error(f"Erreur lors de l'entraînement du modèle : {e}")
             return False
     
+    @track_latency
     def predict_user_interest(self, user_id: int, db: Session) -> Dict:
         """
         Prédit le niveau d'intérêt d'un utilisateur et génère des recommandations
@@ -335,20 +1086,20 @@ class UserInterestPredictor:
         :return: Dictionnaire avec les prédictions et recommandations
         """
         try:
-            # Vérifier si le modèle est disponible, sinon essayer de le charger
+            # Sans modèle, servir les recommandations de repli : le modèle est en cours
+            # de chargement, ou un entraînement est mis en file d'attente
             if self.model is None:
-                model_loaded = self.load_model()
-                
-                if not model_loaded:
-                    self.logger.warning("Aucun modèle n'est disponible. Tentative d'entraînement...")
-                    training_success = self.train_model(db)
-                    if not training_success:
-                        return {
-                            'success': False,
-                            'message': 'Impossible de prédire - données insuffisantes pour l\'entraînement',
-                            'engagement_level': 'Unknown',
-                            'recommendations': self._get_fallback_recommendations(db, user_id)
-                        }
+                if self.is_model_loading():
+                    message = 'Modèle en cours de chargement'
+                else:
+                    self.request_training()
+                    message = 'Aucun modèle disponible - entraînement en cours'
+                return {
+                    'success': False,
+                    'message': message,
+                    'engagement_level': 'Unknown',
+                    'recommendations': self._get_fallback_recommendations(db, user_id)
+                }
             
             # Récupérer le profil de l'utilisateur
             profile = db.query(UserPreferenceProfile).filter(UserPreferenceProfile.user_id == user_id).first()
@@ -370,20 +1121,23 @@ class UserInterestPredictor:
                     'recommendations': self._get_fallback_recommendations(db, user_id)
                 }
             
-            # Préparer les caractéristiques pour la prédiction
-            user_features = DataFrame({
-                'total_orders': [profile.total_orders],
-                'average_order_value': [profile.average_order_value or 0],
-                'top_category': [profile.most_purchased_category_id or 0],
-                'preferred_purchase_time': [profile.preferred_purchase_time or 'Unknown']
-            })
+            # Niveau d'engagement précalculé par la tâche nocturne, s'il est toujours à jour
+            interest_level = self._get_precomputed_engagement_level(profile, db)
             
-            # Prédire le niveau d'engagement
-            try:
-                interest_level = self.model.predict(user_features)[0]
-            except Exception as e:
-                self.logger.error(f"Erreur lors de la prédiction du niveau d'engagement : {e}")
-                interest_level = self._calculate_engagement_level(profile)
+            if interest_level is None:
+                # Vecteur de caractéristiques du magasin, lu par clé primaire
+                user_features = self.feature_store.vector(db, profile)
+                
+                # Prédire le niveau d'engagement
+                try:
+                    compiled = self.compiled_model
+                    if compiled is not None:
+                        interest_level = compiled.predict_one(user_features)
+                    else:
+                        interest_level = self.model.predict(user_features.reshape(1, -1))[0]
+                except Exception as e:
+                    self.logger.error(f"Erreur lors de la prédiction du niveau d'engagement : {e}")
+                    interest_level = self._calculate_engagement_level(profile)
             
             # Générer des recommandations basées sur le niveau d'engagement et les préférences
             recommendations = self.generate_recommendations(profile, interest_level, db)
@@ -403,59 +1157,277 @@ class UserInterestPredictor:
                 'recommendations': self._get_fallback_recommendations(db, user_id)
             }
     
-    def _get_fallback_recommendations(self, db: Session, user_id: int) -> List[Dict]:
+    def _get_precomputed_engagement_level(self, profile: UserPreferenceProfile, db: Session) -> Optional[str]:
+        """
+        Retourne le niveau d'engagement précalculé d'un utilisateur s'il est postérieur à son profil
+        
+        :param profile: Profil de préférences de l'utilisateur
+        :param db: Session de base de données SQLAlchemy
+        :return: Niveau d'engagement ou None s'il est absent ou périmé
+        """
+        try:
+            precomputed = db.get(UserEngagementLevel, profile.user_id)
+            if precomputed is None:
+                return None
+            if profile.updated_at and precomputed.computed_at < profile.updated_at:
+                return None
+            return precomputed.engagement_level
+        except Exception as e:
+            self.logger.warning(f"Niveau d'engagement précalculé indisponible : {e}")
+            return None
+    
+    @track_latency
+    def predict_engagement_levels(self, user_ids: List[int], db: Session) -> Dict[int, str]:
+        """
+        Prédit le niveau d'engagement d'un nombre quelconque d'utilisateurs en un seul appel au modèle
+        
+        :param user_ids: IDs des utilisateurs
+        :param db: Session de base de données SQLAlchemy
+        :return: Dictionnaire user_id -> niveau d'engagement (profils introuvables ou incomplets exclus)
+        """
+        try:
+            vectors = self.feature_store.get(db, user_ids)
+            if not vectors:
+                return {}
+            return dict(zip(vectors.keys(), self._predict_levels(np.vstack(list(vectors.values())))))
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la prédiction par lot : {e}")
+            return {}
+    
+    def _compile_model(self, model):
+        """
+        Compile le pipeline en évaluateur NumPy pour l'inférence (None si non pris en charge)
+        
+        La compilation échoue si l'évaluateur ne reproduit pas les prédictions
+        de sklearn : le pipeline est alors utilisé tel quel.
+        """
+        if not self.compiled_inference:
+            return None
+        compiled = compile_pipeline(model, n_features=len(self.FEATURES))
+        if compiled is None:
+            self.logger.info("Modèle non compilé - inférence par le pipeline sklearn")
+        return compiled
+    
+    def _predict_levels(self, vectors: np.ndarray) -> List[str]:
+        """
+        Prédit les niveaux d'engagement de vecteurs de caractéristiques en un appel vectorisé
+        
+        :param vectors: Matrice float32 (utilisateurs x FEATURES) du magasin de caractéristiques
+        :return: Liste des niveaux, dans l'ordre des lignes
+        """
+        if self.model is not None:
+            try:
+                compiled = self.compiled_model
+                if compiled is not None:
+                    return compiled.predict(vectors).tolist()
+                return self.model.predict(vectors).tolist()
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la prédiction du niveau d'engagement : {e}")
+        
+        # Sans modèle, utiliser la règle de calcul
+        return engagement_levels(vectors).tolist()
+    
+    def precompute_engagement_levels(self, db: Session) -> int:
+        """
+        Prédit et enregistre le niveau d'engagement de tous les utilisateurs, par lots
+        
+        :param db: Session de base de données SQLAlchemy
+        :return: Nombre de niveaux enregistrés
+        """
+        computed_at = datetime.datetime.now(datetime.timezone.utc)
+        total = 0
+        
+        try:
+            self.feature_store.sync(db)
+            for user_ids, vectors, _ in self.feature_store.iter_chunks(db):
+                levels = self._predict_levels(vectors)
+                
+                # Upsert en masse des niveaux du lot
+                stmt = insert(UserEngagementLevel).values([
+                    {
+                        'user_id': user_id,
+                        'engagement_level': level,
+                        'model_trained_at': self.last_training_time,
+                        'computed_at': computed_at
+                    }
+                    for user_id, level in zip(user_ids.tolist(), levels)
+                ])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[UserEngagementLevel.user_id],
+                    set_={
+                        'engagement_level': stmt.excluded.engagement_level,
+                        'model_trained_at': stmt.excluded.model_trained_at,
+                        'computed_at': stmt.excluded.computed_at
+                    }
+                )
+                db.execute(stmt)
+                total += len(levels)
+            
+            db.commit()
+            self.logger.info(f"Niveaux d'engagement précalculés pour {total} utilisateurs")
+            return total
+            
+        except Exception as e:
+            db.rollback()
+            self.logger.error(f"Erreur lors du précalcul des niveaux d'engagement : {e}")
+            return 0
+    
+    def _get_fallback_recommendations(self, db: Session, user_id: int, limit: int = 10) -> List[Dict]:
         """
         Génère des recommandations de repli basées sur les produits populaires
         quand les recommandations personnalisées ne sont pas disponibles
         
+        Les produits sont lus dans les classements en mémoire : les plus
+        commandés, à défaut ceux en promotion, puis les plus récents.
+        
         :param db: Session de base de données
         :param user_id: ID de l'utilisateur
+        :param limit: Nombre maximum de recommandations
         :return: Liste de recommandations
         """
         self.logger.info(f"Utilisation de recommandations de repli pour l'utilisateur {user_id}")
         
         try:
-            # Récupérer les produits les plus populaires
-            popular_products = db.query(Product).join(Order).group_by(Product.id).order_by(
-                func.count(Order.id).desc()
-            ).all()
-            
-            # Si aucun produit populaire n'est trouvé, utiliser les produits avec réduction
-            if not popular_products:
-                popular_products = db.query(Product).join(Banner).filter(
-                    Banner.discountPercent > 0
-                ).order_by(desc(Banner.discountPercent)).limit(5).all()
-            
-            # Si toujours aucun produit, utiliser les produits les plus récents
-            if not popular_products:
-                popular_products = db.query(Product).order_by(
-                    desc(Product.created_at)
-                ).limit(5).all()
-            
-            # Construire les recommandations
-            recommendations = []
-            for product in popular_products:
-                recommendations.append({
-                    'product_id': product.id,
-                    'name': product.name,
-                    'price': product.price,
+            if not self.popular_products.loaded:
+                self.popular_products.refresh(db)
+            
+            return [
+                {
+                    'product_id': product_id,
+                    'name': name,
+                    'price': price,
                     'type': 'popular',
                     'reason': 'Produits populaires que vous pourriez aimer'
-                })
-            
-            return recommendations
+                }
+                for product_id, name, price in self.popular_products.top(limit)
+            ]
             
         except Exception as e:
             self.logger.error(f"Erreur lors de la génération des recommandations de repli : {e}")
             return []
     
-    def generate_recommendations(self, profile: UserPreferenceProfile, interest_level: str, db: Session) -> List[Dict]:
+    def _recommendation_strategies(self, profile: UserPreferenceProfile, interest_level: str,
+                                   now: Optional[datetime.datetime] = None) -> List[Tuple[str, str, int, Select]]:
+        """
+        Requêtes des stratégies de recommandation, par ordre de priorité
+        
+        Chaque requête retourne (product_id, name, price, rank), `rank` étant le
+        rang du produit selon l'ordre propre à la stratégie. Seuils et quotas
+        viennent de `recommendation_config`.
+        
+        :param profile: Profil de préférences de l'utilisateur
+        :param interest_level: Niveau d'intérêt prédit
+        :param now: Date de référence des nouveautés (maintenant par défaut)
+        :return: Liste de tuples (type, raison, nombre de produits, requête)
+        """
+        def ranked(*order_by):
+            return select(
+                Product.id.label('product_id'),
+                Product.name.label('name'),
+                Product.price.label('price'),
+                func.row_number().over(order_by=order_by).label('rank')
+            )
+        
+        config = self.recommendation_config
+        per_strategy = config['per_strategy']
+        strategies = []
+        
+        # Filtrage collaboratif : produits appréciés par les clients aux achats proches, rangés par score ALS
+        collaborative_count = config.get('collaborative_count', 0)
+        if self.collaborative_enabled and collaborative_count and self.collaborative.built:
+            # Marge pour les produits supprimés, désactivés ou en rupture depuis l'entraînement
+            scored = self.collaborative.recommend(
+                profile.user_id, collaborative_count * 2, exclude=profile.preferred_product_ids or []
+            )
+            if scored:
+                ranks = {product_id: rank for rank, (product_id, _) in enumerate(scored)}
+                strategies.append(('collaborative', 'Les clients aux goûts proches des vôtres ont aimé',
+                    collaborative_count,
+                    ranked(case(ranks, value=Product.id)).where(
+                        Product.id.in_(list(ranks)),
+                        # La disponibilité connue des facteurs n'est tenue à jour que par le worker
+                        # qui a traité la modification du produit
+                        Product.is_active.is_(True),
+                        or_(Product.stock.is_(None), Product.stock > 0)
+                    )))
+        
+        # Recommandations basées sur la catégorie préférée (30% des recommandations)
+        if profile.most_purchased_category_id:
+            strategies.append(('category_based', 'Basé sur votre catégorie préférée', per_strategy,
+                ranked(desc(Product.rating), desc(Product.created_at)).where(
+                    Product.category_id == profile.most_purchased_category_id
+                )))
+        
+        # Recommandations basées sur le niveau d'engagement (70% des recommandations)
+        if interest_level == 'High':
+            # Pour les utilisateurs très engagés, recommander des produits premium et nouveaux
+            one_month_ago = (now or datetime.datetime.now()) - datetime.timedelta(days=config['new_arrival_days'])
+            strategies.append(('premium', 'Produits premium qui pourraient vous intéresser', per_strategy,
+                ranked(desc(Product.created_at)).where(Product.price > config['premium_price'])))
+            strategies.append(('new_arrival', 'Nouveautés qui viennent d\'arriver', per_strategy,
+                ranked(desc(Product.created_at)).where(Product.created_at >= one_month_ago)))
+        
+        elif interest_level == 'Medium':
+            # Pour les utilisateurs moyennement engagés, recommander des produits populaires et bien notés
+            strategies.append(('popular', 'Produits populaires que d\'autres clients ont appréciés', per_strategy,
+                ranked(func.count(Order.id).desc()).join(Order).group_by(Product.id)))
+            strategies.append(('highly_rated', 'Produits très bien notés par notre communauté', per_strategy,
+                ranked(desc(Product.rating), desc(Product.nb_rating)).where(Product.rating > config['highly_rated_min'])))
+        
+        else:  # Low
+            # Pour les utilisateurs peu engagés, recommander des produits à prix réduit et accessibles
+            strategies.append(('discount', 'Offres spéciales pour vous', config['discount_count'],
+                ranked(desc(Banner.discountPercent)).join(Banner).where(Banner.discountPercent > 0)))
+            strategies.append(('affordable', 'Produits à petits prix', per_strategy,
+                ranked(Product.price).where(Product.price < config['affordable_price'])))
+        
+        return strategies
+    
+    def _strategies_statement(self, strategies: List[Tuple[str, str, int, Select]], excluded: List[int]):
+        """
+        Combine les stratégies en une seule requête
+        
+        Chaque stratégie est un CTE qui garde ses `limit` meilleurs produits
+        parmi ceux que les stratégies précédentes n'ont pas retenus : le
+        résultat est celui de l'exécution séquentielle des requêtes, en un seul
+        aller-retour. Seuls les `limit` + (produits déjà retenus) premiers rangs
+        d'une stratégie peuvent être sélectionnés, ce qui borne les candidats.
+        
+        :param strategies: Stratégies produites par _recommendation_strategies
+        :param excluded: IDs des produits à exclure (déjà achetés)
+        :return: Requête UNION ALL triée par (priorité, rang)
+        """
+        picks = []
+        budget = 0
+        for priority, (_, _, limit, query) in enumerate(strategies):
+            budget += limit
+            candidates = query.where(Product.id.notin_(excluded)).cte(f'candidates_{priority}')
+            
+            pick = select(
+                candidates.c.product_id,
+                candidates.c.name,
+                candidates.c.price,
+                literal(priority).label('priority'),
+                candidates.c.rank
+            ).where(candidates.c.rank <= budget)
+            if picks:
+                pick = pick.where(candidates.c.product_id.notin_(
+                    union_all(*[select(previous.c.product_id) for previous in picks])
+                ))
+            picks.append(pick.order_by(candidates.c.rank).limit(limit).cte(f'pick_{priority}'))
+        
+        return union_all(*[select(pick) for pick in picks]).order_by('priority', 'rank')
+    
+    @track_latency
+    def generate_recommendations(self, profile: UserPreferenceProfile, interest_level: str, db: Session,
+                                 now: Optional[datetime.datetime] = None) -> List[Dict]:
         """
         Génère des recommandations personnalisées pour l'utilisateur
         
         :param profile: Profil de préférences de l'utilisateur
         :param interest_level: Niveau d'intérêt prédit
         :param db: Session de base de données SQLAlchemy
+        :param now: Date de référence (maintenant par défaut ; date de la commande rejouée hors ligne)
         :return: Liste de recommandations
         """
         try:
@@ -463,132 +1435,31 @@ class UserInterestPredictor:
             already_seen_products = profile.preferred_product_ids or []
             
             # Nombre de recommandations souhaitées
-            target_recommendations = 6
+            target_recommendations = self.recommendation_config['target']
             
-            # Recommandations basées sur la catégorie préférée (30% des recommandations)
-            if profile.most_purchased_category_id:
-                category_products = db.query(Product).filter(
-                    Product.category_id == profile.most_purchased_category_id,
-                    Product.id.notin_(already_seen_products)
-                ).order_by(desc(Product.rating), desc(Product.created_at)).limit(2).all()
-                
-                for product in category_products:
-                    recommendations.append({
-                        'product_id': product.id,
-                        'name': product.name,
-                        'price': product.price,
-                        'type': 'category_based',
-                        'reason': 'Basé sur votre catégorie préférée'
-                    })
-            
-            # Recommandations basées sur le niveau d'engagement (70% des recommandations)
-            if interest_level == 'High':
-                # Pour les utilisateurs très engagés, recommander des produits premium et nouveaux
-                premium_products = db.query(Product).filter(
-                    Product.price > 100,  # Seuil "premium"
-                    Product.id.notin_(already_seen_products + [rec['product_id'] for rec in recommendations])
-                ).order_by(desc(Product.created_at)).limit(2).all()
-                
-                for product in premium_products:
-                    recommendations.append({
-                        'product_id': product.id,
-                        'name': product.name,
-                        'price': product.price,
-                        'type': 'premium',
-                        'reason': 'Produits premium qui pourraient vous intéresser'
-                    })
-                
-                # Ajouter des produits nouveaux (dernier mois)
-                one_month_ago = datetime.datetime.now() - datetime.timedelta(days=30)
-                new_products = db.query(Product).filter(
-                    Product.created_at >= one_month_ago,
-                    Product.id.notin_(already_seen_products + [rec['product_id'] for rec in recommendations])
-                ).order_by(desc(Product.created_at)).limit(2).all()
-                
-                for product in new_products:
-                    recommendations.append({
-                        'product_id': product.id,
-                        'name': product.name,
-                        'price': product.price,
-                        'type': 'new_arrival',
-                        'reason': 'Nouveautés qui viennent d\'arriver'
-                    })
-                    
-            elif interest_level == 'Medium':
-                # Pour les utilisateurs moyennement engagés, recommander des produits populaires et bien notés
-                popular_products = db.query(Product).join(Order).group_by(Product.id).order_by(
-                    func.count(Order.id).desc()
-                ).filter(
-                    Product.id.notin_(already_seen_products + [rec['product_id'] for rec in recommendations])
-                ).limit(2).all()
-                
-                for product in popular_products:
-                    recommendations.append({
-                        'product_id': product.id,
-                        'name': product.name,
-                        'price': product.price,
-                        'type': 'popular',
-                        'reason': 'Produits populaires que d\'autres clients ont appréciés'
-                    })
-                
-                # Ajouter des produits bien notés
-                rated_products = db.query(Product).filter(
-                    Product.rating > 4,
-                    Product.id.notin_(already_seen_products + [rec['product_id'] for rec in recommendations])
-                ).order_by(desc(Product.rating), desc(Product.nb_rating)).limit(2).all()
-                
-                for product in rated_products:
-                    recommendations.append({
-                        'product_id': product.id,
-                        'name': product.name,
-                        'price': product.price,
-                        'type': 'highly_rated',
-                        'reason': 'Produits très bien notés par notre communauté'
-                    })
-                    
-            else:  # Low
-                # Pour les utilisateurs peu engagés, recommander des produits à prix réduit et accessibles
-                discount_products = db.query(Product).join(Banner).filter(
-                    Banner.discountPercent > 0,
-                    Product.id.notin_(already_seen_products + [rec['product_id'] for rec in recommendations])
-                ).order_by(desc(Banner.discountPercent)).limit(3).all()
-                
-                for product in discount_products:
-                    recommendations.append({
-                        'product_id': product.id,
-                        'name': product.name,
-                        'price': product.price,
-                        'type': 'discount',
-                        'reason': 'Offres spéciales pour vous'
-                    })
-                
-                # Ajouter des produits à bas prix
-                affordable_products = db.query(Product).filter(
-                    Product.price < 50,  # Seuil "abordable"
-                    Product.id.notin_(already_seen_products + [rec['product_id'] for rec in recommendations])
-                ).order_by(Product.price).limit(2).all()
-                
-                for product in affordable_products:
-                    recommendations.append({
-                        'product_id': product.id,
-                        'name': product.name,
-                        'price': product.price,
-                        'type': 'affordable',
-                        'reason': 'Produits à petits prix'
-                    })
+            # Toutes les stratégies en un seul aller-retour
+            strategies = self._recommendation_strategies(profile, interest_level, now=now)
+            for row in db.execute(self._strategies_statement(strategies, already_seen_products)):
+                rec_type, reason, _, _ = strategies[row.priority]
+                recommendations.append({
+                    'product_id': row.product_id,
+                    'name': row.name,
+                    'price': row.price,
+                    'type': rec_type,
+                    'reason': reason
+                })
             
             # Si nous n'avons pas assez de recommandations, ajouter des produits généraux
             if len(recommendations) < target_recommendations:
                 remaining = target_recommendations - len(recommendations)
-                additional_products = db.query(Product).filter(
-                    Product.id.notin_(already_seen_products + [rec['product_id'] for rec in recommendations])
-                ).order_by(func.random()).limit(remaining).all()
+                excluded = set(already_seen_products)
+                excluded.update(rec['product_id'] for rec in recommendations)
                 
-                for product in additional_products:
+                for product_id, name, price in self._sample_candidates(db, remaining, excluded):
                     recommendations.append({
-                        'product_id': product.id,
-                        'name': product.name,
-                        'price': product.price,
+                        'product_id': product_id,
+                        'name': name,
+                        'price': price,
                         'type': 'general',
                         'reason': 'Vous pourriez également aimer'
                     })
@@ -599,13 +1470,20 @@ class UserInterestPredictor:
             self.logger.error(f"Erreur lors de la génération des recommandations : {e}")
             return self._get_fallback_recommendations(db, profile.user_id)
     
-    def find_interested_users(self, product_id: int, db: Session, limit: int = 20) -> List[Dict]:
+    @track_latency
+    def find_interested_users(self, product_id: int, db: Session, limit: int = 20,
+                              use_audience_index: bool = True) -> List[Dict]:
         """
         Identifie les utilisateurs susceptibles d'être intéressés par un produit spécifique
         
+        Avec l'index d'audience, seuls les utilisateurs ayant acheté dans la catégorie du
+        produit (par tranche de panier moyen proche du prix) sont notés ; tous les profils
+        le sont si l'index n'est pas construit ou fournit moins de `limit` candidats.
+        
         :param product_id: ID du produit
         :param db: Session de base de données SQLAlchemy
         :param limit: Nombre maximum d'utilisateurs à retourner
+        :param use_audience_index: Restreindre le scoring à l'audience candidate du produit
         :return: Liste des utilisateurs potentiellement intéressés avec leur niveau d'intérêt et raison
         """
         try:
@@ -615,92 +1493,16 @@ class UserInterestPredictor:
                 self.logger.warning(f"Produit non trouvé avec l'ID {product_id}")
                 return []
                 
-            # Récupérer tous les profils utilisateurs
-            profiles = db.query(UserPreferenceProfile).all()
-            if not profiles:
-                self.logger.warning("Aucun profil utilisateur trouvé")
-                return []
-                
-            interested_users = []
-            
-            for profile in profiles:
-                interest_score = 0
-                reasons = []
-                
-                # Facteur 1: Le produit est dans la catégorie préférée de l'utilisateur
-                if product.category_id == profile.most_purchased_category_id:
-                    interest_score += 5
-                    reasons.append("Correspond à votre catégorie préférée")
-                
-                # Facteur 2: Le produit a un prix similaire à la valeur moyenne des commandes
-                if profile.average_order_value:
-                    price_ratio = product.price / profile.average_order_value
-                    if 0.8 <= price_ratio <= 1.2:
-                        interest_score += 3
-                        reasons.append("Prix similaire à vos achats habituels")
-                    elif price_ratio < 0.8:
-                        # Le produit est moins cher que la moyenne
-                        interest_score += 2
-                        reasons.append("Bon rapport qualité-prix par rapport à vos achats habituels")
-                
-                # Facteur 3: Le produit est similaire aux produits déjà achetés
-                if profile.preferred_product_ids:
-                    # Récupérer les produits similaires
-                    similar_products = db.query(Product).filter(
-                        Product.category_id == product.category_id,
-                        Product.id.in_(profile.preferred_product_ids)
-                    ).all()
-                    
-                    if similar_products:
-                        interest_score += 4
-                        reasons.append("Similaire à des produits que vous avez déjà achetés")
-                
-                # Facteur 4: L'heure actuelle correspond à l'heure d'achat préférée
-                current_hour = datetime.datetime.now().hour
-                if profile.preferred_purchase_time:
-                    preferred_hour_str = profile.preferred_purchase_time.split(':')[0]
-                    try:
-                        preferred_hour = int(preferred_hour_str)
-                        if abs(current_hour - preferred_hour) <= 2:  # À 2 heures près
-                            interest_score += 2
-                            reasons.append("Correspond à votre moment habituel d'achat")
-                    except ValueError:
-                        pass
-                
-                # Facteur 5: Le produit est nouveau et l'utilisateur est très engagé
-                engagement_level = self._calculate_engagement_level(profile)
-                if engagement_level == 'High':
-                    one_month_ago = datetime.datetime.now() - datetime.timedelta(days=30)
-                    if product.created_at and product.created_at >= one_month_ago:
-                        interest_score += 3
-                        reasons.append("Nouveauté susceptible de vous intéresser")
-                
-                # Facteur 6: Le produit est en promotion et l'utilisateur est peu engagé
-                if engagement_level == 'Low':
-                    banner = db.query(Banner).filter(Banner.product_id == product_id, Banner.discountPercent > 0).first()
-                    if banner:
-                        interest_score += 4
-                        reasons.append(f"En promotion avec {banner.discountPercent}% de réduction")
-                
-                # Déterminer le niveau d'intérêt global
-                interest_level = "Faible"
-                if interest_score >= 10:
-                    interest_level = "Élevé"
-                elif interest_score >= 5:
-                    interest_level = "Moyen"
-                
-                # N'ajouter l'utilisateur que s'il a un intérêt minimum
-                if interest_score >= 3:
-                    interested_users.append({
-                        'user_id': profile.user_id,
-                        'interest_score': interest_score,
-                        'interest_level': interest_level,
-                        'reasons': reasons,
-                        'engagement_level': engagement_level
-                    })
+            candidates = None
+            if use_audience_index and self.audience_max_candidates > 0:
+                candidates = self.audience_index.candidates(
+                    product.category_id, product.price, max(self.audience_max_candidates, limit)
+                )
+                if candidates is not None and len(candidates) < limit:
+                    candidates = None
             
-            # Trier les utilisateurs par score d'intérêt et limiter les résultats
-            sorted_users = sorted(interested_users, key=lambda x: x['interest_score'], reverse=True)[:limit]
+            # Scoring vectorisé des profils (chargés une seule fois en colonnes)
+            sorted_users = self.interest_scorer.find_interested_users(product, db, limit, candidates=candidates)
             
             self.logger.info(f"Identifié {len(sorted_users)} utilisateurs potentiellement intéressés par le produit {product_id}")
             return sorted_users
@@ -709,6 +1511,7 @@ class UserInterestPredictor:
             self.logger.error(f"Erreur lors de la recherche d'utilisateurs intéressés : {e}")
             return []
     
+    @track_latency
     def find_product_recommendations_for_user(self, user_id: int, db: Session, limit: int = 5) -> List[Product]:
         """
         Trouve des produits recommandés pour un utilisateur spécifique
@@ -775,11 +1578,18 @@ class UserInterestPredictor:
             # Si nous n'avons pas assez de produits, ajouter des produits généraux
             if len(recommended_products) < limit:
                 remaining = limit - len(recommended_products)
-                additional_products = db.query(Product).filter(
-                    Product.id.notin_(already_purchased + [p.id for p in recommended_products])
-                ).order_by(func.random()).limit(remaining).all()
+                excluded = set(already_purchased)
+                excluded.update(p.id for p in recommended_products)
+                sampled_ids = [product_id for product_id, _, _ in self._sample_candidates(db, remaining, excluded)]
                 
-                recommended_products.extend(additional_products)
+                # Chargement des produits tirés par clé primaire, dans l'ordre du tirage
+                if sampled_ids:
+                    products_by_id = {
+                        p.id: p for p in db.query(Product).filter(Product.id.in_(sampled_ids)).all()
+                    }
+                    recommended_products.extend(
+                        products_by_id[product_id] for product_id in sampled_ids if product_id in products_by_id
+                    )
             
             # Limiter le nombre total de produits retournés
             return recommended_products[:limit]
@@ -788,30 +1598,30 @@ class UserInterestPredictor:
             self.logger.error(f"Erreur lors de la recherche de produits recommandés : {e}")
             return []
     
-    def get_trending_products(self, db: Session, category_id: int = None, limit: int = 5) -> List[Product]:
+    @track_latency
+    def get_trending_products(self, db: Session, category_id: int = None, limit: int = 5,
+                              decayed: bool = False) -> List[Product]:
         """
         Obtient les produits tendance basés sur les commandes récentes
         
         :param db: Session de base de données SQLAlchemy
         :param category_id: ID de catégorie optionnel pour filtrer les résultats
         :param limit: Nombre maximum de produits à retourner
+        :param decayed: Pondérer les commandes par leur ancienneté plutôt que les compter sur 30 jours
         :return: Liste des objets Product tendance
         """
         try:
-            # Définir la période "récente" (30 derniers jours)
-            recent_period = datetime.datetime.now() - datetime.timedelta(days=30)
-            
-            # Requête de base pour les produits tendance
-            query = db.query(Product).join(Order).filter(Order.created_at >= recent_period)
-            
-            # Filtrer par catégorie si spécifié
-            if category_id is not None:
-                query = query.filter(Product.category_id == category_id)
-            
-            # Grouper par produit, compter les commandes et trier
-            trending_products = query.group_by(Product.id).order_by(
-                func.count(Order.id).desc()
-            ).limit(limit).all()
+            if not self.trending_counters.loaded:
+                self.trending_counters.load(db)
+            
+            # Produits les plus commandés sur les 30 derniers jours, d'après les compteurs journaliers
+            trending_ids = self.trending_counters.top(category_id, limit, decayed=decayed)
+            trending_products = []
+            if trending_ids:
+                products_by_id = {
+                    p.id: p for p in db.query(Product).filter(Product.id.in_(trending_ids)).all()
+                }
+                trending_products = [products_by_id[pid] for pid in trending_ids if pid in products_by_id]
             
             # Si pas assez de produits trouvés, compléter avec des produits bien notés
             if len(trending_products) < limit:
@@ -838,6 +1648,7 @@ class UserInterestPredictor:
             self.logger.error(f"Erreur lors de la récupération des produits tendance : {e}")
             return []
     
+    @track_latency
     def get_similar_products(self, product_id: int, db: Session, limit: int = 5) -> List[Product]:
         """
         Trouve des produits similaires à un produit donné
@@ -848,7 +1659,17 @@ class UserInterestPredictor:
         :return: Liste des objets Product similaires
         """
         try:
-            # Récupérer le produit de référence
+            # Voisins précalculés (même catégorie, texte, prix et note)
+            neighbors = self.similarity_index.neighbors(product_id)
+            if neighbors is not None:
+                neighbor_ids = [neighbor_id for neighbor_id, _ in neighbors]
+                products_by_id = {
+                    p.id: p for p in db.query(Product).filter(Product.id.in_(neighbor_ids)).all()
+                } if neighbor_ids else {}
+                # Les voisins supprimés depuis la construction sont ignorés
+                return [products_by_id[pid] for pid in neighbor_ids if pid in products_by_id][:limit]
+            
+            # Produit absent de l'index : proximité de prix dans la catégorie
             reference_product = db.query(Product).filter(Product.id == product_id).first()
             
             if not reference_product:
@@ -871,6 +1692,7 @@ class UserInterestPredictor:
             self.logger.error(f"Erreur lors de la recherche de produits similaires : {e}")
             return []
     
+    @track_latency
     def get_complementary_products(self, product_id: int, db: Session, limit: int = 3) -> List[Product]:
         """
         Trouve des produits complémentaires à un produit donné
@@ -888,47 +1710,21 @@ class UserInterestPredictor:
                 self.logger.warning(f"Produit de référence non trouvé avec l'ID {product_id}")
                 return []
             
-            # Trouver les commandes qui contiennent ce produit
-            orders_with_product = db.query(Order).filter(
-                Order.product_ids.contains([product_id])
-            ).all()
-            
-            if not orders_with_product:
-                # Si aucune commande trouvée, revenir à des produits complémentaires génériques
-                return self._get_generic_complementary_products(reference_product, db, limit)
-            
-            # Collecter tous les IDs des produits souvent achetés ensemble
-            complementary_product_ids = []
-            for order in orders_with_product:
-                # Prendre tous les autres produits de la commande
-                for pid in order.product_ids:
-                    if pid != product_id and pid not in complementary_product_ids:
-                        complementary_product_ids.append(pid)
+            # Lecture top-k dans la matrice d'achats conjoints précalculée
+            complementary = self.copurchase_index.top_k(product_id, limit)
             
-            # Si aucun produit complémentaire n'est trouvé
-            if not complementary_product_ids:
+            if not complementary:
+                # Si aucun achat conjoint n'est connu, revenir à des produits complémentaires génériques
                 return self._get_generic_complementary_products(reference_product, db, limit)
             
-            # Récupérer les produits et les trier par fréquence d'achat
-            complementary_products = db.query(Product).filter(
-                Product.id.in_(complementary_product_ids)
-            ).all()
-            
-            # Trier par fréquence d'apparition dans les commandes
-            product_frequency = {}
-            for product_id in complementary_product_ids:
-                if product_id in product_frequency:
-                    product_frequency[product_id] += 1
-                else:
-                    product_frequency[product_id] = 1
-            
-            sorted_products = sorted(
-                complementary_products,
-                key=lambda p: product_frequency.get(p.id, 0),
-                reverse=True
-            )
+            complementary_ids = [pid for pid, _ in complementary]
+            products_by_id = {
+                product.id: product
+                for product in db.query(Product).filter(Product.id.in_(complementary_ids)).all()
+            }
             
-            return sorted_products[:limit]
+            # Conserver l'ordre de fréquence d'achat conjoint
+            return [products_by_id[pid] for pid in complementary_ids if pid in products_by_id]
             
         except Exception as e:
             self.logger.error(f"Erreur lors de la recherche de produits complémentaires : {e}")
@@ -959,6 +1755,7 @@ class UserInterestPredictor:
             self.logger.error(f"Erreur lors de la génération de produits complémentaires génériques : {e}")
             return []
     
+    @track_latency
     def get_seasonal_products(self, db: Session, season: str = None, limit: int = 5) -> List[Product]:
         """
         Obtient les produits saisonniers ou de saison
@@ -981,36 +1778,17 @@ class UserInterestPredictor:
                 else:
                     season = "hiver"
             
-            # Mots-clés associés à chaque saison
-            seasonal_keywords = {
-                "printemps": ["printemps", "jardinage", "fleurs", "légumes", "frais", "pâques"],
-                "été": ["été", "plage", "vacances", "rafraîchissant", "barbecue", "piscine"],
-                "automne": ["automne", "rentrée", "halloween", "citrouille", "confort"],
-                "hiver": ["hiver", "noël", "fêtes", "chaud", "ski", "nouvel an"]
-            }
-            
-            keywords = seasonal_keywords.get(season.lower(), [])
+            if not self.seasonal_index.built:
+                self.seasonal_index.build(db)
             
-            # Rechercher des produits saisonniers par mots-clés dans le nom ou la description
+            # Produits dont le nom ou la description contient un mot-clé de la saison, par note décroissante
+            seasonal_ids = self.seasonal_index.top(season, limit)
             seasonal_products = []
-            
-            for keyword in keywords:
-                keyword_products = db.query(Product).filter(
-                    db.or_(
-                        Product.name.ilike(f"%{keyword}%"),
-                        Product.description.ilike(f"%{keyword}%")
-                    )
-                ).order_by(desc(Product.rating)).limit(limit).all()
-                
-                for product in keyword_products:
-                    if product not in seasonal_products:
-                        seasonal_products.append(product)
-                        
-                        if len(seasonal_products) >= limit:
-                            break
-                
-                if len(seasonal_products) >= limit:
-                    break
+            if seasonal_ids:
+                products_by_id = {
+                    p.id: p for p in db.query(Product).filter(Product.id.in_(seasonal_ids)).all()
+                }
+                seasonal_products = [products_by_id[pid] for pid in seasonal_ids if pid in products_by_id]
             
             # Si pas assez de produits trouvés par mots-clés, ajouter des produits récemment ajoutés
             if len(seasonal_products) < limit:
@@ -1030,65 +1808,98 @@ class UserInterestPredictor:
             self.logger.error(f"Erreur lors de la récupération des produits saisonniers : {e}")
             return []
     
-    def save_model(self, filepath=None):
+    def _build_metadata(self) -> Dict:
+        """
+        Métadonnées du modèle courant (performances et état d'entraînement)
+        """
+        return {
+            'training_time': self.last_training_time.isoformat() if self.last_training_time else None,
+            'performance': self.model_performance,
+            'training_state': {
+                'mode': self.last_training_mode,
+                'duration': self.last_training_duration,
+                'last_full_training_time': self.last_full_training_time.isoformat() if self.last_full_training_time else None,
+                'watermark': self.training_watermark.isoformat() if self.training_watermark else None
+            },
+            # Étapes mesurées de l'entraînement qui a produit ce modèle
+            'training_metrics': self.metrics.current_stages() or None,
+            # Encodage des vecteurs de caractéristiques attendu en entrée
+            'feature_version': FEATURE_VERSION,
+            'features': self.FEATURES
+        }
+    
+    def _apply_metadata(self, metadata: Dict):
+        """
+        Restaure les performances et l'état d'entraînement depuis des métadonnées
         """
-        Sauvegarde le modèle entraîné
+        if metadata.get('training_time'):
+            self.last_training_time = datetime.datetime.fromisoformat(metadata['training_time'])
         
-        :param filepath: Chemin de sauvegarde du modèle (optionnel)
+        if 'performance' in metadata:
+            self.model_performance = metadata['performance']
+        
+        training_state = metadata.get('training_state') or {}
+        self.last_training_mode = training_state.get('mode')
+        self.last_training_duration = training_state.get('duration')
+        if training_state.get('last_full_training_time'):
+            self.last_full_training_time = datetime.datetime.fromisoformat(training_state['last_full_training_time'])
+        if training_state.get('watermark'):
+            self.training_watermark = datetime.datetime.fromisoformat(training_state['watermark'])
+    
+    def save_model(self, activate: bool = True) -> Optional[str]:
+        """
+        Enregistre le modèle entraîné comme nouvelle version du registre
+        
+        :param activate: Désigner cette version comme version active
+        :return: Version enregistrée, ou None en cas d'échec
         """
         if self.model is None:
             self.logger.warning("Aucun modèle à sauvegarder")
-            return False
-        
-        filepath = filepath or self.model_filepath
+            return None
         
         try:
-            # Sauvegarder le modèle
-            joblib.dump(self.model, filepath)
-            
-            # Sauvegarder également les métadonnées
-            metadata = {
-                'training_time': self.last_training_time.isoformat() if self.last_training_time else None,
-                'performance': self.model_performance
-            }
-            
-            metadata_filepath = f"{os.path.splitext(filepath)[0]}_metadata.joblib"
-            joblib.dump(metadata, metadata_filepath)
-            
-            self.logger.info(f"Modèle sauvegardé à {filepath}")
-            return True
+            with self.metrics.stage('save'):
+                version = self.registry.register(self.model, self._build_metadata(), activate=activate)
+            if activate:
+                self.model_version = version
+            return version
         except Exception as e:
             self.logger.error(f"Erreur lors de la sauvegarde du modèle : {e}")
-            return False
+            return None
     
-    def load_model(self, filepath=None):
+    def load_model(self, version: Optional[str] = None, mmap_mode: Optional[str] = 'r') -> bool:
         """
-        Charge un modèle préentraîné
+        Charge une version du registre (par défaut la version active) et la met en service
+        
+        Le modèle est chargé et vérifié avant d'être substitué : les prédictions
+        en cours continuent sur l'ancien modèle. Une version entraînée sur un
+        autre encodage des caractéristiques (FEATURE_VERSION) est refusée.
         
-        :param filepath: Chemin du modèle à charger (optionnel)
+        :param version: Version à charger (optionnel)
+        :param mmap_mode: Projection mémoire des tableaux de l'artefact (None pour les copier)
         :return: True si le chargement a réussi, False sinon
         """
-        filepath = filepath or self.model_filepath
-        
         try:
-            # Charger le modèle
-            self.model = joblib.load(filepath)
+            model, metadata = self.registry.load(version, mmap_mode=mmap_mode)
+            if metadata.get('feature_version') != FEATURE_VERSION:
+                self.logger.warning(f"Version {metadata.get('version')} entraînée sur un autre encodage des "
+                                    f"caractéristiques ({metadata.get('feature_version')}) - ignorée")
+                return False
             
-            # Tenter de charger les métadonnées
-            try:
-                metadata_filepath = f"{os.path.splitext(filepath)[0]}_metadata.joblib"
-                metadata = joblib.load(metadata_filepath)
-                
-                if 'training_time' in metadata:
-                    self.last_training_time = datetime.datetime.fromisoformat(metadata['training_time'])
-                
-                if 'performance' in metadata:
-                    self.model_performance = metadata['performance']
-                
-            except Exception as e:
-                self.logger.warning(f"Impossible de charger les métadonnées du modèle : {e}")
+            compiled = self._compile_model(model)
+            
+            with self._model_lock:
+                previous_version = self.model_version
+                self._apply_metadata(metadata)
+                self.model = model
+                self.compiled_model = compiled
+                self.model_version = metadata.get('version')
+            
+            # Nouvelle version activée (entraînement, rollback, synchronisation) : recommandations en cache périmées
+            if previous_version is not None and previous_version != self.model_version:
+                recommendation_cache.clear()
             
-            self.logger.info(f"Modèle chargé depuis {filepath}")
+            self.logger.info(f"Modèle chargé depuis le registre : version {self.model_version}")
             return True
         except Exception as e:
             self.logger.warning(f"Modèle non trouvé ou erreur de chargement : {e}")
@@ -0,0 +1,148 @@
+import pickle
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.base import ClassifierMixin
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+
+DEFAULT_BACKEND = 'random_forest'
+
+# Configurations évaluées par la sélection de modèle (ML_MODEL_GRID pour les remplacer)
+DEFAULT_MODEL_GRID = [
+    {'name': 'rf-100', 'backend': 'random_forest', 'params': {}},
+    {'name': 'rf-50-d12', 'backend': 'random_forest', 'params': {'n_estimators': 50, 'max_depth': 12}},
+    {'name': 'rf-200-d16', 'backend': 'random_forest', 'params': {'n_estimators': 200, 'max_depth': 16}},
+    {'name': 'hgb-100', 'backend': 'hist_gradient_boosting', 'params': {}},
+    {'name': 'hgb-200-d6', 'backend': 'hist_gradient_boosting', 'params': {'max_iter': 200, 'max_depth': 6}},
+]
+
+
+def _random_forest(n_jobs: int) -> ClassifierMixin:
+    return RandomForestClassifier(
+        n_estimators=100,
+        random_state=42,
+        class_weight='balanced',
+        n_jobs=n_jobs  # Cœurs alloués au processus d'entraînement
+    )
+
+
+def _hist_gradient_boosting(n_jobs: int) -> ClassifierMixin:
+    # Parallélisme OpenMP : borné par threadpool_limits dans le processus d'entraînement
+    return HistGradientBoostingClassifier(
+        max_iter=100,
+        learning_rate=0.1,
+        class_weight='balanced',
+        early_stopping='auto',
+        random_state=42
+    )
+
+
+# Classifieurs d'engagement disponibles (ML_ESTIMATOR_BACKEND) : nom -> (classe, fabrique)
+ESTIMATOR_BACKENDS: Dict[str, Tuple[type, Callable[[int], ClassifierMixin]]] = {
+    'random_forest': (RandomForestClassifier, _random_forest),
+    'hist_gradient_boosting': (HistGradientBoostingClassifier, _hist_gradient_boosting),
+}
+
+
+def build_estimator(backend: str, n_jobs: int = 1, **params) -> ClassifierMixin:
+    """
+    Instancie le classifieur d'un backend
+
+    :param backend: Nom du backend (clé de ESTIMATOR_BACKENDS)
+    :param n_jobs: Nombre de cœurs alloués à l'entraînement
+    :param params: Hyperparamètres remplaçant ceux du backend (n_estimators, max_depth...)
+    :return: Classifieur non entraîné
+    """
+    try:
+        _, factory = ESTIMATOR_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Backend de classifieur inconnu : {backend} "
+                         f"(disponibles : {', '.join(ESTIMATOR_BACKENDS)})")
+    estimator = factory(n_jobs)
+    if params:
+        estimator.set_params(**params)
+    return estimator
+
+
+def backend_of(estimator) -> Optional[str]:
+    """
+    Nom du backend d'un classifieur entraîné (None s'il n'est pas enregistré)
+    """
+    for backend, (estimator_class, _) in ESTIMATOR_BACKENDS.items():
+        if type(estimator) is estimator_class:
+            return backend
+    return None
+
+
+def model_size_bytes(model) -> int:
+    """
+    Taille sérialisée d'un modèle (pickle), proche de celle de l'artefact non compressé
+    """
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def inference_latency(model, X: np.ndarray, samples: int = 200, compiled=None) -> Dict:
+    """
+    Mesure la latence d'inférence d'un modèle ligne par ligne et par lot
+
+    :param model: Pipeline entraîné
+    :param X: Vecteurs de caractéristiques (jeu de test)
+    :param samples: Nombre de prédictions unitaires mesurées
+    :param compiled: Évaluateur compilé du pipeline, mesuré à sa place s'il est fourni
+    :return: Dictionnaire {compiled, single_row_p50_ms, single_row_p95_ms, single_row_p99_ms,
+             batch_rows, batch_per_row_us}
+    """
+    if len(X) == 0:
+        return {}
+
+    if compiled is not None:
+        predict_one, predict = compiled.predict_one, compiled.predict
+    else:
+        predict_one, predict = (lambda row: model.predict(row.reshape(1, -1))), model.predict
+
+    timings = []
+    for i in range(min(samples, len(X))):
+        row = X[i]
+        started = time.perf_counter()
+        predict_one(row)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    predict(X)
+    batch_seconds = time.perf_counter() - started
+
+    return {
+        'compiled': compiled is not None,
+        'single_row_p50_ms': round(float(np.percentile(timings, 50)), 4),
+        'single_row_p95_ms': round(float(np.percentile(timings, 95)), 4),
+        'single_row_p99_ms': round(float(np.percentile(timings, 99)), 4),
+        'batch_rows': len(X),
+        'batch_per_row_us': round(batch_seconds / len(X) * 1e6, 3),
+    }
+
+
+def select_configuration(results: List[Dict], latency_budget_ms: float, memory_budget_bytes: int) -> int:
+    """
+    Choisit la configuration la plus précise qui respecte les budgets
+
+    Une configuration respecte les budgets si sa latence unitaire p99 et sa
+    mémoire (artefact et évaluateur compilé) ne les dépassent pas. À précision
+    égale, la plus rapide puis la plus petite l'emporte. Si aucune ne respecte
+    les budgets, la plus rapide est retenue.
+
+    :param results: Mesures par configuration (accuracy, inference_latency, memory_bytes)
+    :param latency_budget_ms: Budget de latence unitaire p99 (ms)
+    :param memory_budget_bytes: Budget mémoire (octets)
+    :return: Indice de la configuration retenue
+    """
+    def latency(i):
+        return results[i]['inference_latency'].get('single_row_p99_ms', float('inf'))
+
+    for i, result in enumerate(results):
+        result['within_budget'] = latency(i) <= latency_budget_ms and result['memory_bytes'] <= memory_budget_bytes
+
+    eligible = [i for i, result in enumerate(results) if result['within_budget']]
+    if not eligible:
+        return min(range(len(results)), key=lambda i: (latency(i), results[i]['memory_bytes']))
+    return min(eligible, key=lambda i: (-results[i]['accuracy'], latency(i), results[i]['memory_bytes']))
@@ -0,0 +1,239 @@
+import datetime
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models import UserFeatureVector, UserPreferenceProfile
+from .features import (
+    DEFAULT_CHUNK_SIZE, FEATURE_COLUMNS, FEATURE_VERSION, PROFILE_COLUMNS,
+    profile_filters, encode_features, profile_vector
+)
+
+N_FEATURES = len(FEATURE_COLUMNS)
+
+
+def _decode(blobs: List[bytes]) -> np.ndarray:
+    """
+    Reconstitue une matrice (n x N_FEATURES) à partir des octets des vecteurs
+    """
+    return np.frombuffer(b''.join(blobs), dtype=np.float32).reshape(-1, N_FEATURES)
+
+
+class FeatureStore:
+    """
+    Magasin des vecteurs de caractéristiques par utilisateur (table `user_feature_vectors`)
+
+    Chaque profil est encodé une fois, à son écriture, en un vecteur float32
+    dense estampillé de FEATURE_VERSION. L'entraînement lit la table en masse
+    et l'inférence par clé primaire : les deux utilisent exactement les mêmes
+    caractéristiques, sans DataFrame sur le chemin des requêtes. Les vecteurs
+    absents ou d'une autre version sont recalculés par `sync`.
+    """
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.logger = logging.getLogger(__name__)
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def upsert(db: Session, profiles: Iterable[Dict]):
+        """
+        Enregistre les vecteurs de profils modifiés (sans commit : dans la transaction de l'appelant)
+
+        :param db: Session de base de données SQLAlchemy
+        :param profiles: Lignes de profil (user_id, total_orders, average_order_value,
+                         most_purchased_category_id, preferred_purchase_time, updated_at)
+        """
+        profiles = list(profiles)
+        if not profiles:
+            return
+
+        vectors = encode_features(
+            [p['total_orders'] for p in profiles],
+            [p['average_order_value'] for p in profiles],
+            [p['most_purchased_category_id'] for p in profiles],
+            [p['preferred_purchase_time'] for p in profiles],
+        )
+        computed_at = datetime.datetime.now(datetime.timezone.utc)
+
+        stmt = insert(UserFeatureVector).values([
+            {
+                'user_id': p['user_id'],
+                'features': vector.tobytes(),
+                'version': FEATURE_VERSION,
+                'profile_updated_at': p['updated_at'],
+                'computed_at': computed_at,
+            }
+            for p, vector in zip(profiles, vectors)
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[UserFeatureVector.user_id],
+            set_={
+                'features': stmt.excluded.features,
+                'version': stmt.excluded.version,
+                'profile_updated_at': stmt.excluded.profile_updated_at,
+                'computed_at': stmt.excluded.computed_at,
+            }
+        ))
+
+    def sync(self, db: Session) -> int:
+        """
+        Encode les profils sans vecteur à jour (absent, d'une autre version ou plus ancien que le profil)
+
+        :param db: Session de base de données SQLAlchemy
+        :return: Nombre de vecteurs écrits
+        """
+        stale = select(*PROFILE_COLUMNS).outerjoin(
+            UserFeatureVector, UserFeatureVector.user_id == UserPreferenceProfile.user_id
+        ).where(
+            *profile_filters(None),
+            or_(
+                UserFeatureVector.user_id.is_(None),
+                UserFeatureVector.version != FEATURE_VERSION,
+                UserFeatureVector.profile_updated_at < UserPreferenceProfile.updated_at
+            )
+        ).limit(self.chunk_size)
+
+        total = 0
+        try:
+            # Chaque lot écrit devient à jour : la requête suivante renvoie les profils restants
+            while True:
+                rows = db.execute(stale).all()
+                if not rows:
+                    break
+                self.upsert(db, [
+                    {
+                        'user_id': row.user_id,
+                        'total_orders': row.total_orders,
+                        'average_order_value': row.average_order_value,
+                        'most_purchased_category_id': row.most_purchased_category_id,
+                        'preferred_purchase_time': row.preferred_purchase_time,
+                        'updated_at': row.updated_at,
+                    }
+                    for row in rows
+                ])
+                db.commit()
+                total += len(rows)
+        except Exception as e:
+            db.rollback()
+            self.logger.error(f"Erreur lors de la synchronisation des vecteurs de caractéristiques : {e}")
+
+        if total:
+            self.logger.info(f"{total} vecteurs de caractéristiques mis à jour")
+        return total
+
+    def iter_chunks(self, db: Session, since: Optional[datetime.datetime] = None, by_update: bool = False
+                    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Parcourt les vecteurs de la version courante par lots, via un curseur côté serveur
+
+        :param db: Session de base de données SQLAlchemy
+        :param since: Ne retenir que les profils modifiés après cette date (optionnel)
+        :param by_update: Parcourir par date de modification croissante plutôt que par user_id
+        :return: Itérateur de tuples (user_ids, vecteurs float32, dates de modification des profils)
+        """
+        stmt = select(
+            UserFeatureVector.user_id, UserFeatureVector.features, UserFeatureVector.profile_updated_at
+        ).where(UserFeatureVector.version == FEATURE_VERSION)
+        if since is not None:
+            stmt = stmt.where(UserFeatureVector.profile_updated_at > since)
+        if by_update:
+            # Une lecture interrompue laisse les profils non lus après tous ceux déjà lus
+            stmt = stmt.order_by(UserFeatureVector.profile_updated_at, UserFeatureVector.user_id)
+        else:
+            stmt = stmt.order_by(UserFeatureVector.user_id)
+
+        result = db.execute(stmt.execution_options(yield_per=self.chunk_size))
+        try:
+            for rows in result.partitions(self.chunk_size):
+                user_ids, blobs, updated_at = zip(*rows)
+                yield (
+                    np.asarray(user_ids, dtype=np.int64),
+                    _decode(blobs),
+                    np.asarray(updated_at, dtype='datetime64[us]')
+                )
+        finally:
+            result.close()
+
+    def load_matrix(self, db: Session, since: Optional[datetime.datetime] = None
+                    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Lit en masse les vecteurs de la version courante
+
+        :param db: Session de base de données SQLAlchemy
+        :param since: Ne retenir que les profils modifiés après cette date (optionnel)
+        :return: Tuple (user_ids, matrice float32 n x N_FEATURES, dates de modification des profils)
+        """
+        chunks = list(self.iter_chunks(db, since=since))
+        if not chunks:
+            return (np.empty(0, dtype=np.int64), np.empty((0, N_FEATURES), dtype=np.float32),
+                    np.empty(0, dtype='datetime64[us]'))
+        user_ids, vectors, updated_at = zip(*chunks)
+        return np.concatenate(user_ids), np.concatenate(vectors), np.concatenate(updated_at)
+
+    @staticmethod
+    def vector(db: Session, profile: UserPreferenceProfile) -> np.ndarray:
+        """
+        Lit le vecteur d'un utilisateur par clé primaire
+
+        Le vecteur est encodé depuis le profil fourni s'il est absent, d'une
+        autre version ou antérieur à la dernière modification du profil.
+
+        :param db: Session de base de données SQLAlchemy
+        :param profile: Profil de préférences de l'utilisateur
+        :return: Vecteur float32
+        """
+        row = db.execute(
+            select(UserFeatureVector.features, UserFeatureVector.version, UserFeatureVector.profile_updated_at)
+            .where(UserFeatureVector.user_id == profile.user_id)
+        ).first()
+        if row is not None and row.version == FEATURE_VERSION and (
+            profile.updated_at is None
+            or (row.profile_updated_at is not None and row.profile_updated_at >= profile.updated_at)
+        ):
+            return _decode([row.features])[0]
+        return profile_vector(profile)
+
+    def get(self, db: Session, user_ids: List[int]) -> Dict[int, np.ndarray]:
+        """
+        Lit les vecteurs d'utilisateurs par clé primaire
+
+        Les utilisateurs sans vecteur à la version courante sont encodés à la
+        volée depuis leur profil (sans écriture) ; les profils introuvables ou
+        incomplets sont absents du résultat.
+
+        :param db: Session de base de données SQLAlchemy
+        :param user_ids: IDs des utilisateurs
+        :return: Dictionnaire user_id -> vecteur float32
+        """
+        user_ids = list(user_ids)
+        vectors: Dict[int, np.ndarray] = {}
+
+        for start in range(0, len(user_ids), self.chunk_size):
+            rows = db.execute(
+                select(UserFeatureVector.user_id, UserFeatureVector.features).where(
+                    UserFeatureVector.user_id.in_(user_ids[start:start + self.chunk_size]),
+                    UserFeatureVector.version == FEATURE_VERSION
+                )
+            ).all()
+            vectors.update(zip((row.user_id for row in rows), _decode([row.features for row in rows])))
+
+        missing = [user_id for user_id in user_ids if user_id not in vectors]
+        for start in range(0, len(missing), self.chunk_size):
+            rows = db.execute(
+                select(*PROFILE_COLUMNS).where(
+                    *profile_filters(None),
+                    UserPreferenceProfile.user_id.in_(missing[start:start + self.chunk_size])
+                )
+            ).all()
+            if rows:
+                encoded = encode_features(
+                    [row.total_orders for row in rows], [row.average_order_value for row in rows],
+                    [row.most_purchased_category_id for row in rows], [row.preferred_purchase_time for row in rows]
+                )
+                vectors.update(zip((row.user_id for row in rows), encoded))
+
+        return vectors
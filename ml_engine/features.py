@@ -0,0 +1,80 @@
+import datetime
+from typing import List, Optional
+
+import numpy as np
+
+from models import UserPreferenceProfile
+from .interest_scoring import ENGAGEMENT_LEVELS, engagement_codes
+
+# Taille par défaut des lots lus en base
+DEFAULT_CHUNK_SIZE = 10000
+
+# Version de l'encodage des vecteurs de caractéristiques (à incrémenter à chaque changement)
+FEATURE_VERSION = 1
+
+# Colonnes des vecteurs de caractéristiques, dans l'ordre des entrées du modèle
+FEATURE_COLUMNS = ('total_orders', 'average_order_value', 'top_category', 'preferred_purchase_time')
+
+# Moments d'achat, dans l'ordre de leur code numérique (-1 : inconnu)
+PURCHASE_TIMES = ('Matin', 'Après-midi', 'Soir', 'Nuit')
+_PURCHASE_TIME_CODES = {name: code for code, name in enumerate(PURCHASE_TIMES)}
+
+
+def encode_features(total_orders, average_order_values, categories, purchase_times) -> np.ndarray:
+    """
+    Encode des profils en vecteurs float32 denses (colonnes de FEATURE_COLUMNS)
+
+    Les valeurs nulles valent 0 ; le moment d'achat est remplacé par son code
+    dans PURCHASE_TIMES (-1 s'il est inconnu).
+
+    :return: Tableau (n profils x len(FEATURE_COLUMNS)) de float32
+    """
+    return np.column_stack([
+        np.asarray([value or 0 for value in total_orders], dtype=np.float32),
+        np.asarray([value or 0 for value in average_order_values], dtype=np.float32),
+        np.asarray([value or 0 for value in categories], dtype=np.float32),
+        np.asarray([_PURCHASE_TIME_CODES.get(value, -1) for value in purchase_times], dtype=np.float32),
+    ]).reshape(-1, len(FEATURE_COLUMNS))
+
+
+def profile_vector(profile) -> np.ndarray:
+    """
+    Vecteur de caractéristiques d'un profil (objet ou ligne ayant les attributs du profil)
+    """
+    return encode_features(
+        [profile.total_orders], [profile.average_order_value],
+        [profile.most_purchased_category_id], [profile.preferred_purchase_time]
+    )[0]
+
+
+def engagement_levels(vectors: np.ndarray) -> np.ndarray:
+    """
+    Niveaux d'engagement calculés par la règle à partir de vecteurs de caractéristiques
+    """
+    return ENGAGEMENT_LEVELS[engagement_codes(
+        vectors[:, 0].astype(np.float64), vectors[:, 1].astype(np.float64)
+    )].astype(object)
+
+
+# Colonnes lues pour construire les caractéristiques
+PROFILE_COLUMNS = (
+    UserPreferenceProfile.user_id,
+    UserPreferenceProfile.total_orders,
+    UserPreferenceProfile.average_order_value,
+    UserPreferenceProfile.most_purchased_category_id,
+    UserPreferenceProfile.preferred_purchase_time,
+    UserPreferenceProfile.updated_at,
+)
+
+
+def profile_filters(since: Optional[datetime.datetime]) -> List:
+    """
+    Filtres SQL des profils exploitables pour l'entraînement
+    """
+    filters = [
+        UserPreferenceProfile.total_orders.isnot(None),
+        UserPreferenceProfile.average_order_value.isnot(None),
+    ]
+    if since is not None:
+        filters.append(UserPreferenceProfile.updated_at > since)
+    return filters
@@ -0,0 +1,297 @@
+import datetime
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sqlalchemy.orm import Session
+
+from models import UserPreferenceProfile, Product, Banner
+
+# Codes des niveaux d'engagement dans les colonnes NumPy
+ENGAGEMENT_LEVELS = np.array(['Low', 'Medium', 'High'])
+ENGAGEMENT_LOW, ENGAGEMENT_MEDIUM, ENGAGEMENT_HIGH = 0, 1, 2
+
+# Valeur sentinelle pour les colonnes entières nulles (catégorie, heure)
+MISSING = -1
+
+
+def engagement_codes(total_orders: np.ndarray, average_order_values: np.ndarray) -> np.ndarray:
+    """
+    Version vectorisée de UserInterestPredictor._calculate_engagement_level
+
+    :param total_orders: Nombre de commandes par utilisateur (0 si inconnu)
+    :param average_order_values: Valeur moyenne des commandes (0 si inconnue)
+    :return: Codes d'engagement (0=Low, 1=Medium, 2=High)
+    """
+    engagement_score = total_orders * 0.7 + (average_order_values / 100) * 0.3
+    codes = np.full(len(engagement_score), ENGAGEMENT_LOW, dtype=np.int8)
+    codes[engagement_score > 5] = ENGAGEMENT_MEDIUM
+    codes[engagement_score > 10] = ENGAGEMENT_HIGH
+    return codes
+
+
+def _parse_purchase_hour(preferred_purchase_time: Optional[str]) -> int:
+    """
+    Extrait l'heure d'un moment d'achat au format "HH:MM" (MISSING si non numérique)
+    """
+    if not preferred_purchase_time:
+        return MISSING
+    try:
+        return int(preferred_purchase_time.split(':')[0])
+    except ValueError:
+        return MISSING
+
+
+class ProfileColumns:
+    """
+    Instantané columnar des profils utilisateurs utilisé pour le scoring par lots
+    """
+
+    def __init__(self, user_ids: np.ndarray, category_ids: np.ndarray, average_order_values: np.ndarray,
+                 has_average_order_value: np.ndarray, purchase_hours: np.ndarray,
+                 engagement: np.ndarray, purchased: csr_matrix):
+        self.user_ids = user_ids
+        self.category_ids = category_ids
+        self.average_order_values = average_order_values
+        self.has_average_order_value = has_average_order_value
+        self.purchase_hours = purchase_hours
+        self.engagement = engagement
+        # Matrice utilisateurs x produits (indexée par ID produit) des produits déjà achetés
+        self.purchased = purchased
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def select_users(self, user_ids: np.ndarray) -> "ProfileColumns":
+        """
+        Sous-ensemble des profils de certains utilisateurs, dans l'ordre des profils
+
+        :param user_ids: IDs des utilisateurs (triés)
+        :return: Instantané restreint aux profils trouvés
+        """
+        rows = np.searchsorted(self.user_ids, user_ids)
+        rows = rows[rows < len(self.user_ids)]
+        rows = np.unique(rows[np.isin(self.user_ids[rows], user_ids)])
+        subset = ProfileColumns(
+            user_ids=self.user_ids[rows],
+            category_ids=self.category_ids[rows],
+            average_order_values=self.average_order_values[rows],
+            has_average_order_value=self.has_average_order_value[rows],
+            purchase_hours=self.purchase_hours[rows],
+            engagement=self.engagement[rows],
+            purchased=self.purchased[rows]
+        )
+        subset.loaded_at = self.loaded_at
+        return subset
+
+    @classmethod
+    def load(cls, db: Session) -> "ProfileColumns":
+        """
+        Charge tous les profils en une seule requête, en ne sélectionnant que les colonnes utiles
+
+        :param db: Session de base de données SQLAlchemy
+        :return: Instantané columnar des profils
+        """
+        rows = db.query(
+            UserPreferenceProfile.user_id,
+            UserPreferenceProfile.most_purchased_category_id,
+            UserPreferenceProfile.average_order_value,
+            UserPreferenceProfile.total_orders,
+            UserPreferenceProfile.preferred_purchase_time,
+            UserPreferenceProfile.preferred_product_ids
+        ).order_by(UserPreferenceProfile.user_id).all()
+
+        n = len(rows)
+        user_ids = np.empty(n, dtype=np.int64)
+        category_ids = np.empty(n, dtype=np.int64)
+        average_order_values = np.zeros(n, dtype=np.float64)
+        has_average_order_value = np.zeros(n, dtype=bool)
+        total_orders = np.zeros(n, dtype=np.float64)
+        purchase_hours = np.empty(n, dtype=np.int64)
+
+        # Construction CSR de la matrice des produits achetés
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        indices = []
+
+        for i, row in enumerate(rows):
+            user_ids[i] = row.user_id
+            category_ids[i] = row.most_purchased_category_id if row.most_purchased_category_id is not None else MISSING
+            if row.average_order_value:
+                average_order_values[i] = row.average_order_value
+                has_average_order_value[i] = True
+            total_orders[i] = row.total_orders or 0
+            purchase_hours[i] = _parse_purchase_hour(row.preferred_purchase_time)
+
+            product_ids = set(row.preferred_product_ids or [])
+            indices.extend(product_ids)
+            indptr[i + 1] = indptr[i] + len(product_ids)
+
+        indices = np.asarray(indices, dtype=np.int64)
+        n_products = int(indices.max()) + 1 if len(indices) else 1
+        purchased = csr_matrix(
+            (np.ones(len(indices), dtype=np.int8), indices, indptr),
+            shape=(n, n_products)
+        )
+
+        return cls(
+            user_ids=user_ids,
+            category_ids=category_ids,
+            average_order_values=average_order_values,
+            has_average_order_value=has_average_order_value,
+            purchase_hours=purchase_hours,
+            engagement=engagement_codes(total_orders, average_order_values),
+            purchased=purchased
+        )
+
+
+class InterestScorer:
+    """
+    Moteur de scoring vectorisé des utilisateurs intéressés par un produit
+
+    Les profils sont chargés une seule fois en colonnes NumPy puis réutilisés
+    pendant `refresh_interval` secondes ; les six facteurs de
+    UserInterestPredictor.find_interested_users sont calculés sur tous les
+    utilisateurs à la fois.
+    """
+
+    def __init__(self, refresh_interval: int = 300):
+        self.logger = logging.getLogger(__name__)
+        self.refresh_interval = refresh_interval
+        self._columns: Optional[ProfileColumns] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """
+        Force le rechargement des profils au prochain appel
+        """
+        with self._lock:
+            self._columns = None
+
+    def get_columns(self, db: Session) -> ProfileColumns:
+        """
+        Retourne l'instantané des profils, rechargé s'il est absent ou périmé
+
+        :param db: Session de base de données SQLAlchemy
+        :return: Instantané columnar des profils
+        """
+        with self._lock:
+            columns = self._columns
+            if columns is None or time.monotonic() - columns.loaded_at > self.refresh_interval:
+                columns = ProfileColumns.load(db)
+                self._columns = columns
+                self.logger.info(f"Profils chargés en colonnes : {len(columns)} utilisateurs")
+            return columns
+
+    def find_interested_users(self, product: Product, db: Session, limit: int = 20,
+                              candidates: Optional[np.ndarray] = None) -> List[Dict]:
+        """
+        Calcule le score d'intérêt des utilisateurs pour un produit et retourne les meilleurs
+
+        :param product: Produit cible
+        :param db: Session de base de données SQLAlchemy
+        :param limit: Nombre maximum d'utilisateurs à retourner
+        :param candidates: Restreindre le scoring à ces IDs utilisateurs, triés (optionnel : tous)
+        :return: Liste des utilisateurs intéressés, triée par score décroissant
+        """
+        columns = self.get_columns(db)
+        if candidates is not None:
+            columns = columns.select_users(candidates)
+        n = len(columns)
+        if n == 0:
+            self.logger.warning("Aucun profil utilisateur trouvé")
+            return []
+
+        scores = np.zeros(n, dtype=np.int64)
+
+        # Facteur 1: Le produit est dans la catégorie préférée de l'utilisateur
+        product_category = product.category_id if product.category_id is not None else MISSING
+        same_category = columns.category_ids == product_category
+        scores += same_category * 5
+
+        # Facteur 2: Le produit a un prix similaire à la valeur moyenne des commandes
+        price_ratio = np.divide(
+            product.price, columns.average_order_values,
+            out=np.zeros(n, dtype=np.float64),
+            where=columns.has_average_order_value
+        )
+        similar_price = columns.has_average_order_value & (price_ratio >= 0.8) & (price_ratio <= 1.2)
+        cheaper = columns.has_average_order_value & (price_ratio < 0.8)
+        scores += similar_price * 3 + cheaper * 2
+
+        # Facteur 3: Le produit est similaire aux produits déjà achetés (même catégorie)
+        category_product_ids = np.fromiter(
+            (row.id for row in db.query(Product.id).filter(Product.category_id == product.category_id)),
+            dtype=np.int64
+        )
+        category_mask = np.zeros(columns.purchased.shape[1], dtype=np.int32)
+        category_mask[category_product_ids[category_product_ids < len(category_mask)]] = 1
+        bought_similar = (columns.purchased @ category_mask) > 0
+        scores += bought_similar * 4
+
+        # Facteur 4: L'heure actuelle correspond à l'heure d'achat préférée (à 2 heures près)
+        current_hour = datetime.datetime.now().hour
+        usual_hour = (columns.purchase_hours != MISSING) & (np.abs(current_hour - columns.purchase_hours) <= 2)
+        scores += usual_hour * 2
+
+        # Facteur 5: Le produit est nouveau et l'utilisateur est très engagé
+        one_month_ago = datetime.datetime.now() - datetime.timedelta(days=30)
+        is_new_product = bool(product.created_at and product.created_at >= one_month_ago)
+        new_for_engaged = (columns.engagement == ENGAGEMENT_HIGH) & is_new_product
+        scores += new_for_engaged * 3
+
+        # Facteur 6: Le produit est en promotion et l'utilisateur est peu engagé
+        low_engagement = columns.engagement == ENGAGEMENT_LOW
+        banner = None
+        if product.banner_id is not None and low_engagement.any():
+            banner = db.query(Banner).filter(Banner.id == product.banner_id, Banner.discountPercent > 0).first()
+        discounted_for_low = low_engagement & (banner is not None)
+        scores += discounted_for_low * 4
+
+        # Sélection des meilleurs scores : la clé unique départage les égalités par ordre de profil
+        candidates = np.flatnonzero(scores >= 3)
+        if len(candidates) == 0:
+            return []
+        keys = scores[candidates] * n + (n - 1 - candidates)
+        if len(candidates) > limit:
+            top = np.argpartition(-keys, limit - 1)[:limit]
+            candidates, keys = candidates[top], keys[top]
+        selected = candidates[np.argsort(-keys)]
+
+        interested_users = []
+        for i in selected:
+            reasons = []
+            if same_category[i]:
+                reasons.append("Correspond à votre catégorie préférée")
+            if similar_price[i]:
+                reasons.append("Prix similaire à vos achats habituels")
+            elif cheaper[i]:
+                reasons.append("Bon rapport qualité-prix par rapport à vos achats habituels")
+            if bought_similar[i]:
+                reasons.append("Similaire à des produits que vous avez déjà achetés")
+            if usual_hour[i]:
+                reasons.append("Correspond à votre moment habituel d'achat")
+            if new_for_engaged[i]:
+                reasons.append("Nouveauté susceptible de vous intéresser")
+            if discounted_for_low[i]:
+                reasons.append(f"En promotion avec {banner.discountPercent}% de réduction")
+
+            interest_score = int(scores[i])
+            interest_level = "Faible"
+            if interest_score >= 10:
+                interest_level = "Élevé"
+            elif interest_score >= 5:
+                interest_level = "Moyen"
+
+            interested_users.append({
+                'user_id': int(columns.user_ids[i]),
+                'interest_score': interest_score,
+                'interest_level': interest_level,
+                'reasons': reasons,
+                'engagement_level': str(ENGAGEMENT_LEVELS[columns.engagement[i]])
+            })
+
+        return interested_users
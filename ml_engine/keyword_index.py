@@ -0,0 +1,153 @@
+import bisect
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models import Product
+
+# Mots-clés associés à chaque saison
+SEASONAL_KEYWORDS = {
+    "printemps": ["printemps", "jardinage", "fleurs", "légumes", "frais", "pâques"],
+    "été": ["été", "plage", "vacances", "rafraîchissant", "barbecue", "piscine"],
+    "automne": ["automne", "rentrée", "halloween", "citrouille", "confort"],
+    "hiver": ["hiver", "noël", "fêtes", "chaud", "ski", "nouvel an"]
+}
+
+
+class SeasonalKeywordIndex:
+    """
+    Index inversé saison -> produits dont le nom ou la description contient un mot-clé
+
+    La correspondance reprend celle de `ILIKE '%mot-clé%'` (sous-chaîne, sans
+    tenir compte de la casse). Pour chaque saison, les produits correspondants
+    sont gardés triés par note décroissante : une liste saisonnière est une
+    lecture des premiers éléments, sans requête. L'index est construit en une
+    seule passe puis tenu à jour à chaque écriture de produit.
+    """
+
+    def __init__(self, keywords: Dict[str, List[str]] = None):
+        self.logger = logging.getLogger(__name__)
+        self.keywords = {season: [k.lower() for k in words] for season, words in (keywords or SEASONAL_KEYWORDS).items()}
+        # Par saison : liste triée de (-note, product_id)
+        self._ranked: Dict[str, List[Tuple[float, int]]] = {season: [] for season in self.keywords}
+        # product_id -> (note indexée, saisons correspondantes)
+        self._entries: Dict[int, Tuple[float, Tuple[str, ...]]] = {}
+        self.built = False
+        self._lock = threading.Lock()
+
+    def _match(self, name: Optional[str], description: Optional[str]) -> Tuple[str, ...]:
+        """
+        Saisons dont au moins un mot-clé apparaît dans le nom ou la description
+        """
+        texts = [text.lower() for text in (name, description) if text]
+        return tuple(
+            season for season, words in self.keywords.items()
+            if any(word in text for word in words for text in texts)
+        )
+
+    def build(self, db: Session):
+        """
+        Construit l'index en une seule lecture des produits actifs
+
+        :param db: Session de base de données SQLAlchemy
+        """
+        try:
+            rows = db.query(
+                Product.id, Product.name, Product.description, Product.rating
+            ).filter(Product.is_active.is_(True)).all()
+
+            ranked = {season: [] for season in self.keywords}
+            entries = {}
+            for row in rows:
+                seasons = self._match(row.name, row.description)
+                if not seasons:
+                    continue
+                rating = float(row.rating or 0)
+                entries[row.id] = (rating, seasons)
+                for season in seasons:
+                    ranked[season].append((-rating, row.id))
+
+            for products in ranked.values():
+                products.sort()
+
+            with self._lock:
+                self._ranked = ranked
+                self._entries = entries
+                self.built = True
+
+            self.logger.info(f"Index saisonnier construit : {len(entries)} produits saisonniers")
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la construction de l'index saisonnier : {e}")
+
+    def _remove(self, product_id: int):
+        """
+        Retire un produit des listes saisonnières (verrou déjà acquis)
+        """
+        entry = self._entries.pop(product_id, None)
+        if entry is None:
+            return
+        rating, seasons = entry
+        for season in seasons:
+            products = self._ranked[season]
+            i = bisect.bisect_left(products, (-rating, product_id))
+            if i < len(products) and products[i] == (-rating, product_id):
+                del products[i]
+
+    def _insert(self, product_id: int, rating: float, seasons: Tuple[str, ...]):
+        """
+        Insère un produit à son rang dans les listes saisonnières (verrou déjà acquis)
+        """
+        if not seasons:
+            return
+        self._entries[product_id] = (rating, seasons)
+        for season in seasons:
+            bisect.insort(self._ranked[season], (-rating, product_id))
+
+    def upsert(self, product: Product):
+        """
+        Met à jour l'index pour un produit créé ou modifié
+
+        :param product: Produit créé ou modifié
+        """
+        with self._lock:
+            if not self.built:
+                return
+            self._remove(product.id)
+            if product.is_active:
+                self._insert(product.id, float(product.rating or 0), self._match(product.name, product.description))
+
+    def update_rating(self, product_id: int, rating: float):
+        """
+        Replace un produit saisonnier après un changement de note
+
+        :param product_id: ID du produit
+        :param rating: Nouvelle note moyenne
+        """
+        with self._lock:
+            entry = self._entries.get(product_id)
+            if entry is None:
+                return
+            self._remove(product_id)
+            self._insert(product_id, float(rating or 0), entry[1])
+
+    def discard(self, product_id: int):
+        """
+        Retire un produit supprimé
+
+        :param product_id: ID du produit
+        """
+        with self._lock:
+            self._remove(product_id)
+
+    def top(self, season: str, limit: int) -> List[int]:
+        """
+        Retourne les produits d'une saison les mieux notés
+
+        :param season: Saison (printemps, été, automne, hiver)
+        :param limit: Nombre maximum de produits
+        :return: IDs des produits, par note décroissante
+        """
+        with self._lock:
+            return [product_id for _, product_id in self._ranked.get(season.lower(), [])[:limit]]
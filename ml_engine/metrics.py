@@ -0,0 +1,209 @@
+import bisect
+import datetime
+import functools
+import resource
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Bornes supérieures (ms) des seaux des histogrammes de latence
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """
+    Histogramme de latences à seaux fixes (percentiles estimés par la borne du seau)
+    """
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)  # dernier seau : au-delà de la plus grande borne
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, latency_ms: float):
+        self.counts[bisect.bisect_left(self.buckets_ms, latency_ms)] += 1
+        self.count += 1
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Borne supérieure du seau contenant le q-ième centile (max observé pour le dernier seau)
+        """
+        if self.count == 0:
+            return None
+        rank = q / 100 * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            cumulative += n
+            if cumulative >= rank and n:
+                return float(self.buckets_ms[i]) if i < len(self.buckets_ms) else round(self.max_ms, 3)
+        return round(self.max_ms, 3)
+
+    def to_dict(self) -> Dict:
+        labels = [f"<={b}" for b in self.buckets_ms] + [f">{self.buckets_ms[-1]}"]
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else None,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class TrainingRun:
+    """
+    Mesures d'une exécution d'entraînement, étape par étape
+
+    Chaque étape enregistre le temps réel, le temps CPU du processus, le pic
+    de mémoire Python allouée pendant l'étape (tracemalloc) et le nombre de
+    lignes traitées.
+    """
+
+    def __init__(self, mode: str, trigger: str = 'manual'):
+        self.mode = mode
+        self.trigger = trigger
+        self.success: Optional[bool] = None
+        self.started_at = datetime.datetime.now()
+        self.stages: Dict[str, Dict] = {}
+        self._started = time.perf_counter()
+        self._started_cpu = time.process_time()
+        self._owns_tracemalloc = not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Mesure une étape ; le dictionnaire produit accepte une clé 'rows'
+        """
+        info = {'rows': None}
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield info
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            info.update({
+                'wall_seconds': round(time.perf_counter() - wall, 4),
+                'cpu_seconds': round(time.process_time() - cpu, 4),
+                'peak_memory_mb': round(max(peak - baseline, 0) / (1024 * 1024), 2),
+            })
+            self.stages[name] = info
+
+    def finish(self):
+        if self._owns_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.wall_seconds = round(time.perf_counter() - self._started, 4)
+        self.cpu_seconds = round(time.process_time() - self._started_cpu, 4)
+
+    def to_dict(self) -> Dict:
+        return {
+            'mode': self.mode,
+            'trigger': self.trigger,
+            'success': self.success,
+            'started_at': self.started_at.isoformat(),
+            'wall_seconds': getattr(self, 'wall_seconds', None),
+            'cpu_seconds': getattr(self, 'cpu_seconds', None),
+            # Pic de mémoire résidente du processus (ko sous Linux)
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'stages': dict(self.stages),
+        }
+
+
+class PipelineMetrics:
+    """
+    Instrumentation du pipeline ML : étapes des entraînements et latences d'inférence
+
+    Les `history_size` derniers entraînements sont conservés pour comparaison.
+    """
+
+    def __init__(self, history_size: int = 20):
+        self.runs: deque = deque(maxlen=history_size)
+        self._current: Optional[TrainingRun] = None
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def training_run(self, mode: str, trigger: str = 'manual'):
+        """
+        Ouvre une exécution d'entraînement (réutilise celle en cours si déjà ouverte)
+        """
+        if self._current is not None:
+            yield self._current
+            return
+
+        run = TrainingRun(mode, trigger)
+        self._current = run
+        try:
+            yield run
+        finally:
+            self._current = None
+            run.finish()
+            self.runs.append(run.to_dict())
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Mesure une étape de l'exécution en cours (sans effet hors exécution)
+        """
+        if self._current is None:
+            yield {'rows': None}
+            return
+        with self._current.stage(name) as info:
+            yield info
+
+    def current_stages(self) -> Dict:
+        """
+        Étapes déjà mesurées de l'exécution en cours
+        """
+        return dict(self._current.stages) if self._current is not None else {}
+
+    def add_run(self, run: Optional[Dict]):
+        """
+        Ajoute à l'historique une exécution mesurée dans un autre processus
+        """
+        if run:
+            self.runs.append(run)
+
+    def observe(self, name: str, seconds: float):
+        """
+        Enregistre la latence d'un appel d'inférence
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.observe(seconds * 1000)
+
+    def inference_summary(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: histogram.to_dict() for name, histogram in self._histograms.items()}
+
+    def training_history(self) -> List[Dict]:
+        return list(self.runs)
+
+    def last_run(self) -> Optional[Dict]:
+        return self.runs[-1] if self.runs else None
+
+
+def track_latency(method):
+    """
+    Décorateur des méthodes d'inférence du prédicteur : enregistre la latence de chaque appel
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.metrics.observe(method.__name__, time.perf_counter() - started)
+    return wrapper
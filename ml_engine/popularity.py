@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, desc, func, or_, select, union
+from sqlalchemy.orm import Session
+
+from models import Banner, Order, Product, order_products
+
+# Classements tenus en mémoire, par ordre de repli
+BY_ORDERS = 'orders'
+BY_RATING = 'rating'
+BY_DISCOUNT = 'discount'
+NEWEST = 'newest'
+
+
+class PopularProducts:
+    """
+    Classements bornés des produits populaires, servis depuis la mémoire
+
+    Les `top_n` produits disponibles (actifs, en stock ou à stock non suivi)
+    les plus commandés sont tenus triés avec leur nom et leur prix, ainsi que
+    les classements de repli (mieux notés, plus fortes remises, plus récents)
+    utilisés quand aucune commande n'existe. Le rechargement périodique ne lit
+    que des colonnes et des requêtes limitées ; chaque commande créée fait
+    remonter son produit dans le classement sans requête. Une lecture coûte
+    O(k).
+    """
+
+    def __init__(self, top_n: int = 100):
+        self.logger = logging.getLogger(__name__)
+        self.top_n = top_n
+        # product_id -> nombre de commandes, pour les produits disponibles déjà commandés
+        self._counts: Dict[int, int] = {}
+        # product_id -> (nom, prix) des produits présents dans un classement
+        self._products: Dict[int, Tuple[str, float]] = {}
+        self._ranked: Dict[str, List[int]] = {BY_ORDERS: [], BY_RATING: [], BY_DISCOUNT: [], NEWEST: []}
+        self.loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    @staticmethod
+    def _is_available(is_active: bool, stock: Optional[int]) -> bool:
+        return bool(is_active) and (stock is None or stock > 0)
+
+    def refresh(self, db: Session):
+        """
+        Recharge les classements depuis les commandes et la table des produits
+
+        :param db: Session de base de données SQLAlchemy
+        """
+        try:
+            available = (Product.is_active.is_(True), or_(Product.stock.is_(None), Product.stock > 0))
+            columns = (Product.id, Product.name, Product.price)
+
+            # Paires (commande, produit) distinctes : produit principal et lignes `order_products`
+            pairs = union(
+                select(Order.id.label('order_id'), Order.product_id.label('product_id')).where(
+                    Order.product_id.isnot(None)
+                ),
+                select(order_products.c.order_id, order_products.c.product_id)
+            ).subquery()
+            order_count = func.count(pairs.c.order_id)
+            by_orders = db.execute(
+                select(*columns, order_count.label('order_count'))
+                .join(pairs, pairs.c.product_id == Product.id)
+                .where(*available)
+                .group_by(Product.id)
+                .order_by(order_count.desc(), Product.id)
+            ).all()
+
+            by_rating = db.execute(
+                select(*columns).where(*available, Product.rating > 0)
+                .order_by(desc(Product.rating), desc(Product.nb_rating), Product.id)
+                .limit(self.top_n)
+            ).all()
+            by_discount = db.execute(
+                select(*columns).join(Banner, and_(
+                    Product.banner_id == Banner.id,
+                    Banner.discountPercent > 0,
+                    Banner.is_active.is_(True)
+                )).where(*available)
+                .order_by(desc(Banner.discountPercent), Product.id)
+                .limit(self.top_n)
+            ).all()
+            newest = db.execute(
+                select(*columns).where(*available)
+                .order_by(desc(Product.created_at), desc(Product.id))
+                .limit(self.top_n)
+            ).all()
+
+            counts = {row.id: row.order_count for row in by_orders}
+            products: Dict[int, Tuple[str, float]] = {}
+            ranked: Dict[str, List[int]] = {}
+            for key, rows in ((BY_ORDERS, by_orders[:self.top_n]), (BY_RATING, by_rating),
+                              (BY_DISCOUNT, by_discount), (NEWEST, newest)):
+                ranked[key] = [row.id for row in rows]
+                products.update((row.id, (row.name, row.price)) for row in rows)
+
+            with self._lock:
+                self._counts = counts
+                self._products = products
+                self._ranked = ranked
+                self.loaded_at = time.monotonic()
+
+            self.logger.info(f"Classements des produits populaires rechargés : {len(counts)} produits commandés")
+        except Exception as e:
+            db.rollback()
+            self.logger.error(f"Erreur lors du chargement des produits populaires : {e}")
+
+    def record_order(self, product: Product):
+        """
+        Comptabilise une commande créée et fait remonter son produit dans le classement
+
+        :param product: Produit commandé
+        """
+        if not self._is_available(product.is_active, product.stock):
+            self.discard(product.id)
+            return
+
+        with self._lock:
+            if not self.loaded:
+                return
+            self._counts[product.id] = self._counts.get(product.id, 0) + 1
+            top = self._ranked[BY_ORDERS]
+            if product.id not in top:
+                if len(top) >= self.top_n:
+                    last = top[-1]
+                    if (self._counts[product.id], -product.id) <= (self._counts[last], -last):
+                        return
+                top.append(product.id)
+            self._products[product.id] = (product.name, product.price)
+            top.sort(key=lambda pid: (-self._counts[pid], pid))
+            del top[self.top_n:]
+
+    def upsert(self, product: Product):
+        """
+        Met à jour un produit créé ou modifié (retiré s'il n'est plus disponible)
+
+        Un produit créé entre en tête des nouveautés ; les autres classements le
+        prennent en compte au prochain rechargement.
+
+        :param product: Produit créé ou modifié
+        """
+        if not self._is_available(product.is_active, product.stock):
+            self.discard(product.id)
+            return
+
+        with self._lock:
+            if not self.loaded:
+                return
+            newest = self._ranked[NEWEST]
+            if product.id not in self._products and (not newest or product.id > newest[0]):
+                newest.insert(0, product.id)
+                del newest[self.top_n:]
+            if product.id in self._products or product.id in newest:
+                self._products[product.id] = (product.name, product.price)
+
+    def discard(self, product_id: int):
+        """
+        Retire un produit supprimé, désactivé ou en rupture de stock de tous les classements
+
+        :param product_id: ID du produit
+        """
+        with self._lock:
+            self._counts.pop(product_id, None)
+            if self._products.pop(product_id, None) is None:
+                return
+            for ranked in self._ranked.values():
+                if product_id in ranked:
+                    ranked.remove(product_id)
+
+    def ranking(self, sources: Sequence[str] = (BY_ORDERS, BY_DISCOUNT, NEWEST)) -> Tuple[str, List[int]]:
+        """
+        Premier classement non vide parmi les sources, par ordre de repli
+
+        :param sources: Classements à essayer dans l'ordre
+        :return: Tuple (nom du classement, IDs des produits)
+        """
+        with self._lock:
+            for key in sources:
+                if self._ranked.get(key):
+                    return key, list(self._ranked[key])
+        return sources[-1], []
+
+    def top(self, limit: int, offset: int = 0,
+            sources: Sequence[str] = (BY_ORDERS, BY_DISCOUNT, NEWEST)) -> List[Tuple[int, str, float]]:
+        """
+        Produits populaires d'une page du premier classement non vide
+
+        :param limit: Nombre maximum de produits
+        :param offset: Position du premier produit
+        :param sources: Classements à essayer dans l'ordre
+        :return: Liste de tuples (product_id, nom, prix)
+        """
+        with self._lock:
+            for key in sources:
+                ranked = self._ranked.get(key)
+                if ranked:
+                    return [(product_id, *self._products[product_id]) for product_id in ranked[offset:offset + limit]]
+        return []
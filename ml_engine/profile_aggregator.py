@@ -0,0 +1,304 @@
+import datetime
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models import Order, OrderStatus, Product, UserPreferenceProfile, get_db_context, order_products
+from .feature_store import FeatureStore
+from .recommendation_cache import recommendation_cache
+
+# Clé du verrou consultatif PostgreSQL : un seul agrégateur actif entre les workers
+PROFILE_AGGREGATION_LOCK = 7201
+
+
+class ProfileAggregator:
+    """
+    Agrégation par lots des commandes livrées dans les profils de préférences
+
+    La livraison ne modifie pas le profil : la commande livrée reste en attente
+    (`profile_synced_at` NULL) et `enqueue` réveille le thread d'agrégation.
+    Chaque lot lit les commandes en attente, les regroupe par client et écrit
+    tous les profils concernés (et leurs vecteurs de caractéristiques) en un
+    seul upsert : plusieurs livraisons d'un même client donnent une seule
+    écriture. Les commandes sont marquées dans
+    la même transaction, si bien qu'une commande est intégrée exactement une
+    fois, y compris après un redémarrage (les autres workers reprennent les
+    commandes en attente à leur prochain passage).
+    """
+
+    def __init__(self, feature_store: FeatureStore, batch_size: int = 500, flush_delay: float = 2.0,
+                 poll_interval: float = 60.0):
+        self.logger = logging.getLogger(__name__)
+        self.feature_store = feature_store
+        self.batch_size = batch_size
+        # Délai laissé aux livraisons proches pour rejoindre le même lot
+        self.flush_delay = flush_delay
+        # Passage périodique, pour les commandes livrées par d'autres workers
+        self.poll_interval = poll_interval
+        self._pending = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._flush_lock = threading.Lock()
+        # Fonctions appelées avec les lignes de profil écrites, après chaque lot validé
+        self._listeners: List[Callable[[List[Dict]], None]] = []
+
+    def add_listener(self, callback: Callable[[List[Dict]], None]):
+        """
+        Abonne une fonction aux profils écrits par l'agrégateur (index en mémoire, caches...)
+
+        :param callback: Fonction recevant la liste des lignes de profil d'un lot
+        """
+        self._listeners.append(callback)
+
+    def enqueue(self, order_id: int):
+        """
+        Signale une commande livrée à intégrer au profil de son client
+
+        :param order_id: ID de la commande livrée
+        """
+        self._pending += 1
+        self._wake.set()
+        self.logger.debug(f"Commande {order_id} en attente d'agrégation ({self._pending} en attente)")
+
+    def start(self):
+        """
+        Démarre le thread d'agrégation
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profile-aggregator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Arrête le thread d'agrégation après un dernier lot
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=10)
+        self._thread = None
+
+    def _run(self):
+        """
+        Boucle du thread : attend une livraison (ou le passage périodique) puis agrège
+        """
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            if self._pending < self.batch_size:
+                self._stop.wait(self.flush_delay)
+            self._wake.clear()
+            self._pending = 0
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Agrège toutes les commandes livrées en attente, lot par lot
+
+        :return: Nombre de commandes intégrées
+        """
+        total = 0
+        with self._flush_lock:
+            try:
+                with get_db_context() as db:
+                    while True:
+                        count = self.aggregate_batch(db)
+                        total += count
+                        if count < self.batch_size:
+                            break
+            except Exception as e:
+                self.logger.error(f"Erreur lors de l'agrégation des profils : {e}")
+        return total
+
+    def aggregate_batch(self, db: Session) -> int:
+        """
+        Intègre un lot de commandes livrées en attente aux profils de leurs clients
+
+        :param db: Session de base de données SQLAlchemy
+        :return: Nombre de commandes intégrées (0 si un autre worker agrège déjà)
+        """
+        try:
+            if not db.execute(select(func.pg_try_advisory_xact_lock(PROFILE_AGGREGATION_LOCK))).scalar():
+                db.rollback()
+                return 0
+
+            orders = db.query(
+                Order.id, Order.customer_id, Order.product_id, Order.quantity, Order.total_amount,
+                Order.preferred_categories, Order.preferred_currencies, Order.purchase_time_of_day
+            ).filter(
+                Order.status == OrderStatus.DELIVERED.value,
+                Order.profile_synced_at.is_(None)
+            ).order_by(Order.delivered_at, Order.id).limit(self.batch_size).all()
+
+            if not orders:
+                db.rollback()
+                return 0
+
+            order_ids = [order.id for order in orders]
+            orders_by_user: Dict[int, List] = defaultdict(list)
+            for order in orders:
+                orders_by_user[order.customer_id].append(order)
+
+            # Lignes `order_products` des commandes du lot, avec la catégorie du produit
+            lines: Dict[int, List[Tuple[int, int, Optional[int]]]] = defaultdict(list)
+            for order_id, product_id, quantity, category_id in db.query(
+                order_products.c.order_id, order_products.c.product_id,
+                order_products.c.quantity, Product.category_id
+            ).join(Product, Product.id == order_products.c.product_id).filter(
+                order_products.c.order_id.in_(order_ids)
+            ):
+                lines[order_id].append((product_id, quantity, category_id))
+
+            profiles = {
+                profile.user_id: profile
+                for profile in db.query(UserPreferenceProfile).filter(
+                    UserPreferenceProfile.user_id.in_(list(orders_by_user))
+                )
+            }
+
+            # Profils sans compteurs de catégories (absents ou vides, comme ceux écrits par
+            # UserPreferenceProfile.update_profile) : partir de l'historique déjà intégré
+            unseeded = [
+                user_id for user_id in orders_by_user
+                if user_id not in profiles
+                or not (profiles[user_id].additional_preferences or {}).get('category_purchase_count')
+            ]
+            seeds = self._synced_category_counts(db, unseeded)
+
+            now = datetime.datetime.now(datetime.timezone.utc)
+            rows = [
+                self._fold(user_id, profiles.get(user_id), user_orders, lines, seeds.get(user_id, {}), now)
+                for user_id, user_orders in orders_by_user.items()
+            ]
+
+            stmt = insert(UserPreferenceProfile).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[UserPreferenceProfile.user_id],
+                set_={column: stmt.excluded[column] for column in rows[0] if column != 'user_id'}
+            )
+            db.execute(stmt)
+            # Vecteurs de caractéristiques des profils modifiés, dans la même transaction
+            self.feature_store.upsert(db, rows)
+            db.execute(
+                update(Order).where(Order.id.in_(order_ids)).values(
+                    profile_synced_at=now, updated_at=Order.updated_at
+                )
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.logger.error(f"Erreur lors de l'agrégation d'un lot de profils : {e}")
+            return 0
+
+        # Les profils ont changé : les recommandations en cache sont périmées
+        for user_id in orders_by_user:
+            recommendation_cache.invalidate_user(user_id)
+        for listener in self._listeners:
+            try:
+                listener(rows)
+            except Exception as e:
+                self.logger.error(f"Erreur d'un abonné à l'agrégation des profils : {e}")
+
+        self.logger.info(f"{len(orders)} commandes intégrées à {len(rows)} profils")
+        return len(orders)
+
+    @staticmethod
+    def _synced_category_counts(db: Session, user_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+        """
+        Quantités achetées par catégorie dans les commandes livrées déjà intégrées aux profils
+
+        :param db: Session de base de données SQLAlchemy
+        :param user_ids: IDs des clients
+        :return: Dictionnaire user_id -> {category_id (str): quantité}
+        """
+        user_ids = list(user_ids)
+        counts: Dict[int, Dict[str, int]] = defaultdict(dict)
+        if not user_ids:
+            return counts
+
+        synced = (
+            Order.status == OrderStatus.DELIVERED.value,
+            Order.profile_synced_at.isnot(None),
+            Order.customer_id.in_(user_ids)
+        )
+        direct = db.query(
+            Order.customer_id, Order.preferred_categories, func.sum(Order.quantity)
+        ).filter(*synced, Order.preferred_categories.isnot(None)).group_by(
+            Order.customer_id, Order.preferred_categories
+        )
+        line_items = db.query(
+            Order.customer_id, Product.category_id, func.sum(order_products.c.quantity)
+        ).join(order_products, order_products.c.order_id == Order.id).join(
+            Product, Product.id == order_products.c.product_id
+        ).filter(*synced, Product.category_id.isnot(None)).group_by(
+            Order.customer_id, Product.category_id
+        )
+
+        for user_id, category_id, quantity in direct.union_all(line_items):
+            key = str(category_id)
+            counts[user_id][key] = counts[user_id].get(key, 0) + int(quantity or 0)
+        return counts
+
+    @staticmethod
+    def _fold(user_id: int, profile: Optional[UserPreferenceProfile], orders: List,
+              lines: Dict[int, List[Tuple[int, int, Optional[int]]]], seed: Dict[str, int],
+              now: datetime.datetime) -> Dict:
+        """
+        Calcule la ligne de profil après intégration des commandes d'un client
+
+        :param user_id: ID du client
+        :param profile: Profil existant (None s'il n'existe pas encore)
+        :param orders: Commandes livrées du lot, par date de livraison
+        :param lines: Lignes `order_products` par ID de commande
+        :param seed: Compteurs de catégories de départ si ceux du profil sont absents ou vides
+        :param now: Date de l'agrégation
+        :return: Valeurs de la ligne `user_preference_profiles`
+        """
+        previous_orders = (profile.total_orders or 0) if profile else 0
+        previous_average = (profile.average_order_value or 0) if profile else 0
+        preferences = dict((profile.additional_preferences or {}) if profile else {})
+        category_counts = dict(preferences.get('category_purchase_count') or seed)
+        preferred_products = list((profile.preferred_product_ids or []) if profile else [])
+        currencies = set((profile.preferred_currencies or []) if profile else [])
+        purchase_time = profile.preferred_purchase_time if profile else None
+
+        for order in orders:
+            items = [(order.product_id, order.quantity, order.preferred_categories)] + lines.get(order.id, [])
+            for product_id, quantity, category_id in items:
+                if product_id not in preferred_products:
+                    preferred_products.append(product_id)
+                if category_id is not None:
+                    key = str(category_id)
+                    category_counts[key] = category_counts.get(key, 0) + (quantity or 1)
+            if order.preferred_currencies:
+                currencies.add(order.preferred_currencies)
+            if order.purchase_time_of_day:
+                purchase_time = order.purchase_time_of_day
+
+        total_orders = previous_orders + len(orders)
+        amount = sum(order.total_amount or 0 for order in orders)
+        preferences['category_purchase_count'] = category_counts
+
+        if category_counts:
+            most_purchased_category_id = int(max(category_counts, key=category_counts.get))
+        else:
+            most_purchased_category_id = profile.most_purchased_category_id if profile else None
+
+        return {
+            'user_id': user_id,
+            'total_orders': total_orders,
+            'average_order_value': (previous_average * previous_orders + amount) / total_orders,
+            'most_purchased_category_id': most_purchased_category_id,
+            'preferred_product_ids': preferred_products[:10],  # Garder les 10 premiers
+            'preferred_currencies': sorted(currencies),
+            'preferred_purchase_time': purchase_time,
+            'additional_preferences': preferences,
+            'updated_at': now,
+        }
@@ -0,0 +1,219 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from os import getenv
+from typing import Dict, Optional, Set
+
+from redis import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+REDIS_URL = getenv("REDIS_URL")
+
+
+class RecommendationCache:
+    """
+    Cache des recommandations personnalisées par utilisateur
+
+    Une entrée est servie pour la première page tant qu'elle a moins de `ttl`
+    secondes ; les pages suivantes réutilisent le même jeu de résultats
+    (épinglé) pendant `session_ttl` secondes pour que la pagination reste
+    cohérente. Si Redis est configuré, les entrées n'y sont stockées qu'une
+    fois, partagées entre les workers : une invalidation faite par un worker
+    vaut pour tous. Sans Redis, le cache est en mémoire, propre au processus.
+    """
+
+    def __init__(self, ttl: int = 600, session_ttl: int = 1800, max_entries: int = 10000,
+                 redis_url: Optional[str] = REDIS_URL):
+        self.logger = logging.getLogger(__name__)
+        self.ttl = ttl
+        self.session_ttl = session_ttl
+        self.max_entries = max_entries
+        self.redis_url = redis_url
+        self.redis: Optional[Redis] = None
+        self._redis_initialized = False
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        # Index inverse produit -> utilisateurs dont l'entrée contient ce produit
+        self._users_by_product: Dict[int, Set[int]] = {}
+        self._lock = threading.Lock()
+
+    def init_redis(self):
+        """
+        Initialise la connexion Redis à la première utilisation (cache mémoire seul en cas d'échec)
+        """
+        if self._redis_initialized:
+            return
+        self._redis_initialized = True
+        if not self.redis_url:
+            return
+        try:
+            self.redis = Redis.from_url(self.redis_url, decode_responses=True)
+            self.redis.ping()
+            self.logger.info("✅ Cache Redis des recommandations connecté")
+        except (RedisConnectionError, Exception) as e:
+            self.logger.error(f"❌ Cache Redis des recommandations indisponible : {e}")
+            self.redis = None
+
+    @staticmethod
+    def _user_key(user_id: int) -> str:
+        return f"recommendations:user:{user_id}"
+
+    @staticmethod
+    def _product_key(product_id: int) -> str:
+        return f"recommendations:product:{product_id}"
+
+    def _is_fresh(self, entry: Dict, page: int) -> bool:
+        """
+        Vérifie si une entrée peut servir la page demandée
+        """
+        age = time.time() - entry['created_at']
+        return age < (self.ttl if page <= 1 else self.session_ttl)
+
+    def get(self, user_id: int, page: int = 1) -> Optional[Dict]:
+        """
+        Retourne les recommandations en cache d'un utilisateur
+
+        :param user_id: ID de l'utilisateur
+        :param page: Page demandée (les pages > 1 acceptent le jeu épinglé plus ancien)
+        :return: Entrée du cache ou None
+        """
+        self.init_redis()
+        if self.redis is None:
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is not None:
+                    if self._is_fresh(entry, page):
+                        self._entries.move_to_end(user_id)
+                        return entry
+                    self._remove_local(user_id)
+            return None
+
+        # Pas de copie en mémoire : elle survivrait aux invalidations faites par les autres workers
+        try:
+            raw = self.redis.get(self._user_key(user_id))
+            if raw is None:
+                return None
+            entry = json.loads(raw)
+            if not self._is_fresh(entry, page):
+                return None
+            return entry
+        except Exception as e:
+            self.logger.warning(f"Lecture du cache Redis des recommandations impossible : {e}")
+            return None
+
+    def set(self, user_id: int, result: Dict) -> Dict:
+        """
+        Met en cache le résultat de UserInterestPredictor.predict_user_interest
+
+        :param user_id: ID de l'utilisateur
+        :param result: Résultat de la prédiction
+        :return: Entrée du cache créée
+        """
+        entry = {
+            'success': result.get('success', False),
+            'message': result.get('message'),
+            'engagement_level': result.get('engagement_level'),
+            'product_ids': [rec['product_id'] for rec in result.get('recommendations', [])],
+            'created_at': time.time()
+        }
+
+        self.init_redis()
+        if self.redis is None:
+            self._store_local(user_id, entry)
+            return entry
+
+        try:
+            pipe = self.redis.pipeline()
+            pipe.set(self._user_key(user_id), json.dumps(entry), ex=self.session_ttl)
+            for product_id in entry['product_ids']:
+                pipe.sadd(self._product_key(product_id), user_id)
+                pipe.expire(self._product_key(product_id), self.session_ttl)
+            pipe.execute()
+        except Exception as e:
+            self.logger.warning(f"Écriture du cache Redis des recommandations impossible : {e}")
+
+        return entry
+
+    def invalidate_user(self, user_id: int):
+        """
+        Supprime l'entrée d'un utilisateur (ex : profil mis à jour après une livraison)
+
+        :param user_id: ID de l'utilisateur
+        """
+        with self._lock:
+            self._remove_local(user_id)
+
+        self.init_redis()
+        if self.redis is not None:
+            try:
+                self.redis.delete(self._user_key(user_id))
+            except Exception as e:
+                self.logger.warning(f"Invalidation Redis impossible pour l'utilisateur {user_id} : {e}")
+
+    def invalidate_product(self, product_id: int):
+        """
+        Supprime les entrées qui recommandent un produit (modifié, supprimé ou en rupture de stock)
+
+        :param product_id: ID du produit
+        """
+        with self._lock:
+            for user_id in list(self._users_by_product.get(product_id, ())):
+                self._remove_local(user_id)
+
+        self.init_redis()
+        if self.redis is not None:
+            try:
+                user_ids = self.redis.smembers(self._product_key(product_id))
+                if user_ids:
+                    self.redis.delete(*[self._user_key(user_id) for user_id in user_ids])
+                self.redis.delete(self._product_key(product_id))
+            except Exception as e:
+                self.logger.warning(f"Invalidation Redis impossible pour le produit {product_id} : {e}")
+
+    def clear(self):
+        """
+        Vide le cache (nouveau modèle servi : les recommandations en cache sont périmées)
+        """
+        with self._lock:
+            self._entries.clear()
+            self._users_by_product.clear()
+
+        self.init_redis()
+        if self.redis is not None:
+            try:
+                keys = list(self.redis.scan_iter(match="recommendations:*", count=1000))
+                for start in range(0, len(keys), 1000):
+                    self.redis.delete(*keys[start:start + 1000])
+            except Exception as e:
+                self.logger.warning(f"Vidage du cache Redis des recommandations impossible : {e}")
+
+    def _store_local(self, user_id: int, entry: Dict):
+        """
+        Enregistre une entrée en mémoire, sans Redis (éviction LRU au-delà de max_entries)
+        """
+        with self._lock:
+            self._remove_local(user_id)
+            self._entries[user_id] = entry
+            for product_id in entry['product_ids']:
+                self._users_by_product.setdefault(product_id, set()).add(user_id)
+            while len(self._entries) > self.max_entries:
+                self._remove_local(next(iter(self._entries)))
+
+    def _remove_local(self, user_id: int):
+        """
+        Supprime une entrée en mémoire et ses références inverses (verrou déjà acquis)
+        """
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+        for product_id in entry['product_ids']:
+            users = self._users_by_product.get(product_id)
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self._users_by_product[product_id]
+
+
+# Cache partagé par l'API
+recommendation_cache = RecommendationCache()
@@ -0,0 +1,168 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+
+MODEL_FILENAME = 'model.joblib'
+METADATA_FILENAME = 'metadata.json'
+CURRENT_FILENAME = 'CURRENT'
+
+
+def _sha256(filepath: str) -> str:
+    """
+    Calcule l'empreinte SHA-256 d'un fichier
+    """
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Registre versionné des modèles entraînés
+
+    Chaque version est un dossier `<root>/<version>/` contenant le modèle et un
+    fichier de métadonnées JSON (performances, état d'entraînement, empreinte
+    SHA-256). Le fichier `<root>/CURRENT` désigne la version active ; il est
+    remplacé atomiquement, ce qui permet les rollbacks.
+    """
+
+    def __init__(self, root: str = 'model_registry'):
+        self.logger = logging.getLogger(__name__)
+        self.root = root
+
+    def _version_dir(self, version: str) -> str:
+        return os.path.join(self.root, version)
+
+    def model_path(self, version: str) -> str:
+        return os.path.join(self._version_dir(version), MODEL_FILENAME)
+
+    def metadata_path(self, version: str) -> str:
+        return os.path.join(self._version_dir(version), METADATA_FILENAME)
+
+    def list_versions(self) -> List[str]:
+        """
+        Retourne les versions enregistrées, de la plus ancienne à la plus récente
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isfile(os.path.join(self.root, name, METADATA_FILENAME))
+        )
+
+    def register(self, model: Any, metadata: Dict[str, Any], activate: bool = True) -> str:
+        """
+        Enregistre un modèle comme nouvelle version
+
+        Le dossier est écrit sous un nom temporaire puis renommé, si bien qu'une
+        version visible est toujours complète.
+
+        :param model: Modèle à enregistrer
+        :param metadata: Métadonnées sérialisables en JSON
+        :param activate: Désigner cette version comme version active
+        :return: Identifiant de la version créée
+        """
+        os.makedirs(self.root, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(prefix='.staging-', dir=self.root)
+
+        try:
+            model_path = os.path.join(staging_dir, MODEL_FILENAME)
+            # Sans compression : les tableaux numpy peuvent être projetés en mémoire au chargement
+            joblib.dump(model, model_path, compress=0)
+
+            version = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            metadata = dict(metadata)
+            metadata.update({
+                'version': version,
+                'registered_at': datetime.datetime.now().isoformat(),
+                'sha256': _sha256(model_path),
+                'size_bytes': os.path.getsize(model_path)
+            })
+            with open(os.path.join(staging_dir, METADATA_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, indent=2, default=str)
+
+            os.replace(staging_dir, self._version_dir(version))
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        self.logger.info(f"Modèle enregistré dans le registre : version {version}")
+        if activate:
+            self.set_current(version)
+        return version
+
+    def current_version(self) -> Optional[str]:
+        """
+        Retourne la version active, ou None si aucune n'est définie
+        """
+        try:
+            with open(os.path.join(self.root, CURRENT_FILENAME), 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def set_current(self, version: str):
+        """
+        Désigne atomiquement la version active
+
+        :param version: Version à activer
+        """
+        if version not in self.list_versions():
+            raise ValueError(f"Version de modèle inconnue : {version}")
+
+        tmp_path = os.path.join(self.root, f".{CURRENT_FILENAME}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, CURRENT_FILENAME))
+        self.logger.info(f"Version active du modèle : {version}")
+
+    def previous_version(self, version: Optional[str] = None) -> Optional[str]:
+        """
+        Retourne la version enregistrée juste avant `version` (par défaut la version active)
+        """
+        version = version or self.current_version()
+        versions = self.list_versions()
+        if version not in versions:
+            return None
+        index = versions.index(version)
+        return versions[index - 1] if index > 0 else None
+
+    def get_metadata(self, version: str) -> Dict[str, Any]:
+        """
+        Lit les métadonnées d'une version
+        """
+        with open(self.metadata_path(version), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load(self, version: Optional[str] = None, mmap_mode: Optional[str] = 'r') -> Tuple[Any, Dict[str, Any]]:
+        """
+        Charge une version (par défaut la version active) après vérification de son empreinte
+
+        Avec `mmap_mode`, les tableaux numpy de l'artefact sont projetés en
+        mémoire au lieu d'être copiés : le chargement est plus rapide et les
+        pages sont partagées entre les workers qui servent la même version.
+
+        :param version: Version à charger (optionnel)
+        :param mmap_mode: Mode de projection mémoire de joblib (None pour tout charger en mémoire)
+        :return: Tuple (modèle, métadonnées)
+        """
+        version = version or self.current_version()
+        if version is None:
+            raise FileNotFoundError("Aucune version de modèle active dans le registre")
+
+        metadata = self.get_metadata(version)
+        model_path = self.model_path(version)
+        checksum = _sha256(model_path)
+        if checksum != metadata.get('sha256'):
+            raise ValueError(f"Empreinte invalide pour la version {version}")
+
+        return joblib.load(model_path, mmap_mode=mmap_mode), metadata
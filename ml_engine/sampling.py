@@ -0,0 +1,123 @@
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+
+class StratifiedReservoirSampler:
+    """
+    Échantillon stratifié par classe, construit en un passage sur un flux de lots
+
+    Chaque classe a son propre réservoir (algorithme R, vectorisé par lot) de
+    `max_size` lignes au plus : la mémoire reste bornée quel que soit le
+    nombre de profils. À la fin du flux, chaque réservoir est réduit à la part
+    de sa classe dans les lignes vues (au moins `min_per_class` lignes quand la
+    classe en compte assez), pour un échantillon total d'environ `max_size`
+    lignes qui respecte la distribution des classes. La lecture s'arrête dès
+    que `time_budget_seconds` est dépassé.
+    """
+
+    def __init__(self, max_size: int, time_budget_seconds: Optional[float] = None,
+                 min_per_class: int = 50, random_state: int = 42):
+        self.max_size = max_size
+        self.time_budget_seconds = time_budget_seconds
+        self.min_per_class = min_per_class
+        self._rng = np.random.default_rng(random_state)
+        # classe -> (user_ids, vecteurs, dates de modification) préalloués, et nombre de lignes vues
+        self._reservoirs: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._seen: Dict[str, int] = {}
+        self.rows_seen = 0
+        self.max_updated_at = None
+        self.truncated = False
+
+    def _add_class(self, label: str, user_ids: np.ndarray, vectors: np.ndarray, updated_at: np.ndarray):
+        """
+        Intègre les lignes d'une classe à son réservoir
+        """
+        if label not in self._reservoirs:
+            self._reservoirs[label] = (
+                np.empty(self.max_size, dtype=user_ids.dtype),
+                np.empty((self.max_size, vectors.shape[1]), dtype=vectors.dtype),
+                np.empty(self.max_size, dtype=updated_at.dtype),
+            )
+            self._seen[label] = 0
+        reservoir = self._reservoirs[label]
+        seen = self._seen[label]
+
+        # Remplissage tant que le réservoir n'est pas plein
+        fill = max(0, min(self.max_size - seen, len(user_ids)))
+        for target, source in zip(reservoir, (user_ids, vectors, updated_at)):
+            target[seen:seen + fill] = source[:fill]
+
+        # Au-delà : la ligne d'indice i remplace une case tirée dans [0, i] si elle tombe dans le réservoir
+        if fill < len(user_ids):
+            positions = np.arange(seen + fill, seen + len(user_ids))
+            slots = (self._rng.random(len(positions)) * (positions + 1)).astype(np.int64)
+            keep = slots < self.max_size
+            rows = np.arange(fill, len(user_ids))[keep]
+            for target, source in zip(reservoir, (user_ids, vectors, updated_at)):
+                target[slots[keep]] = source[rows]
+
+        self._seen[label] = seen + len(user_ids)
+
+    def consume(self, chunks: Iterable[Tuple[np.ndarray, np.ndarray, np.ndarray]], labeller) -> 'StratifiedReservoirSampler':
+        """
+        Parcourt un flux de lots (user_ids, vecteurs, dates de modification)
+
+        :param chunks: Itérateur de lots, par exemple FeatureStore.iter_chunks
+        :param labeller: Fonction vecteurs -> classes de chaque ligne
+        :return: L'échantillonneur, pour chaîner sample()
+        """
+        started = time.perf_counter()
+        for user_ids, vectors, updated_at in chunks:
+            labels = np.asarray(labeller(vectors))
+            for label in np.unique(labels):
+                mask = labels == label
+                self._add_class(str(label), user_ids[mask], vectors[mask], updated_at[mask])
+
+            self.rows_seen += len(user_ids)
+            # Dates manquantes (NaT) ignorées : elles rendraient le maximum indéfini
+            known = updated_at[~np.isnat(updated_at)]
+            if len(known):
+                latest = known.max()
+                self.max_updated_at = latest if self.max_updated_at is None else max(self.max_updated_at, latest)
+
+            if self.time_budget_seconds is not None and time.perf_counter() - started > self.time_budget_seconds:
+                self.truncated = True
+                break
+        return self
+
+    def sample(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Échantillon final, proportionnel aux classes vues
+
+        :return: Tuple (user_ids, vecteurs, dates de modification, classes)
+        """
+        parts = []
+        for label, (user_ids, vectors, updated_at) in self._reservoirs.items():
+            seen = self._seen[label]
+            stored = min(seen, self.max_size)
+            share = int(round(self.max_size * seen / self.rows_seen)) if self.rows_seen else 0
+            size = min(stored, max(share, self.min_per_class))
+            # Les cases d'un réservoir sont déjà un tirage uniforme : un préfixe mélangé suffit
+            chosen = self._rng.permutation(stored)[:size]
+            parts.append((user_ids[chosen], vectors[chosen], updated_at[chosen], np.full(size, label, dtype=object)))
+
+        if not parts:
+            return (np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32),
+                    np.empty(0, dtype='datetime64[us]'), np.empty(0, dtype=object))
+        return tuple(np.concatenate(columns) for columns in zip(*parts))
+
+    def report(self, sampled_counts: Optional[Dict[str, int]] = None) -> Dict:
+        """
+        Résumé de l'échantillonnage pour les métadonnées de performance
+        """
+        return {
+            'max_size': self.max_size,
+            'time_budget_seconds': self.time_budget_seconds,
+            'rows_seen': self.rows_seen,
+            'truncated': self.truncated,
+            'class_counts_seen': dict(self._seen),
+            'class_counts_sampled': sampled_counts or {},
+            'sample_size': sum((sampled_counts or {}).values()),
+        }
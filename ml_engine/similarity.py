@@ -0,0 +1,249 @@
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix, hstack, vstack
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+from sqlalchemy.orm import Session
+
+from models import Product
+
+
+class ProductSimilarityIndex:
+    """
+    Index de similarité de contenu entre produits
+
+    Chaque produit est représenté par un vecteur creux : TF-IDF du nom, de la
+    description et de la localité, complété par le prix (log, normalisé) et la
+    note. Les vecteurs sont normalisés L2, si bien que le produit scalaire est
+    une similarité cosinus. Les `n_neighbors` plus proches voisins de chaque
+    produit (dans sa catégorie) sont précalculés : une recherche est une simple
+    lecture de dictionnaire.
+    """
+
+    # Poids des caractéristiques numériques face au texte
+    PRICE_WEIGHT = 0.5
+    RATING_WEIGHT = 0.25
+
+    def __init__(self, n_neighbors: int = 20, chunk_size: int = 512):
+        self.logger = logging.getLogger(__name__)
+        self.n_neighbors = n_neighbors
+        self.chunk_size = chunk_size
+        self._vectorizer: Optional[TfidfVectorizer] = None
+        self._price_range: Tuple[float, float] = (0.0, 1.0)
+        self.matrix = csr_matrix((0, 0), dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._categories = np.empty(0, dtype=np.int64)
+        self._rows: Dict[int, int] = {}
+        # product_id -> (IDs voisins, similarités), triés par similarité décroissante
+        self._neighbors: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def built(self) -> bool:
+        return self._vectorizer is not None
+
+    @staticmethod
+    def _text(name: Optional[str], description: Optional[str], locality: Optional[str]) -> str:
+        return ' '.join(part for part in (name, description, locality) if part)
+
+    def _numeric_features(self, prices: np.ndarray, ratings: np.ndarray) -> csr_matrix:
+        """
+        Prix (log, ramené dans [0, 1] sur l'étendue observée) et note (sur 5), pondérés
+        """
+        low, high = self._price_range
+        log_prices = np.log1p(np.maximum(prices, 0))
+        scaled_prices = np.clip((log_prices - low) / (high - low), 0, 1) if high > low else np.zeros_like(log_prices)
+        scaled_ratings = np.clip(ratings / 5.0, 0, 1)
+        return csr_matrix(np.column_stack([
+            scaled_prices * self.PRICE_WEIGHT,
+            scaled_ratings * self.RATING_WEIGHT
+        ]).astype(np.float32))
+
+    def _vectorize(self, texts: List[str], prices: np.ndarray, ratings: np.ndarray) -> csr_matrix:
+        """
+        Vecteurs normalisés des produits (le vectoriseur doit être ajusté)
+        """
+        text_features = self._vectorizer.transform(texts).astype(np.float32)
+        features = hstack([text_features, self._numeric_features(prices, ratings)], format='csr')
+        return normalize(features, norm='l2', copy=False)
+
+    @staticmethod
+    def _category_key(category_id: Optional[int]) -> int:
+        return category_id if category_id is not None else -1
+
+    def build(self, db: Session):
+        """
+        Reconstruit entièrement les vecteurs et les voisins depuis les produits actifs
+
+        :param db: Session de base de données SQLAlchemy
+        """
+        try:
+            rows = db.query(
+                Product.id, Product.name, Product.description, Product.locality,
+                Product.price, Product.rating, Product.category_id
+            ).filter(Product.is_active.is_(True)).order_by(Product.id).all()
+
+            ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+            categories = np.fromiter(
+                (self._category_key(row.category_id) for row in rows), dtype=np.int64, count=len(rows)
+            )
+            prices = np.fromiter((row.price or 0 for row in rows), dtype=np.float64, count=len(rows))
+            ratings = np.fromiter((row.rating or 0 for row in rows), dtype=np.float64, count=len(rows))
+            texts = [self._text(row.name, row.description, row.locality) for row in rows]
+
+            vectorizer = TfidfVectorizer(sublinear_tf=True, min_df=1, dtype=np.float32)
+            if texts:
+                try:
+                    vectorizer.fit(texts)
+                except ValueError:
+                    # Vocabulaire vide : seules les caractéristiques numériques comptent
+                    vectorizer.fit(['_'])
+
+            log_prices = np.log1p(np.maximum(prices, 0))
+            price_range = (float(log_prices.min()), float(log_prices.max())) if len(rows) else (0.0, 1.0)
+
+            with self._lock:
+                self._vectorizer = vectorizer
+                self._price_range = price_range
+                matrix = self._vectorize(texts, prices, ratings) if texts else csr_matrix((0, 0), dtype=np.float32)
+                neighbors = self._compute_neighbors(matrix, ids, categories)
+
+                self.matrix = matrix
+                self._ids = ids
+                self._categories = categories
+                self._rows = {int(product_id): i for i, product_id in enumerate(ids)}
+                self._neighbors = neighbors
+
+            self.logger.info(f"Index de similarité reconstruit : {len(ids)} produits")
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la construction de l'index de similarité : {e}")
+
+    def _compute_neighbors(self, matrix: csr_matrix, ids: np.ndarray,
+                           categories: np.ndarray) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Calcule les plus proches voisins de chaque produit, catégorie par catégorie et par blocs de lignes
+        """
+        neighbors = {}
+        for category in np.unique(categories):
+            members = np.flatnonzero(categories == category)
+            block = matrix[members]
+            block_t = block.T.tocsc()
+
+            for start in range(0, len(members), self.chunk_size):
+                chunk = slice(start, start + self.chunk_size)
+                similarities = (block[chunk] @ block_t).toarray()
+                for offset, row in enumerate(similarities):
+                    row[start + offset] = -np.inf  # exclure le produit lui-même
+                    neighbors[int(ids[members[start + offset]])] = self._top(row, ids[members])
+
+        return neighbors
+
+    def _top(self, similarities: np.ndarray, candidate_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sélectionne les n_neighbors meilleurs candidats (similarité finie uniquement)
+        """
+        valid = np.flatnonzero(np.isfinite(similarities))
+        if len(valid) > self.n_neighbors:
+            valid = valid[np.argpartition(-similarities[valid], self.n_neighbors - 1)[:self.n_neighbors]]
+        order = valid[np.lexsort((candidate_ids[valid], -similarities[valid]))]
+        return candidate_ids[order].copy(), similarities[order].astype(np.float32)
+
+    def upsert(self, product: Product):
+        """
+        Intègre un produit créé ou modifié sans reconstruire l'index
+
+        Le vectoriseur n'est pas réajusté : les mots inconnus sont ignorés
+        jusqu'à la prochaine reconstruction complète. Les listes de voisins des
+        autres produits de la catégorie sont mises à jour si le produit y entre.
+
+        :param product: Produit créé ou modifié
+        """
+        try:
+            with self._lock:
+                if not self.built:
+                    return
+
+                product_id = product.id
+                self._remove(product_id)
+                if not product.is_active:
+                    return
+
+                vector = self._vectorize(
+                    [self._text(product.name, product.description, product.locality)],
+                    np.array([product.price or 0], dtype=np.float64),
+                    np.array([product.rating or 0], dtype=np.float64)
+                )
+                category = self._category_key(product.category_id)
+
+                self.matrix = vstack([self.matrix, vector], format='csr') if self.matrix.shape[0] else vector
+                self._ids = np.append(self._ids, product_id)
+                self._categories = np.append(self._categories, category)
+                self._rows[product_id] = len(self._ids) - 1
+
+                members = np.flatnonzero((self._categories == category) & (self._ids != product_id))
+                similarities = (self.matrix[members] @ vector.T).toarray().ravel()
+                self._neighbors[product_id] = self._top(similarities, self._ids[members])
+
+                # Entrer dans les listes de voisins des autres produits si assez proche
+                for other_id, similarity in zip(self._ids[members].tolist(), similarities.tolist()):
+                    other_ids, other_scores = self._neighbors.get(other_id, (np.empty(0, np.int64), np.empty(0, np.float32)))
+                    if len(other_ids) >= self.n_neighbors and similarity <= other_scores[-1]:
+                        continue
+                    candidate_ids = np.append(other_ids, product_id)
+                    candidate_scores = np.append(other_scores, similarity)
+                    self._neighbors[other_id] = self._top(candidate_scores.astype(np.float64), candidate_ids)
+
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la mise à jour de l'index de similarité : {e}")
+
+    def _remove(self, product_id: int):
+        """
+        Retire un produit de l'index et des listes de voisins (verrou déjà acquis)
+        """
+        row = self._rows.pop(product_id, None)
+        self._neighbors.pop(product_id, None)
+        if row is None:
+            return
+
+        keep = np.ones(len(self._ids), dtype=bool)
+        keep[row] = False
+        category = self._categories[row]
+        self.matrix = self.matrix[keep]
+        self._ids = self._ids[keep]
+        self._categories = self._categories[keep]
+        self._rows = {int(pid): i for i, pid in enumerate(self._ids)}
+
+        # Les listes qui le contenaient gardent un voisin de moins jusqu'à la prochaine reconstruction
+        for other_id in self._ids[self._categories == category].tolist():
+            other_ids, other_scores = self._neighbors.get(other_id, (None, None))
+            if other_ids is not None and product_id in other_ids:
+                mask = other_ids != product_id
+                self._neighbors[other_id] = (other_ids[mask], other_scores[mask])
+
+    def discard(self, product_id: int):
+        """
+        Retire un produit supprimé
+
+        :param product_id: ID du produit
+        """
+        with self._lock:
+            self._remove(product_id)
+
+    def neighbors(self, product_id: int, k: Optional[int] = None) -> Optional[List[Tuple[int, float]]]:
+        """
+        Retourne les voisins précalculés d'un produit
+
+        :param product_id: ID du produit de référence
+        :param k: Nombre maximum de voisins (tous par défaut)
+        :return: Liste de tuples (product_id, similarité), ou None si le produit n'est pas indexé
+        """
+        with self._lock:
+            entry = self._neighbors.get(product_id)
+        if entry is None:
+            return None
+        ids, scores = entry
+        k = len(ids) if k is None else k
+        return list(zip(ids[:k].tolist(), scores[:k].tolist()))
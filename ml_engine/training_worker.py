@@ -0,0 +1,77 @@
+import logging
+import os
+from typing import Dict
+
+from threadpoolctl import threadpool_limits
+
+
+def _limit_cpu(n_jobs: int, niceness: int):
+    """
+    Restreint les ressources CPU du processus d'entraînement courant
+    """
+    try:
+        os.nice(niceness)
+    except (AttributeError, OSError):
+        pass
+
+    # Épingler le processus sur n_jobs cœurs lorsque le système le permet
+    if hasattr(os, 'sched_getaffinity'):
+        try:
+            cpus = sorted(os.sched_getaffinity(0))
+            os.sched_setaffinity(0, cpus[-n_jobs:])
+        except OSError:
+            pass
+
+
+def run_training_job(mode: str = 'auto', n_jobs: int = 1, niceness: int = 10, trigger: str = 'manual') -> Dict:
+    """
+    Point d'entrée exécuté dans le processus d'entraînement
+
+    Entraîne le modèle, l'enregistre comme nouvelle version active du registre
+    puis rafraîchit les niveaux d'engagement précalculés. Le processus API
+    n'a plus qu'à charger la version retournée.
+
+    :param mode: Mode d'entraînement ('auto', 'full' ou 'incremental')
+    :param n_jobs: Nombre de cœurs alloués à l'entraînement
+    :param niceness: Priorité (nice) du processus d'entraînement
+    :param trigger: Origine de l'entraînement ('manual' ou 'scheduled')
+    :return: Dictionnaire {success, version, mode, duration, metrics}
+    """
+    _limit_cpu(n_jobs, niceness)
+
+    # Imports tardifs : ils s'exécutent dans le processus enfant
+    from models import get_db
+    from .engine import predictor
+
+    logger = logging.getLogger(__name__)
+    predictor.training_n_jobs = n_jobs
+    # Modèle actif nécessaire à l'entraînement incrémental ; sans projection
+    # mémoire, il est modifié puis réenregistré
+    predictor.load_model(mmap_mode=None)
+
+    result = {'success': False, 'version': None, 'mode': mode, 'duration': None}
+    with threadpool_limits(limits=n_jobs), predictor.metrics.training_run(mode, trigger) as run:
+        db = next(get_db())
+        try:
+            if predictor.train_model(db, mode=mode):
+                version = predictor.save_model()
+                if version:
+                    with predictor.metrics.stage('precompute') as stage:
+                        stage['rows'] = predictor.precompute_engagement_levels(db)
+
+                result = {
+                    'success': bool(version),
+                    'version': version or None,
+                    'mode': predictor.last_training_mode,
+                    'duration': predictor.last_training_duration
+                }
+                run.mode = predictor.last_training_mode
+        except Exception as e:
+            logger.error(f"Erreur dans le processus d'entraînement : {e}")
+        finally:
+            run.success = result['success']
+            db.close()
+
+    # Mesures transmises au processus API, qui tient l'historique des entraînements
+    result['metrics'] = predictor.metrics.last_run()
+    return result
@@ -0,0 +1,234 @@
+import datetime
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import Date, cast, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models import Order, Product, ProductDailyOrders
+
+# Catégorie absente
+NO_CATEGORY = -1
+
+
+class TrendingCounters:
+    """
+    Compteurs glissants de commandes par produit pour les produits tendance
+
+    Chaque commande créée incrémente la ligne (produit, jour) de la table
+    `product_daily_orders` et un anneau en mémoire de `window_days` seaux
+    journaliers (tableau seaux x ID produit). Les totaux sur la fenêtre et un
+    top-K par catégorie sont tenus à jour à chaque incrément ; le passage à un
+    nouveau jour vide le seau le plus ancien. Un score avec décroissance
+    temporelle (demi-vie en jours) est calculé à partir des mêmes seaux.
+    """
+
+    def __init__(self, window_days: int = 30, top_k: int = 50, half_life_days: float = 7.0):
+        self.logger = logging.getLogger(__name__)
+        self.window_days = window_days
+        self.top_k = top_k
+        self.half_life_days = half_life_days
+        self._counts = np.zeros((window_days, 1), dtype=np.int32)
+        self._totals = np.zeros(1, dtype=np.int64)
+        self._categories = np.full(1, NO_CATEGORY, dtype=np.int64)
+        self._day: Optional[datetime.date] = None  # jour du seau le plus récent
+        # Top-K matérialisé : catégorie (None = toutes) -> IDs produits par commandes décroissantes
+        self._top: Dict[Optional[int], List[int]] = {}
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _today() -> datetime.date:
+        return datetime.datetime.now(datetime.timezone.utc).date()
+
+    def _bucket(self, day: datetime.date) -> int:
+        return day.toordinal() % self.window_days
+
+    def _ensure_capacity(self, product_id: int):
+        """
+        Agrandit les tableaux pour couvrir un ID produit (verrou déjà acquis)
+        """
+        size = len(self._totals)
+        if product_id < size:
+            return
+        new_size = max(product_id + 1, int(size * 1.5))
+        counts = np.zeros((self.window_days, new_size), dtype=np.int32)
+        counts[:, :size] = self._counts
+        self._counts = counts
+        self._totals = np.concatenate([self._totals, np.zeros(new_size - size, dtype=np.int64)])
+        self._categories = np.concatenate([self._categories, np.full(new_size - size, NO_CATEGORY, dtype=np.int64)])
+
+    def _advance(self, today: datetime.date):
+        """
+        Fait glisser la fenêtre jusqu'à aujourd'hui en vidant les seaux expirés (verrou déjà acquis)
+        """
+        if self._day is None:
+            self._day = today
+            return
+        elapsed = (today - self._day).days
+        if elapsed <= 0:
+            return
+
+        for offset in range(1, min(elapsed, self.window_days) + 1):
+            bucket = self._bucket(self._day + datetime.timedelta(days=offset))
+            self._totals -= self._counts[bucket]
+            self._counts[bucket] = 0
+        self._day = today
+        self._rebuild_top()
+
+    def _rebuild_top(self):
+        """
+        Recalcule le top-K global et par catégorie à partir des totaux (verrou déjà acquis)
+        """
+        product_ids = np.flatnonzero(self._totals > 0)
+        totals = self._totals[product_ids]
+        categories = self._categories[product_ids]
+
+        order = np.lexsort((product_ids, -totals))
+        top = {None: product_ids[order[:self.top_k]].tolist()}
+
+        order = np.lexsort((product_ids, -totals, categories))
+        sorted_categories = categories[order]
+        boundaries = np.flatnonzero(np.diff(sorted_categories)) + 1
+        for group in np.split(order, boundaries):
+            if len(group) and categories[group[0]] != NO_CATEGORY:
+                top[int(categories[group[0]])] = product_ids[group[:self.top_k]].tolist()
+
+        self._top = top
+
+    def _seed_from_orders(self, db: Session, since: datetime.date):
+        """
+        Remplit la table des compteurs depuis les commandes existantes (premier démarrage)
+        """
+        day = cast(Order.created_at, Date)
+        db.execute(insert(ProductDailyOrders).from_select(
+            ['product_id', 'day', 'order_count'],
+            select(Order.product_id, day, func.count(Order.id)).where(
+                Order.product_id.isnot(None),
+                Order.created_at >= since
+            ).group_by(Order.product_id, day)
+        ).on_conflict_do_nothing())
+        db.commit()
+        self.logger.info("Compteurs de commandes journaliers initialisés depuis les commandes")
+
+    def load(self, db: Session):
+        """
+        Charge les compteurs de la fenêtre depuis la table `product_daily_orders`
+
+        :param db: Session de base de données SQLAlchemy
+        """
+        try:
+            today = self._today()
+            since = today - datetime.timedelta(days=self.window_days - 1)
+
+            if db.query(ProductDailyOrders.product_id).first() is None:
+                self._seed_from_orders(db, since)
+
+            rows = db.query(
+                ProductDailyOrders.product_id, ProductDailyOrders.day, ProductDailyOrders.order_count
+            ).filter(ProductDailyOrders.day >= since, ProductDailyOrders.day <= today).all()
+            products = db.query(Product.id, Product.category_id).all()
+
+            size = max([row.product_id for row in rows] + [row.id for row in products] + [0]) + 1
+            counts = np.zeros((self.window_days, size), dtype=np.int32)
+            for product_id, day, order_count in rows:
+                counts[self._bucket(day), product_id] += order_count
+
+            categories = np.full(size, NO_CATEGORY, dtype=np.int64)
+            for product_id, category_id in products:
+                if category_id is not None:
+                    categories[product_id] = category_id
+
+            with self._lock:
+                self._counts = counts
+                self._totals = counts.sum(axis=0, dtype=np.int64)
+                self._categories = categories
+                self._day = today
+                self._rebuild_top()
+                self.loaded = True
+
+            self.logger.info(f"Compteurs tendance chargés : {len(rows)} lignes produit-jour")
+        except Exception as e:
+            db.rollback()
+            self.logger.error(f"Erreur lors du chargement des compteurs tendance : {e}")
+
+    def record_order(self, db: Session, product_id: int, category_id: Optional[int] = None):
+        """
+        Comptabilise une commande créée (table et anneau en mémoire)
+
+        :param db: Session de base de données SQLAlchemy
+        :param product_id: ID du produit commandé
+        :param category_id: Catégorie du produit (optionnel)
+        """
+        today = self._today()
+        try:
+            db.execute(insert(ProductDailyOrders).values(
+                product_id=product_id, day=today, order_count=1
+            ).on_conflict_do_update(
+                index_elements=[ProductDailyOrders.product_id, ProductDailyOrders.day],
+                set_={'order_count': ProductDailyOrders.order_count + 1}
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.logger.error(f"Erreur lors de l'incrément du compteur du produit {product_id} : {e}")
+
+        with self._lock:
+            if not self.loaded:
+                return
+            self._advance(today)
+            self._ensure_capacity(product_id)
+            if category_id is not None:
+                self._categories[product_id] = category_id
+            self._counts[self._bucket(today), product_id] += 1
+            self._totals[product_id] += 1
+
+            category = int(self._categories[product_id])
+            for key in (None, category if category != NO_CATEGORY else None):
+                self._promote(key, product_id)
+
+    def _promote(self, key: Optional[int], product_id: int):
+        """
+        Replace un produit dans un top-K après l'incrément de son total (verrou déjà acquis)
+        """
+        top = self._top.setdefault(key, [])
+        if product_id not in top:
+            if len(top) >= self.top_k:
+                last = top[-1]
+                if (self._totals[product_id], -product_id) <= (self._totals[last], -last):
+                    return
+            top.append(product_id)
+        top.sort(key=lambda pid: (-self._totals[pid], pid))
+        del top[self.top_k:]
+
+    def top(self, category_id: Optional[int] = None, limit: int = 5, decayed: bool = False) -> List[int]:
+        """
+        Retourne les produits les plus commandés sur la fenêtre
+
+        :param category_id: Restreindre à une catégorie (optionnel)
+        :param limit: Nombre maximum de produits
+        :param decayed: Pondérer chaque jour par une décroissance exponentielle (demi-vie half_life_days)
+        :return: IDs des produits par score décroissant
+        """
+        with self._lock:
+            self._advance(self._today())
+            if not decayed and limit <= self.top_k:
+                return self._top.get(category_id, [])[:limit]
+
+            if decayed:
+                # Âge en jours du contenu de chaque seau
+                ages = (self._day.toordinal() - np.arange(self.window_days)) % self.window_days
+                weights = 0.5 ** (ages / self.half_life_days)
+                scores = weights @ self._counts
+            else:
+                scores = self._totals.astype(np.float64)
+
+            mask = scores > 0
+            if category_id is not None:
+                mask &= self._categories == category_id
+            product_ids = np.flatnonzero(mask)
+            order = np.lexsort((product_ids, -scores[product_ids]))[:limit]
+            return product_ids[order].tolist()
@@ -13,4 +13,5 @@ from .recommendations import *
 from .users import *
     
 __all__ = ["Banner", "Base", "Category", "Devise", "IconType", "Locality", "ProductRating","OrderStatus", "PaymentMethod",
-           "Order", "order_products", "PasswordResetCode", "Product", "User", "UserPreferenceProfile"]
+           "Order", "order_products", "PasswordResetCode", "Product", "User", "UserPreferenceProfile",
+           "UserEngagementLevel", "UserFeatureVector", "ProductDailyOrders", "ProductCopurchase"]
@@ -81,6 +81,8 @@ class Order(Base):
                       onupdate=lambda: datetime.now(timezone.utc))
     delivery_started_at = Column(DateTime, nullable=True)
     delivered_at = Column(DateTime, nullable=True)
+    # Date d'intégration au profil de préférences (NULL : livraison en attente d'agrégation)
+    profile_synced_at = Column(DateTime, nullable=True, index=True)
     cancelled_at = Column(DateTime, nullable=True)
     purchase_time = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     
@@ -165,24 +167,19 @@ class Order(Base):
         return False
     
     def mark_as_delivered(self, db: Session):
-        """Marque la commande comme livrée et met à jour le profil de préférences utilisateur"""
+        """
+        Marque la commande comme livrée
+        
+        Le profil de préférences n'est pas modifié ici : la commande reste en
+        attente (profile_synced_at NULL) jusqu'au prochain lot de l'agrégateur
+        """
         if self.status == OrderStatus.DELIVERING.value:  # Note: compare with value
             self.status = OrderStatus.DELIVERED.value  # Use .value here
             self.delivered_at = datetime.now(timezone.utc)
+            self.profile_synced_at = None
             
             # Calculer les caractéristiques ML lors de la livraison
             self.calculate_ml_features(db)
-            from .recommendations import UserPreferenceProfile
-            # Mettre à jour le profil de préférences de l'utilisateur
-            user_profile = db.query(UserPreferenceProfile).filter(
-                UserPreferenceProfile.user_id == self.customer_id
-            ).first()
-            
-            if not user_profile:
-                user_profile = UserPreferenceProfile(user_id=self.customer_id)
-                db.add(user_profile)
-                
-            user_profile.update_profile(self, db)
             db.commit()
             return True
         return False
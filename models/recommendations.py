@@ -1,9 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, JSON
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, ForeignKey, JSON, DateTime, Date, LargeBinary, func
 from sqlalchemy.dialects.postgresql import ARRAY
-from sqlalchemy.orm import relationship, Session
+from sqlalchemy.orm import relationship
 
 from .base import Base
-from .orders import Order, order_products
 
 class UserPreferenceProfile(Base):
     """
@@ -28,68 +28,65 @@ class UserPreferenceProfile(Base):
     # Champ JSON pour stocker des données de préférences complexes
     additional_preferences = Column(JSON, nullable=True)
     
+    # Date de dernière modification (watermark de l'entraînement incrémental)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc),
+                        onupdate=lambda: datetime.now(timezone.utc),
+                        server_default=func.now(), index=True)
+    
     # Relations
     user = relationship("User")
     most_purchased_category = relationship("Category")
+
+
+class UserEngagementLevel(Base):
+    """
+    Niveau d'engagement précalculé chaque nuit par le modèle pour chaque utilisateur
+    """
+    __tablename__ = "user_engagement_levels"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    engagement_level = Column(String(16), nullable=False)
+    
+    # Date d'entraînement du modèle ayant produit la prédiction
+    model_trained_at = Column(DateTime, nullable=True)
+    computed_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
+class UserFeatureVector(Base):
+    """
+    Vecteur de caractéristiques float32 d'un utilisateur, partagé par l'entraînement et l'inférence
+    """
+    __tablename__ = "user_feature_vectors"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    
+    # Octets d'un tableau float32 (colonnes de ml_engine.features.FEATURE_COLUMNS)
+    features = Column(LargeBinary, nullable=False)
+    # Version de l'encodage ayant produit le vecteur
+    version = Column(SmallInteger, nullable=False)
+    
+    # updated_at du profil encodé
+    profile_updated_at = Column(DateTime, nullable=True, index=True)
+    computed_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
+class ProductDailyOrders(Base):
+    """
+    Nombre de commandes par produit et par jour (UTC), alimenté à la création des commandes
+    """
+    __tablename__ = "product_daily_orders"
+    
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    order_count = Column(Integer, nullable=False, default=0)
+
+
+class ProductCopurchase(Base):
+    """
+    Nombre de clients ayant acheté deux produits (paire product_id < other_product_id), alimenté à la livraison
+    """
+    __tablename__ = "product_copurchases"
     
-    def update_profile(self, new_order: Order, db: Session):
-        """
-        Mettre à jour le profil de préférences basé sur une nouvelle commande
-        """
-        if self.total_orders is None:
-            self.total_orders = 0
-        # Mettre à jour le nombre total de commandes
-        self.total_orders += 1
-        
-        if self.average_order_value is None:
-            self.average_order_value = 0
-        # Mettre à jour la valeur moyenne de commande
-        self.average_order_value = (
-            (self.average_order_value * (self.total_orders - 1) + new_order.total_amount) 
-            / self.total_orders
-        )
-        
-        # Mettre à jour la catégorie la plus achetée - FIX: preferred_categories est un entier, pas une liste
-        if new_order.preferred_categories is not None:
-            self.most_purchased_category_id = new_order.preferred_categories
-        
-        # Récupérer les produits de la commande
-        items = db.query(order_products).filter(order_products.c.order_id == new_order.id).all()
-        product_ids = [item.product_id for item in items]
-        
-        # Mettre à jour les ID de produits préférés
-        preferred_products = self.preferred_product_ids or []
-        for product_id in product_ids:
-            if product_id not in preferred_products:
-                preferred_products.append(product_id)
-        self.preferred_product_ids = preferred_products[:10]  # Garder les 10 meilleurs
-        
-        # Mettre à jour les devises préférées
-        if new_order.preferred_currencies:
-            # Assurons-nous que preferred_currencies est une liste même si c'est une chaîne simple
-            if isinstance(new_order.preferred_currencies, str):
-                currencies_to_add = [new_order.preferred_currencies]
-            else:
-                currencies_to_add = new_order.preferred_currencies
-                
-            self.preferred_currencies = list(set(
-                (self.preferred_currencies or []) + currencies_to_add
-            ))
-        
-        # Mettre à jour le moment préféré d'achat
-        if new_order.purchase_time_of_day:
-            self.preferred_purchase_time = new_order.purchase_time_of_day
-        
-        # Optionnel : Stocker des données de préférences complexes
-        if not self.additional_preferences:
-            self.additional_preferences = {}
-        
-        # Exemple de suivi complexe des préférences de catégorie
-        self.additional_preferences.setdefault('category_purchase_count', {})
-        for item in items:
-            if hasattr(item, 'product_category_id') and item.product_category_id:
-                cat_id_str = str(item.product_category_id)
-                self.additional_preferences['category_purchase_count'][cat_id_str] = \
-                    self.additional_preferences['category_purchase_count'].get(cat_id_str, 0) + item.quantity
-        
-        db.commit()
\ No newline at end of file
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    other_product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True, index=True)
+    customer_count = Column(Integer, nullable=False, default=0)